@@ -0,0 +1,6 @@
+"""
+リポジトリ一覧のスクレイパー（github_scraper.py）のベンチマーク
+
+lecture-1/exercise-1 ディレクトリで実行する:
+    python -m bench.bench_scraper
+"""
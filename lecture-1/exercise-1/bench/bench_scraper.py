@@ -0,0 +1,77 @@
+"""
+スクレイパーのページ取得の速さを計測（スタブサーバー使用、オフラインで実行可能）
+
+記録したページを latency 秒の遅延で返すスタブ（bench/stub_github.py）から --pages ページを取得し、
+かかった時間（秒）と毎秒リクエスト数を比べる。
+- requests.get:   ノートブックと同じく1ページごとに requests.get（接続を毎回作る）、順に取得
+- session x1:     RepoScraper、接続プールで Keep-Alive、1ページずつ
+- session xN:     RepoScraper、N ページを同時に取得
+- rate R/s xN:    同上 + トークンバケットで R 回/秒（最大 burst 回続けて）に制限
+- retry xN:       同上（制限なし）+ スタブが5回に1回 503 を返し、バックオフして再試行する
+
+ノートブックはさらにリポジトリ1件ごとに time.sleep(1) していた（30件のページで1ページあたり30秒）。
+スタブは同じプロセスで動き、BeautifulSoup（html.parser）の解析は1ページ数十ミリ秒かかるので、
+同時に取得したときの上限は CPU で決まる（ネットワークの待ちだけが重なる）。
+
+    python -m bench.bench_scraper --pages 40 --latency 0.05 --workers 8
+"""
+
+import argparse
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+import github_scraper
+from bench.stub_github import StubGitHub
+
+
+def notebook_style(url, pages):
+    """ページごとに requests.get して解析する（待ちなし）"""
+    repos = []
+    for page in range(1, pages + 1):
+        response = requests.get(github_scraper.page_url(url, page), headers=github_scraper.HEADERS)
+        response.raise_for_status()
+        repos.extend(github_scraper.parse_repos(BeautifulSoup(response.content, 'html.parser')))
+    return repos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05, help='スタブの応答遅延（秒）')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=10.0, help='rate の計測で使う1秒あたりのリクエスト数')
+    parser.add_argument('--burst', type=int, default=5)
+    args = parser.parse_args()
+
+    workers = args.workers
+    cases = [
+        ('requests.get', None, 0),
+        ('session x1', dict(rate=0, workers=1), 0),
+        (f'session x{workers}', dict(rate=0, workers=workers), 0),
+        (f'rate {args.rate:g}/s x{workers}', dict(rate=args.rate, burst=args.burst, workers=workers), 0),
+        (f'retry x{workers}', dict(rate=0, workers=workers, backoff=0.01), 5),
+    ]
+    print(f'{args.pages} pages, stub latency {args.latency * 1000:.0f} ms')
+    print(f'{"":>16} {"wall s":>8} {"req/s":>8} {"requests":>9} {"503":>5} {"retried":>8} '
+          f'{"concurrent":>11} {"repos":>6}')
+    for label, options, fail_every in cases:
+        with StubGitHub(pages=args.pages, latency=args.latency, fail_every=fail_every) as stub:
+            retried = 0
+            start = time.perf_counter()
+            if options is None:
+                repos = notebook_style(stub.url, args.pages)
+            else:
+                with github_scraper.RepoScraper(stub.url, **options) as scraper:
+                    repos = scraper.scrape()
+                    retried = scraper.stats()['retried']
+            elapsed = time.perf_counter() - start
+            assert len(repos) == args.pages * len(github_scraper.parse_repos(
+                BeautifulSoup(stub.body(1), 'html.parser'))), len(repos)
+            print(f'{label:>16} {elapsed:8.2f} {stub.requests / elapsed:8.1f} {stub.requests:9d} '
+                  f'{stub.failed:5d} {retried:8d} {stub.max_active:11d} {len(repos):6d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+GitHub のリポジトリ一覧のスタブHTTPサーバー（オフラインでのベンチマーク・動作確認用）
+
+bench/fixtures/google_repositories.html（記録した1ページ目）を、?page=N の各ページとして返す。
+ページ送り（data-total-pages と Next のリンク）は pages に合わせて書き換える。リポジトリはどのページも同じ。
+fail_every=N なら N 回に1回 503（Retry-After: 0）を返す（再試行の確認用）。
+
+単体で起動する場合:
+    python -m bench.stub_github --port 8766 --pages 20 --latency 0.05
+    python github_scraper.py --url "http://127.0.0.1:8766/google?tab=repositories" --rate 0
+"""
+
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+PAGINATION_RE = re.compile(r'<div role="navigation" aria-label="Pagination" class="pagination">.*?</div>', re.S)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def pagination(page: int, pages: int) -> str:
+    """page ページ目（全 pages ページ）のページ送り（GitHub と同じマークアップ）"""
+    def link(n, text=None, attrs=''):
+        return f'<a{attrs} href="/google?page={n}&amp;tab=repositories">{text or n}</a>'
+
+    parts = [link(page - 1, 'Previous', ' class="previous_page" rel="prev"') if page > 1
+             else '<span class="previous_page disabled" aria-hidden="true">Previous</span>']
+    for n in range(max(1, page - 2), min(pages, page + 2) + 1):
+        parts.append(f'<em class="current" data-total-pages="{pages}" aria-current="page">{n}</em>'
+                     if n == page else link(n))
+    parts.append(link(page + 1, 'Next', ' class="next_page" rel="next"') if page < pages
+                 else '<span class="next_page disabled" aria-hidden="true">Next</span>')
+    return f'<div role="navigation" aria-label="Pagination" class="pagination">{" ".join(parts)}</div>'
+
+
+class StubGitHub:
+    """スレッドで動くスタブサーバー（with文で起動・停止）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, pages: int = 10, latency: float = 0.0,
+                 fail_every: int = 0):
+        self.pages = pages
+        self.latency = latency
+        self.fail_every = fail_every
+        self.template = (FIXTURES_DIR / 'google_repositories.html').read_text(encoding='utf-8')
+        self.bodies = {}        # ページ番号 → 本文
+        self.requests = 0       # リクエスト数（503 を含む）
+        self.failed = 0         # 503 を返した回数
+        self.active = 0         # 処理中のリクエスト数
+        self.max_active = 0     # 同時に処理したリクエスト数の最大
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def url(self) -> str:
+        """1ページ目のURL（github_scraper.URL に相当）"""
+        return f'{self.base_url}/google?tab=repositories'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def body(self, page: int):
+        """page ページ目の本文（範囲外なら None）"""
+        if not 1 <= page <= self.pages:
+            return None
+        if page not in self.bodies:
+            html = PAGINATION_RE.sub(lambda m: pagination(page, self.pages), self.template)
+            self.bodies[page] = html.encode('utf-8')
+        return self.bodies[page]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-Alive
+            disable_nagle_algorithm = True  # ヘッダーと本文を別々に書くので、遅延ACKで40ms待たないように
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    fail = stub.fail_every and stub.requests % stub.fail_every == 0
+                    if fail:
+                        stub.failed += 1
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    self.respond(fail)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def respond(self, fail):
+                url = urlsplit(self.path)
+                page = parse_qs(url.query).get('page', ['1'])[0]
+                body = stub.body(int(page)) if url.path == '/google' and page.isdigit() else None
+                if fail or body is None:
+                    self.send_response(503 if fail else 404)
+                    if fail:
+                        self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # ベンチマーク中にログを出さない
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GitHub のリポジトリ一覧のスタブサーバー')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='レスポンスごとの遅延（秒）')
+    parser.add_argument('--fail-every', type=int, default=0, help='N 回に1回 503 を返す')
+    args = parser.parse_args()
+
+    stub = StubGitHub(args.host, args.port, args.pages, args.latency, args.fail_every)
+    print(f'Stub GitHub running at {stub.url}')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+GitHub の組織のリポジトリ一覧（https://github.com/google?tab=repositories）のスクレイパー
+
+personal_exercise.ipynb のセル2・3（1ページ目だけを取得し、解析済みのHTMLを1件ずつ time.sleep(1) しながら保存）を
+再利用できるようにしたもの。
+
+- 1ページ目のページ送り（data-total-pages）から総ページ数を読み、2ページ目以降はスレッドで同時に取得する
+  （総ページ数が分からなければ「Next」のリンクを順にたどる）
+- requests.Session の接続プール（workers 本）で Keep-Alive して接続を使い回す
+- サーバー負荷軽減の待ちはトークンバケット（rate 回/秒、最大 burst 回続けて）でネットワークへのリクエストにだけかける。
+  取得済みのHTMLの解析やDBへの保存は待たない
+- 接続エラー・タイムアウト・429/5xx は retries 回まで指数バックオフで再試行する（Retry-After があればそれ以上待つ）
+
+    python github_scraper.py                        # google_repos_data.db の repos に保存して上位10件を表示
+    python github_scraper.py --pages 3 --rate 2 --workers 4
+
+    from github_scraper import RepoScraper
+    repos = RepoScraper(rate=1.0).scrape(max_pages=3)   # -> [Repo(name, language, stars), ...]
+"""
+
+import argparse
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+URL = 'https://github.com/google?tab=repositories'
+DB_NAME = 'google_repos_data.db'
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+RATE = 1.0            # 1秒あたりのリクエスト数（ノートブックの time.sleep(1) と同じ間隔）
+BURST = 1             # 待たずに続けて送れるリクエスト数
+WORKERS = 4           # 同時に取得するページ数（接続プールの大きさ）
+RETRIES = 3
+BACKOFF = 0.5         # 秒（1回目の再試行の待ち。2回目以降は倍にする）
+REQUEST_TIMEOUT = 10  # 秒
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    language TEXT,
+    stars INTEGER
+)
+"""
+INSERT_SQL = "INSERT INTO repos (name, language, stars) VALUES (?, ?, ?)"
+
+Repo = namedtuple('Repo', 'name language stars')
+
+STARGAZERS_RE = re.compile(r'/stargazers$')
+
+
+class TokenBucket:
+    """トークンバケット（1秒に rate 個補充、最大 capacity 個）。acquire() はトークンが取れるまで待つ
+
+    複数スレッドから呼ぶと、呼んだ順にトークンを予約して（残りが負になる）、その分だけ待つ。
+    rate が None なら待たない。
+    """
+
+    def __init__(self, rate=RATE, capacity=BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1個使い、待った秒数を返す"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def page_url(url, page):
+    """一覧のURLのクエリに page=N を設定する（1ページ目は元のURLのまま）"""
+    if page == 1:
+        return url
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != 'page']
+    query.append(('page', str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def parse_count(text):
+    """'12,345' や '1.2k' をint にする（空なら0）"""
+    text = text.strip().replace(',', '').lower()
+    if not text:
+        return 0
+    if text.endswith('k'):
+        return int(float(text[:-1]) * 1000)
+    return int(text)
+
+
+def parse_repos(soup):
+    """1ページ分のリポジトリ（名前・主要言語・スター数）"""
+    repos = []
+    for repo in soup.find_all('li', {'class': 'Box-row'}):
+        name_tag = repo.find('a', {'itemprop': 'name codeRepository'})
+        language_tag = repo.find('span', {'itemprop': 'programmingLanguage'})
+        star_tag = repo.find('a', {'href': STARGAZERS_RE})
+        repos.append(Repo(
+            name_tag.text.strip() if name_tag else 'N/A',
+            language_tag.text.strip() if language_tag else 'N/A',
+            parse_count(star_tag.text) if star_tag else 0,
+        ))
+    return repos
+
+
+def total_pages(soup):
+    """ページ送りから総ページ数を読む（分からなければ None）"""
+    current = soup.find('em', {'class': 'current'})
+    if current is not None and current.get('data-total-pages', '').isdigit():
+        return int(current['data-total-pages'])
+    pagination = soup.find('div', {'class': 'pagination'})
+    if pagination is None:
+        return 1
+    numbers = [int(tag.text) for tag in pagination.find_all(['a', 'em']) if tag.text.strip().isdigit()]
+    return max(numbers) if numbers else None
+
+
+def next_page_url(soup, url):
+    """「Next」のリンク先（最後のページなら None）"""
+    link = soup.find('a', {'class': 'next_page'}) or soup.find('a', {'rel': 'next'})
+    return urljoin(url, link['href']) if link and link.get('href') else None
+
+
+class RepoScraper:
+    """リポジトリ一覧をページごとに取得して解析する（接続プール・レート制限・再試行つき）"""
+
+    def __init__(self, url=URL, rate=RATE, burst=BURST, workers=WORKERS, retries=RETRIES,
+                 backoff=BACKOFF, timeout=REQUEST_TIMEOUT, session=None):
+        self.url = url
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        session.headers.update(HEADERS)
+        self.session = session
+        self._lock = threading.Lock()
+        self.requests = 0   # ネットワークに送ったリクエスト数（再試行を含む）
+        self.retried = 0    # 再試行した回数
+        self.waited = 0.0   # レート制限で待った秒数の合計
+
+    def fetch(self, url):
+        """URLの本文を取得する（レート制限をかけ、失敗したらバックオフして再試行）"""
+        for attempt in range(self.retries + 1):
+            waited = self.bucket.acquire()
+            with self._lock:
+                self.requests += 1
+                self.waited += waited
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.content
+                delay = max(self._backoff(attempt), _retry_after(response))
+            with self._lock:
+                self.retried += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        # 同時に失敗したリクエストが同じ時刻に再試行しないよう、待ちを 0.5〜1倍 にばらつかせる
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+
+    def fetch_page(self, url):
+        """1ページを取得して (リポジトリ, 解析済みのHTML) を返す"""
+        soup = BeautifulSoup(self.fetch(url), 'html.parser')
+        return parse_repos(soup), soup
+
+    def scrape(self, max_pages=None):
+        """全ページ（max_pages があればそこまで）のリポジトリをページ順に返す"""
+        repos, soup = self.fetch_page(self.url)
+        total = total_pages(soup)
+        if total is None:
+            return repos + self._follow(soup, max_pages)
+        if max_pages is not None:
+            total = min(total, max_pages)
+        urls = [page_url(self.url, page) for page in range(2, total + 1)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for page_repos, _ in executor.map(self.fetch_page, urls):
+                repos.extend(page_repos)
+        return repos
+
+    def _follow(self, soup, max_pages):
+        # 総ページ数が分からないときは「Next」のリンクを1ページずつたどる
+        repos = []
+        url, page = self.url, 1
+        while max_pages is None or page < max_pages:
+            url = next_page_url(soup, url)
+            if url is None:
+                break
+            page_repos, soup = self.fetch_page(url)
+            repos.extend(page_repos)
+            page += 1
+        return repos
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'retried': self.retried, 'waited': self.waited}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After', '')
+    return float(value) if value.replace('.', '', 1).isdigit() else 0.0
+
+
+def save_repos(conn, repos):
+    """repos テーブルの内容を入れ替えて保存する（1トランザクション）"""
+    with conn:
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute("DELETE FROM repos")
+        conn.executemany(INSERT_SQL, repos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=URL)
+    parser.add_argument('--pages', type=int, help='取得する最大ページ数（省略時は全ページ）')
+    parser.add_argument('--rate', type=float, default=RATE, help='1秒あたりのリクエスト数（0 で制限なし）')
+    parser.add_argument('--burst', type=int, default=BURST)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--retries', type=int, default=RETRIES)
+    parser.add_argument('--db', default=DB_NAME)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with RepoScraper(args.url, args.rate, args.burst, args.workers, args.retries) as scraper:
+        repos = scraper.scrape(args.pages)
+        stats = scraper.stats()
+    elapsed = time.perf_counter() - start
+    print(f"{len(repos)} 件のリポジトリを取得しました（{stats['requests']} リクエスト、"
+          f"再試行 {stats['retried']} 回、{elapsed:.1f} 秒）")
+
+    conn = sqlite3.connect(args.db)
+    save_repos(conn, repos)
+    rows = conn.execute("SELECT * FROM repos ORDER BY stars DESC LIMIT 10").fetchall()
+    conn.close()
+
+    print(f"{'ID':<4} {'Name':<35} {'Language':<15} {'Stars':<8}")
+    for repo_id, name, language, stars in rows:
+        print(f"{repo_id:<4} {name:<35} {language:<15} {stars:<8,}")
+
+
+if __name__ == '__main__':
+    main()
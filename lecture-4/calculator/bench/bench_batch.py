@@ -0,0 +1,125 @@
+"""
+まとめて適用する batch.py とスカラーの経路の速さの比較（1秒あたりの値の数）
+
+-1000 から 1000 までの --count 個の値に、関数のキーそれぞれと式を適用する。
+- scalar:          値ごとに式の文字列を作って expression.calculate（GUI・--expr と同じ経路。キャッシュに当たらない）
+- scalar compiled: コンパイル済みの式を値ごとに呼んで format_number（Python のループでできる一番速いスカラーの経路）
+- batch python:    batch.apply（NumPy なし。チャンクごとに map）
+- batch numpy:     batch.apply（NumPy のベクトル化したカーネル。NumPy がなければ表示しない）
+- write:           batch.write_table で「入力<TAB>結果」の行にする（出力は捨てる）
+
+scalar は --scalar-count 個だけ計る。最後にストリーミングの最大メモリ（tracemalloc）を値の数を変えて比べる。
+
+    python bench/bench_batch.py --count 2000000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import batch  # noqa: E402
+import expression  # noqa: E402
+
+OPERATIONS = ("√", "x²", "1/x", "sin", "cos", "%", "±", "x^2 + 3 × x − 1")
+
+# スカラーの経路で値 x の計算に使う式（キーを押したときにエンジンが作る式と同じ書き方）
+SCALAR = {
+    "√": "√({})",
+    "x²": "({})²",
+    "1/x": "(1/{})",
+    "sin": "sin({})",
+    "cos": "cos({})",
+    "%": "({})%",
+    "±": "-({})",
+    "x^2 + 3 × x − 1": "({0})^2 + 3 × ({0}) − 1",
+}
+
+
+class Discard:
+    def write(self, text):
+        pass
+
+
+def inputs(count):
+    return -1000.0, 1000.0, 2000.0 / count
+
+
+def scalar(operation, count):
+    start, _, step = inputs(count)
+    template = SCALAR[operation]
+    return [expression.calculate(template.format(repr(start + step * i))) for i in range(count)]
+
+
+def scalar_compiled(operation, count):
+    start, _, step = inputs(count)
+    function = expression.compile_expression(batch.resolve(operation)).function
+    results = []
+    for i in range(count):
+        try:
+            results.append(str(expression.format_number(function(start + step * i))))
+        except (ArithmeticError, ValueError):
+            results.append("Error")
+    return results
+
+
+def stream(operation, count, use_numpy, size=batch.CHUNK_SIZE):
+    rows = 0
+    for chunk in batch.apply(operation, batch.frange(*inputs(count), size=size, use_numpy=use_numpy), use_numpy):
+        rows += len(chunk.values)
+    return rows
+
+
+def write(operation, count, use_numpy):
+    chunks = batch.frange(*inputs(count), use_numpy=use_numpy)
+    return batch.write_table(batch.apply(operation, chunks, use_numpy), Discard())
+
+
+def timed(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def peak_memory(count):
+    tracemalloc.start()
+    stream("x^2 + 3 × x − 1", count, use_numpy=False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--scalar-count", type=int, default=20_000)
+    args = parser.parse_args()
+
+    columns = ["scalar", "scalar compiled", "batch python"] + (["batch numpy"] if batch.np is not None else []) + ["write"]
+    print(f"{args.count:,} values per operation (scalar: {args.scalar_count:,}), values/s"
+          f"{'' if batch.np is not None else ' — NumPy is not installed'}")
+    print(f"{'operation':18s}" + "".join(f"{name:>17s}" for name in columns) + f"{'vs scalar':>11s}")
+    for operation in OPERATIONS:
+        expression.compile_expression.cache_clear()
+        rates = {
+            "scalar": timed(lambda: scalar(operation, args.scalar_count), args.scalar_count),
+            "scalar compiled": timed(lambda: scalar_compiled(operation, args.count), args.count),
+            "batch python": timed(lambda: stream(operation, args.count, False), args.count),
+        }
+        if batch.np is not None:
+            rates["batch numpy"] = timed(lambda: stream(operation, args.count, True), args.count)
+        rates["write"] = timed(lambda: write(operation, args.count, None), args.count)
+        fastest = max(rates["batch python"], rates.get("batch numpy", 0))
+        print(f"{operation:18s}" + "".join(f"{rates[name]:17,.0f}" for name in columns)
+              + f"{fastest / rates['scalar']:10.0f}x")
+
+    small, large = args.count // 4, args.count
+    print(f"peak memory (batch python): {small:,} values {peak_memory(small) / 1e6:.1f} MB, "
+          f"{large:,} values {peak_memory(large) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
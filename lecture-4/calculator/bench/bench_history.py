@@ -0,0 +1,123 @@
+"""
+計算履歴（history.py）の追加の速さと検索の時間
+
+1. append: リングバッファだけ / HistoryStore（flush_size を変えて）に1件ずつ追加する速さ（件/秒）
+2. --entries 件（既定 100万件）の履歴を作り、次の時間（p50 / p99 ミリ秒）を計る
+   - recent:         ランダムな位置から表示1画面分（HistoryWindow と同じ12件）
+   - prefix N:       保存済みの式の先頭 N 文字で前方一致
+   - substring N:    保存済みの「式 = 結果」の途中の N 文字で部分一致
+   - miss N:         どの履歴にもない N 文字で部分一致・前方一致（1件も当たらないとき）
+
+式は bench_parser.random_expression の深さ2まで（平均45文字ほど。結果は式を計算したもの）。
+書き込みの時間のほとんどは FTS5（trigram）の索引づけ。
+
+    python bench/bench_history.py --entries 1000000 --path /var/tmp/history.db
+    python bench/bench_history.py --path /var/tmp/history.db --reuse   # 作成済みのDBで検索だけ計り直す
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import expression  # noqa: E402
+import history  # noqa: E402
+from bench_parser import random_expression  # noqa: E402
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def make_entries(rng, count, distinct=20000):
+    """(式, 結果) を count 件（distinct 種類の式から選ぶ）"""
+    pool = []
+    for _ in range(distinct):
+        text = random_expression(rng, depth=2)
+        pool.append((text, expression.calculate(text)))
+    return [pool[rng.randrange(distinct)] for _ in range(count)]
+
+
+def append_rate(path, entries, flush_size):
+    for file in Path(path).parent.glob(Path(path).name + "*"):
+        file.unlink()
+    store = history.HistoryStore(path, flush_size=flush_size, flush_interval=float("inf"))
+    start = time.perf_counter()
+    for text, result in entries:
+        store.add(text, result)
+    store.flush()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return len(entries) / elapsed
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--path", type=Path, default=Path("bench_history.db"))
+    parser.add_argument("--reuse", action="store_true", help="作成済みのDBを使う")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if not (args.reuse and args.path.exists()):
+        sample = make_entries(rng, 20000)
+        buffer = history.HistoryBuffer()
+        start = time.perf_counter()
+        for text, result in sample:
+            buffer.append(history.HistoryEntry(text, result))
+        print(f"append buffer only        {len(sample) / (time.perf_counter() - start):12,.0f} /s")
+        small = args.path.with_name(args.path.name + ".append")
+        for flush_size in (1, 64, 1024):
+            count = 2000 if flush_size == 1 else len(sample)
+            print(f"append store flush={flush_size:<6d} {append_rate(small, sample[:count], flush_size):12,.0f} /s")
+        for file in small.parent.glob(small.name + "*"):
+            file.unlink()
+
+        start = time.perf_counter()
+        rate = append_rate(args.path, make_entries(rng, args.entries), 1024)
+        print(f"generated {args.entries:,} entries in {time.perf_counter() - start:.0f}s "
+              f"(append {rate:,.0f} /s), {args.path.stat().st_size / 1e6:.0f} MB")
+
+    store = history.HistoryStore(args.path)
+    total = len(store)
+    saved = store.recent(args.repeat, rng.randrange(max(1, total - args.repeat)))
+    texts = [f"{entry.expression} = {entry.result}" for entry in saved]
+    print(f"{total:,} entries, {args.repeat} queries each      p50 ms    p99 ms")
+    results = {"recent": timed(lambda offset: store.recent(history.VISIBLE_ROWS, offset),
+                               [rng.randrange(total) for _ in range(args.repeat)])}
+    for length in (1, 2, 4, 8):
+        results[f"prefix {length}"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS, prefix=True),
+                                            [entry.expression[:length] for entry in saved])
+    for length in (1, 2, 3, 5, 8):
+        queries = []
+        for text in texts:
+            start = rng.randrange(max(1, len(text) - length))
+            queries.append(text[start:start + length])
+        results[f"substring {length}"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS), queries)
+    results["miss 1"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS), ["@"] * 20)
+    results["miss 2"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS), ["@@"] * 20)
+    results["miss 3"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS), ["@@@"] * 20)
+    results["miss prefix"] = timed(lambda q: store.search(q, history.VISIBLE_ROWS, prefix=True), ["@@@"] * 20)
+    for name, (p50, p99) in results.items():
+        print(f"{name:34s} {p50:9.2f} {p99:9.2f}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
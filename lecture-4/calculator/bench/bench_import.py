@@ -0,0 +1,97 @@
+"""
+起動時間の計測（python -X importtime）
+
+それぞれの経路を新しいプロセスで --repeat 回起動し、次を表示する。
+- wall:   プロセスの起動から終了までの時間（中央値）
+- import: -X importtime が出力するトップレベルのモジュールの累計時間の合計（中央値）
+- +ms:    wall の python（インタープリタだけ）との差
+- app:    engine / calc / gui（とそこから読み込むモジュール）の読み込み時間（中央値。site などの起動時の読み込みを除く）
+- 重いモジュール上位（最後の1回の -X importtime の出力から）
+
+計測の前に1回起動して .pyc を作っておく（PYTHONDONTWRITEBYTECODE は外す）。
+
+経路:
+- python:       何も読み込まない（インタープリタ自体の起動時間）
+- engine:       import engine（ヘッドレスでの組み込み・テスト）
+- calc:         import calc（GUIを起動せずに読み込む。flet を読み込まないことも確認する）
+- cli:          python calc.py --keys "12 + 3.5 ="
+- gui:          import gui（GUIの起動までにかかる読み込み。flet が必要）
+
+    python bench/bench_import.py --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+APP_MODULES = ("engine", "calc", "gui")
+
+PATHS = (
+    ("python", ["-c", "pass"]),
+    ("engine", ["-c", "import engine"]),
+    ("calc", ["-c", "import calc, sys; assert 'flet' not in sys.modules, 'flet was imported'"]),
+    ("cli", ["calc.py", "--keys", "12 + 3.5 ="]),
+    ("gui", ["-c", "import gui"]),
+)
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力から (トップレベルの累計の合計, アプリのモジュールの累計, [(自身の時間, モジュール名)]) を返す（マイクロ秒）"""
+    total = app = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # 先頭の空白が1つならトップレベル（入れ子は2つずつ増える）
+            total += int(cumulative)
+            app += int(cumulative) if name.strip() in APP_MODULES else 0
+        modules.append((int(self_us), name.strip()))
+    return total, app, modules
+
+
+def measure(args, repeat):
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    walls, imports, apps, modules = [], [], [], []
+    for i in range(repeat + 1):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=SRC,
+                              capture_output=True, text=True, env=env)
+        wall = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        if i == 0:
+            continue  # .pyc を作るための1回目
+        total, app, modules = parse_importtime(proc.stderr)
+        walls.append(wall)
+        imports.append(total / 1000)
+        apps.append(app / 1000)
+    return (statistics.median(walls), statistics.median(imports), statistics.median(apps), modules), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=5, help="表示する重いモジュールの数")
+    args = parser.parse_args()
+
+    print(f"{'path':8s} {'wall ms':>9s} {'+ms':>7s} {'import ms':>10s} {'app ms':>8s}  heaviest modules (self ms)")
+    baseline = None
+    for name, command in PATHS:
+        result, error = measure(command, args.repeat)
+        if result is None:
+            print(f"{name:8s} failed: {error}")
+            continue
+        wall, imported, app, modules = result
+        baseline = wall if baseline is None else baseline
+        heaviest = ", ".join(f"{module} {us / 1000:.1f}" for us, module in sorted(modules, reverse=True)[:args.top])
+        print(f"{name:8s} {wall:9.1f} {wall - baseline:7.1f} {imported:10.1f} {app:8.2f}  {heaviest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+式の構文解析・コンパイル・評価の速さの計測（expression.py）
+
+ランダムな式（二項演算子・括弧・√ sin cos inv ² % ±・ネスト）を --pool 個作り、次の速さ（1秒あたりの式の数）を計る。
+- compile:    tokenize + parse + コンパイル（キャッシュなし。変数のない式なので値まで計算する）
+- compile x:  同じ式の数値の一部を変数 x にしたもの（lambda へのコンパイルを含む）
+- evaluate:   evaluate(text) を --count 回（--pool 個から一様に選ぶ。--pool が COMPILE_CACHE_SIZE 以下ならほぼキャッシュに当たる）
+- call x:     変数 x のある式のコンパイル済みの関数を x を変えて --count 回（CPython のバイトコードでの評価）
+- engine:     CalculatorEngine にキーを1つずつ押して "=" まで（GUI・--keys と同じ経路。--count / 100 回）
+
+計算できない値（0で割る・負の数の √ など）は例外を捕まえて数える。
+
+    python bench/bench_parser.py --count 5000000
+    python bench/bench_parser.py --pool 100000      # キャッシュに入りきらない場合
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import expression  # noqa: E402
+from engine import CalculatorEngine  # noqa: E402
+
+PREFIX = ("√", "sin", "cos", "inv", "±")
+POSTFIX = ("²", "%")
+BINARY = ("+", "−", "×", "÷", "^")
+
+
+def random_number(rng):
+    return str(rng.randint(0, 99)) if rng.random() < 0.7 else f"{rng.uniform(0, 100):.2f}"
+
+
+def random_expression(rng, depth=3):
+    """ランダムな式の文字列（depth はネストの深さの上限）"""
+    if depth == 0 or rng.random() < 0.3:
+        text = random_number(rng)
+    else:
+        text = random_expression(rng, depth - 1)
+        for _ in range(rng.randint(1, 3)):
+            op = rng.choice(BINARY)
+            rhs = rng.choice(("2", "3")) if op == "^" else random_expression(rng, depth - 1)
+            text = f"{text} {op} {rhs}"
+        if rng.random() < 0.4:
+            text = f"({text})"
+    roll = rng.random()
+    if roll < 0.15:
+        text = f"{rng.choice(PREFIX)}({text})"
+    elif roll < 0.25:
+        text = f"({text}){rng.choice(POSTFIX)}"
+    return text
+
+
+def keys_for(rng):
+    """エンジンに押すキーの並び（数値・演算子・括弧・関数を交互に）"""
+    keys = []
+    for i in range(rng.randint(2, 6)):
+        if i:
+            keys.append(rng.choice(("+", "−", "×", "÷")))
+        if rng.random() < 0.2:
+            keys.append("(")
+            keys.extend(random_number(rng))
+            keys.extend((rng.choice(("+", "×")), *random_number(rng), ")"))
+        else:
+            keys.extend(random_number(rng))
+        if rng.random() < 0.2:
+            keys.append(rng.choice(("√", "x²", "1/x", "sin", "cos", "%", "±")))
+    keys.append("=")
+    return keys
+
+
+def rate(count, seconds):
+    return f"{count / seconds:12,.0f} /s  {seconds / count * 1e6:7.3f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2_000_000, help="evaluate / call で評価する式の数")
+    parser.add_argument("--pool", type=int, default=1000, help="作る式の種類の数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = list(dict.fromkeys(random_expression(rng) for _ in range(args.pool)))
+    picks = [rng.randrange(len(pool)) for _ in range(args.count)]
+    print(f"{len(pool):,} distinct expressions (mean {sum(map(len, pool)) / len(pool):.0f} chars), "
+          f"{args.count:,} evaluations, cache size {expression.COMPILE_CACHE_SIZE:,}")
+
+    start = time.perf_counter()
+    for text in pool:
+        expression.Expression(text, expression.parse(text))
+    print(f"compile    {rate(len(pool), time.perf_counter() - start)}")
+
+    with_x = [re.sub(r"(?<![\d.])[1-9](?![\d.])", "x", text) for text in pool]
+    start = time.perf_counter()
+    compiled = [expression.Expression(text, expression.parse(text)) for text in with_x]
+    print(f"compile x  {rate(len(pool), time.perf_counter() - start)}  "
+          f"({sum(1 for e in compiled if e.variables) / len(compiled):.0%} have x)")
+
+    expression.compile_expression.cache_clear()
+    evaluate = expression.evaluate
+    texts = [pool[i] for i in picks]
+    errors = 0
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            evaluate(text)
+        except (ArithmeticError, ValueError):
+            errors += 1
+    elapsed = time.perf_counter() - start
+    info = expression.compile_expression.cache_info()
+    print(f"evaluate   {rate(args.count, elapsed)}  hit rate {info.hits / (info.hits + info.misses):.1%}, "
+          f"errors {errors / args.count:.1%}")
+
+    variable = [e.function for e in compiled if e.variables]
+    calls = [(variable[i % len(variable)], rng.uniform(-100, 100)) for i in picks]
+    start = time.perf_counter()
+    for function, x in calls:
+        try:
+            function(x)
+        except (ArithmeticError, ValueError):
+            pass
+    print(f"call x     {rate(args.count, time.perf_counter() - start)}")
+
+    presses = [keys_for(rng) for _ in range(max(1, args.count // 100))]
+    engine = CalculatorEngine()
+    start = time.perf_counter()
+    for keys in presses:
+        engine.press("AC")
+        engine.press_all(keys)
+    elapsed = time.perf_counter() - start
+    total_keys = sum(map(len, presses))
+    print(f"engine     {rate(len(presses), elapsed)}  ({total_keys / elapsed:,.0f} keys/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+記録したキー入力を GUI（gui.py の CalculatorApp）にヘッドレスで流し、キー1回ごとの時間と更新の大きさを計る
+
+ディスプレイも Flet のクライアントも使わない。Page を記録用の接続（RecordingConnection）につなぎ、
+Flet がソケットに送るはずのメッセージ（JSON）を組み立てて、そのバイト数を数える。
+キーはボタンの on_click と同じ CalculatorApp.button_clicked に渡す。
+
+- tracked: 今の button_clicked（値が変わった result / history だけを page.update()。
+           "=" では履歴パネルの変わった行も更新する）
+- full:    以前と同じく self.update() でコンテナ全体を更新する（履歴の保存も同じく行う）
+
+表示する値:
+- p50 / p90 / p99 / max: キー1回の時間（エンジンの計算 + 更新の組み立て + JSON にするまで。ミリ秒）
+- sent:   メッセージを送ったキーの割合（表示が変わらなければ送らない）
+- bytes:  キー1回あたりの送信バイト数（平均 / p99 / 合計）
+
+入力は1行に1つの計算（calc.py --keys と同じ書き方。行の前に AC を押す）。
+
+    python bench/replay_keys.py                                # bench/recorded_keys.txt を 200 回
+    python bench/replay_keys.py --keys-file session.txt --repeat 1
+    python bench/replay_keys.py --random 2000                  # ランダムなキー入力
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from flet.core.local_connection import LocalConnection  # noqa: E402
+from flet.core.page import Page  # noqa: E402
+from flet.core.protocol import (ClientActions, ClientMessage, CommandEncoder,  # noqa: E402
+                                PageCommandResponsePayload, PageCommandsBatchResponsePayload)
+
+import gui  # noqa: E402
+from bench_parser import keys_for  # noqa: E402
+from engine import parse_keys  # noqa: E402
+from history import HistoryStore  # noqa: E402
+
+KEYS_FILE = Path(__file__).resolve().parent / "recorded_keys.txt"
+
+
+class RecordingConnection(LocalConnection):
+    """Flet のソケットサーバー（flet_socket_server.py）と同じようにコマンドを処理し、送るはずの JSON を記録する"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send_command(self, session_id, command):
+        result, message = self._process_command(command)
+        if message:
+            self._send(message)
+        return PageCommandResponsePayload(result=result, error="")
+
+    def send_commands(self, session_id, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._send(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def _send(self, message):
+        self.sent.append(json.dumps(message, cls=CommandEncoder, separators=(",", ":")))
+
+
+def open_app():
+    """記録用の接続につないだ Page に GUI を作り、(CalculatorApp, 接続, キー → ボタン) を返す（履歴はメモリ上の SQLite）"""
+    conn = RecordingConnection()
+    page = Page(conn, "replay", loop=asyncio.new_event_loop())
+    gui.main(page, HistoryStore(":memory:"))
+    app = None
+    buttons = {}
+    stack = list(page.controls)
+    while stack:
+        control = stack.pop()
+        if isinstance(control, gui.CalculatorApp):
+            app = control
+        if isinstance(control, gui.CalcButton):
+            buttons[control.data] = control
+        stack.extend(control._get_children())
+    conn.sent.clear()
+    return app, conn, buttons
+
+
+def full_update(app, event):
+    # 以前の button_clicked（コンテナ全体の update）
+    app.engine.press(event.control.data)
+    app.result.value = app.engine.result
+    app.history.value = app.engine.history
+    app.update()
+
+
+def replay(mode, sessions, repeat):
+    """キー入力を流して [(時間ミリ秒, 送信バイト数)] を返す"""
+    app, conn, buttons = open_app()
+    handler = app.button_clicked if mode == "tracked" else lambda e: full_update(app, e)
+    events = {key: SimpleNamespace(control=button, data="") for key, button in buttons.items()}
+    samples = []
+    for _ in range(repeat):
+        for keys in sessions:
+            for key in ["AC", *keys]:
+                event = events[key]
+                start = time.perf_counter()
+                handler(event)
+                elapsed = (time.perf_counter() - start) * 1000
+                size = sum(len(message.encode()) for message in conn.sent)
+                conn.sent.clear()
+                samples.append((elapsed, size))
+    return samples
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys-file", type=Path, default=KEYS_FILE)
+    parser.add_argument("--random", type=int, metavar="N", help="記録の代わりにランダムなキー入力を N 行")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.random:
+        rng = random.Random(args.seed)
+        sessions = [keys_for(rng) for _ in range(args.random)]
+    else:
+        with open(args.keys_file, encoding="utf-8") as f:
+            sessions = [parse_keys(line) for line in f if line.strip()]
+    keystrokes = sum(len(keys) + 1 for keys in sessions) * args.repeat
+    print(f"{len(sessions)} sessions x {args.repeat}, {keystrokes:,} keystrokes")
+    print(f"{'mode':8s} {'p50 ms':>8s} {'p90':>7s} {'p99':>7s} {'max':>7s} {'sent':>6s} "
+          f"{'bytes avg':>10s} {'p99':>5s} {'total':>11s}")
+    for mode in ("full", "tracked"):
+        samples = replay(mode, sessions, args.repeat)
+        times = sorted(elapsed for elapsed, _ in samples)
+        sizes = sorted(size for _, size in samples)
+        sent = sum(1 for size in sizes if size) / len(sizes)
+        print(f"{mode:8s} {statistics.median(times):8.3f} {percentile(times, 0.9):7.3f} {percentile(times, 0.99):7.3f} "
+              f"{times[-1]:7.2f} {sent:6.0%} {statistics.mean(sizes):10.1f} {percentile(sizes, 0.99):5d} {sum(sizes):11,d}")
+
+
+if __name__ == "__main__":
+    main()
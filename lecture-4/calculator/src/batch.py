@@ -0,0 +1,194 @@
+"""
+電卓の関数・式を配列・範囲・ファイルの値にまとめて適用する（ルックアップテーブル作りなど）
+
+    from batch import apply, frange
+    for chunk in apply("√", frange(0, 100, 0.5)):
+        chunk.inputs, chunk.values, chunk.mask
+
+演算は関数のキー（√ x² 1/x sin cos % ±、別名 sqrt x^2 inv neg など）か、変数 x の式（"x^2 + 1"、書き方は expression.py）。
+
+NumPy があれば式を NumPy の配列演算（ベクトル化したカーネル）にコンパイルし、
+なければ式を Python の lambda にコンパイルしてチャンクごとに map で適用する（pip install numpy で速くなる）。
+計算できない値（負の数の √・0 で割る・オーバーフローなど）は "Error" の文字列ではなく、
+mask が True の要素として返す（値は nan。numpy.ma.masked_array(chunk.values, chunk.mask) にもできる）。
+入力はチャンク（既定 65536 個）ずつ作る・読むので、メモリの使用量は入力の長さによらず一定。
+"""
+
+import math
+from array import array
+from collections import namedtuple
+from itertools import islice
+
+import expression
+from engine import KEY_ALIASES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CHUNK_SIZE = 65536
+
+# 関数のキー → 変数 x の式
+OPERATIONS = {
+    "√": "√x",
+    "x²": "x²",
+    "1/x": "1/x",
+    "sin": "sin x",
+    "cos": "cos x",
+    "%": "x%",
+    "±": "-x",
+}
+
+# inputs は入力、values は結果（計算できない要素は nan）、mask は計算できなかった要素が True
+# （NumPy なら3つとも ndarray、なければ array('d') / array('d') / bytearray）
+Chunk = namedtuple("Chunk", "inputs values mask")
+
+
+def resolve(operation):
+    """関数のキー（別名を含む）を式に変換し、それ以外はそのまま式として返す"""
+    key = KEY_ALIASES.get(operation.lower(), operation)
+    return OPERATIONS.get(key, operation)
+
+
+def _numpy_namespace():
+    return {
+        "__builtins__": {},
+        "_pow": np.power,
+        "_sqrt": np.sqrt,
+        "_sin": lambda degrees: np.sin(np.radians(degrees)),
+        "_cos": lambda degrees: np.cos(np.radians(degrees)),
+    }
+
+
+class Kernel:
+    """式を1チャンク分の入力にまとめて適用する関数（NumPy があればベクトル化する）"""
+
+    def __init__(self, operation, use_numpy=None):
+        self.source = resolve(operation)
+        self.tree = expression.parse(self.source)
+        names = expression.variables(self.tree)
+        if names not in ((), ("x",)):
+            raise expression.ExpressionError(f"Only the variable x can be used: {', '.join(names)}")
+        self.numpy = np is not None if use_numpy is None else use_numpy
+        if self.numpy and np is None:
+            raise RuntimeError("NumPy is not installed")
+        namespace = _numpy_namespace() if self.numpy else None
+        self.function = expression.to_function(self.tree, ("x",), namespace)
+
+    def __call__(self, inputs):
+        return self._numpy(inputs) if self.numpy else self._python(inputs)
+
+    def _numpy(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float64)
+        with np.errstate(all="ignore"):
+            try:
+                values = np.broadcast_to(self.function(inputs), inputs.shape).astype(np.float64)
+            except (ArithmeticError, ValueError):
+                values = np.full(inputs.shape, np.nan)  # 定数の部分が計算できない（1/0 など）
+        mask = ~np.isfinite(values)
+        values[mask] = np.nan
+        return Chunk(inputs, values, mask)
+
+    def _python(self, inputs):
+        inputs = array("d", inputs)
+        function = self.function
+        try:
+            values = array("d", map(function, inputs))
+        except (ArithmeticError, ValueError):
+            # 計算できない要素があるチャンクだけ1つずつ計算し直す
+            values = array("d", [_safe(function, x) for x in inputs])
+        mask = bytearray(not finite for finite in map(math.isfinite, values))
+        if any(mask):
+            for i in (i for i, masked in enumerate(mask) if masked):
+                values[i] = math.nan
+        return Chunk(inputs, values, mask)
+
+
+def _safe(function, x):
+    try:
+        return function(x)
+    except (ArithmeticError, ValueError):
+        return math.nan
+
+
+def apply(operation, chunks, use_numpy=None):
+    """入力のチャンク（frange・read_numbers・chunked）ごとに演算を適用した Chunk を順に返す"""
+    kernel = Kernel(operation, use_numpy)
+    for inputs in chunks:
+        yield kernel(inputs)
+
+
+def apply_all(operation, values, use_numpy=None):
+    """配列全体に演算を適用して (values, mask) を返す（結果は入力と同じ長さ）"""
+    chunk = Kernel(operation, use_numpy)(values)
+    return chunk.values, chunk.mask
+
+
+def chunked(values, size=CHUNK_SIZE):
+    """配列・リスト・イテレータを size 個ずつのチャンクに分ける"""
+    if hasattr(values, "__getitem__") and hasattr(values, "__len__"):
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+        return
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def frange(start, stop, step=1.0, size=CHUNK_SIZE, use_numpy=None):
+    """start から stop の手前まで step 刻みの値を size 個ずつのチャンクで返す（誤差がたまらないよう start + step * i で計算）"""
+    if step == 0:
+        raise ValueError("step must not be zero")
+    count = max(0, math.ceil((stop - start) / step))
+    numpy = np is not None if use_numpy is None else use_numpy
+    for first in range(0, count, size):
+        last = min(first + size, count)
+        if numpy:
+            yield np.arange(first, last, dtype=np.float64) * step + start
+        else:
+            yield array("d", [start + step * i for i in range(first, last)])
+
+
+def read_numbers(lines, size=CHUNK_SIZE):
+    """1行に1つの数値（空行は読み飛ばす）を size 個ずつのチャンクで返す"""
+    chunk = array("d")
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            chunk.append(float(line))
+        except ValueError:
+            raise ValueError(f"line {number}: not a number: {line!r}") from None
+        if len(chunk) == size:
+            yield chunk
+            chunk = array("d")
+    if chunk:
+        yield chunk
+
+
+def _format(values):
+    # 整数になる値は int にして表示する（format_number と同じ。1e21 は桁をすべて、-0.0 は 0 と表示する）
+    return [str(int(value)) if value % 1 == 0 else repr(value) for value in values]
+
+
+def write_table(chunks, out, masked="", inputs=True):
+    """Chunk を「入力<TAB>結果」の行（inputs=False なら結果だけ）で書き込み、(行数, 計算できなかった数) を返す"""
+    rows = errors = 0
+    for chunk in chunks:
+        results = _format(chunk.values.tolist())
+        bad = [i for i, flag in enumerate(chunk.mask.tolist() if hasattr(chunk.mask, "tolist") else chunk.mask) if flag]
+        for i in bad:
+            results[i] = masked
+        if inputs:
+            results = map("\t".join, zip(_format(chunk.inputs.tolist()), results))
+        text = "\n".join(results)
+        if text:
+            out.write(text + "\n")
+        rows += len(chunk.values)
+        errors += len(bad)
+    return rows, errors
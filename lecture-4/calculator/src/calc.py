@@ -1,321 +1,181 @@
-import flet as ft
-import math
-
-
-class CalcButton(ft.ElevatedButton):
-    def __init__(self, text, button_clicked, expand=1):
-        super().__init__()
-        self.text = text
-        self.expand = expand
-        self.on_click = button_clicked
-        self.data = text
-        self.height = 60
-        self.content = ft.Text(
-            text, 
-            size=20, 
-            weight=ft.FontWeight.W_500,
-            text_align=ft.TextAlign.CENTER
-        )
-
-
-class DigitButton(CalcButton):
-    def __init__(self, text, button_clicked, expand=1):
-        CalcButton.__init__(self, text, button_clicked, expand)
-        self.bgcolor = ft.Colors.GREY_800
-        self.color = ft.Colors.WHITE
-        self.style = ft.ButtonStyle(
-            shape=ft.RoundedRectangleBorder(radius=15),
-            elevation=3,
-            animation_duration=100,
-        )
-
-
-class ActionButton(CalcButton):
-    def __init__(self, text, button_clicked):
-        CalcButton.__init__(self, text, button_clicked)
-        self.bgcolor = ft.Colors.ORANGE_600
-        self.color = ft.Colors.WHITE
-        self.style = ft.ButtonStyle(
-            shape=ft.RoundedRectangleBorder(radius=15),
-            elevation=5,
-            animation_duration=100,
-        )
-
-
-class ExtraActionButton(CalcButton):
-    def __init__(self, text, button_clicked):
-        CalcButton.__init__(self, text, button_clicked)
-        self.bgcolor = ft.Colors.GREY_600
-        self.color = ft.Colors.WHITE
-        self.style = ft.ButtonStyle(
-            shape=ft.RoundedRectangleBorder(radius=15),
-            elevation=3,
-            animation_duration=100,
-        )
-
-
-class SciCalcButton(CalcButton):
-    def __init__(self, text, button_clicked):
-        CalcButton.__init__(self, text, button_clicked)
-        self.bgcolor = ft.Colors.BLUE_700
-        self.color = ft.Colors.WHITE
-        self.style = ft.ButtonStyle(
-            shape=ft.RoundedRectangleBorder(radius=15),
-            elevation=4,
-            animation_duration=100,
-        )
-
-
-class CalculatorApp(ft.Container):
-    # application's root control (i.e. "view") containing all other controls
-    def __init__(self):
-        super().__init__()
-        self.reset()
-
-        self.result = ft.Text(
-            value="0", 
-            color=ft.Colors.WHITE, 
-            size=36,
-            weight=ft.FontWeight.W_300,
-            text_align=ft.TextAlign.RIGHT
-        )
-        self.history = ft.Text(
-            value="", 
-            color=ft.Colors.GREY_400, 
-            size=16,
-            text_align=ft.TextAlign.RIGHT
-        )
-        self.width = 450
-        self.bgcolor = ft.Colors.GREY_900
-        self.border_radius = ft.border_radius.all(25)
-        self.padding = 25
-        self.shadow = ft.BoxShadow(
-            spread_radius=1,
-            blur_radius=15,
-            color=ft.Colors.BLACK26,
-            offset=ft.Offset(0, 8),
-        )
-        self.content = ft.Column(
-            controls=[
-                ft.Container(
-                    content=ft.Column([
-                        ft.Row(controls=[self.history], alignment="end"),
-                        ft.Row(controls=[self.result], alignment="end"),
-                    ]),
-                    height=100,
-                    padding=ft.padding.all(15),
-                    bgcolor=ft.Colors.GREY_800,
-                    border_radius=ft.border_radius.all(15),
-                    margin=ft.margin.only(bottom=20)
-                ),
-                ft.Row(
-                    controls=[
-                        SciCalcButton(text="√", button_clicked=self.button_clicked),#平方根計算
-                        SciCalcButton(text="x²", button_clicked=self.button_clicked),#二乗計算
-                        SciCalcButton(text="1/x", button_clicked=self.button_clicked),#逆数計算
-                        SciCalcButton(text="sin", button_clicked=self.button_clicked),#正弦計算
-                        SciCalcButton(text="cos", button_clicked=self.button_clicked),#余弦計算
-                    ],
-                    spacing=8
-                ),
-                ft.Row(
-                    controls=[
-                        ExtraActionButton(text="AC", button_clicked=self.button_clicked),
-                        ExtraActionButton(text="⌫", button_clicked=self.button_clicked),
-                        ExtraActionButton(text="%", button_clicked=self.button_clicked),
-                        ActionButton(text="÷", button_clicked=self.button_clicked),
-                    ],
-                    spacing=8
-                ),
-                ft.Row(
-                    controls=[
-                        DigitButton(text="7", button_clicked=self.button_clicked),
-                        DigitButton(text="8", button_clicked=self.button_clicked),
-                        DigitButton(text="9", button_clicked=self.button_clicked),
-                        ActionButton(text="×", button_clicked=self.button_clicked),
-                    ],
-                    spacing=8
-                ),
-                ft.Row(
-                    controls=[
-                        DigitButton(text="4", button_clicked=self.button_clicked),
-                        DigitButton(text="5", button_clicked=self.button_clicked),
-                        DigitButton(text="6", button_clicked=self.button_clicked),
-                        ActionButton(text="−", button_clicked=self.button_clicked),
-                    ],
-                    spacing=8
-                ),
-                ft.Row(
-                    controls=[
-                        DigitButton(text="1", button_clicked=self.button_clicked),
-                        DigitButton(text="2", button_clicked=self.button_clicked),
-                        DigitButton(text="3", button_clicked=self.button_clicked),
-                        ActionButton(text="+", button_clicked=self.button_clicked),
-                    ],
-                    spacing=8
-                ),
-                ft.Row(
-                    controls=[
-                        ExtraActionButton(text="±", button_clicked=self.button_clicked),
-                        DigitButton(text="0", button_clicked=self.button_clicked),
-                        DigitButton(text=".", button_clicked=self.button_clicked),
-                        ActionButton(text="=", button_clicked=self.button_clicked),
-                    ],
-                    spacing=8
-                ),
-            ],
-            spacing=12,
-            tight=True
-        )
-
-    def button_clicked(self, e):
-        data = e.control.data
-        print(f"Button clicked with data = {data}")
-        
-        # エラー状態またはAC（全クリア）
-        if self.result.value == "Error" or data == "AC":
-            self.result.value = "0"
-            self.history.value = ""
-            self.reset()
-
-        # バックスペース機能
-        elif data == "⌫":
-            if len(self.result.value) > 1:
-                self.result.value = self.result.value[:-1]
-            else:
-                self.result.value = "0"
-
-        # 数字と小数点の入力
-        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
-            if data == "." and "." in self.result.value:
-                return  # 既に小数点がある場合は追加しない
-            if self.result.value == "0" or self.new_operand:
-                self.result.value = data if data != "." else "0."
-                self.new_operand = False
-            else:
-                self.result.value = self.result.value + data
-
-        # 四則演算
-        elif data in ("+", "−", "×", "÷"):
-            # 履歴表示の更新
-            if not self.new_operand:
-                self.history.value = f"{self.result.value} {data}"
-            
-            self.result.value = self.calculate(
-                self.operand1, float(self.result.value), self.operator
-            )
-            self.operator = data
-            if self.result.value == "Error":
-                self.operand1 = "0"
-            else:
-                self.operand1 = float(self.result.value)
-            self.new_operand = True
-
-        # 等号（計算実行）
-        elif data == "=":
-            if not self.new_operand:
-                self.history.value = f"{self.history.value} {self.result.value} ="
-            self.result.value = self.calculate(
-                self.operand1, float(self.result.value), self.operator
-            )
-            self.reset()
-
-        # パーセント
-        elif data == "%":
-            self.result.value = self.format_number(float(self.result.value) / 100)
-            self.reset()
-
-        # プラスマイナス切り替え
-        elif data == "±":
-            if float(self.result.value) > 0:
-                self.result.value = "-" + str(self.result.value)
-            elif float(self.result.value) < 0:
-                self.result.value = str(self.format_number(abs(float(self.result.value))))
-
-        # 科学計算機能
-        elif data == "√":
-            try:
-                value = float(self.result.value)
-                if value < 0:
-                    self.result.value = "Error"
-                else:
-                    self.history.value = f"√({self.result.value})"
-                    self.result.value = self.format_number(math.sqrt(value))
-            except:
-                self.result.value = "Error"
-            self.reset()
-
-        elif data == "x²":
-            self.history.value = f"({self.result.value})²"
-            self.result.value = self.format_number(float(self.result.value) ** 2)
-            self.reset()
-
-        elif data == "1/x":
-            if float(self.result.value) == 0:
-                self.result.value = "Error"
-            else:
-                self.history.value = f"1/({self.result.value})"
-                self.result.value = self.format_number(1 / float(self.result.value))
-            self.reset()
-
-        elif data == "sin":
-            self.history.value = f"sin({self.result.value})"
-            self.result.value = self.format_number(math.sin(math.radians(float(self.result.value))))
-            self.reset()
-
-        elif data == "cos":
-            self.history.value = f"cos({self.result.value})"
-            self.result.value = self.format_number(math.cos(math.radians(float(self.result.value))))
-            self.reset()
-
-        self.update()
-
-    def format_number(self, num):
-        if num % 1 == 0:
-            return int(num)
+"""
+電卓の起動スクリプト
+
+引数なしで GUI（gui.py、Flet）を起動する。flet は GUI を起動するときにだけ読み込むので、
+--keys / --expr / --batch のコマンドラインモードや `import calc` は Flet なしで数ミリ秒で始まる。
+
+    python src/calc.py                              # GUI
+    python src/calc.py --debug                      # GUI（押されたキーをログに出す）
+    python src/calc.py --keys "12 + 3.5 ="          # -> 15.5
+    python src/calc.py --expr "2 + 3 * (4 - 1)^2"   # -> 29
+    printf '2 sqrt\\n1 / 8 =\\n' | python src/calc.py --batch
+    python src/calc.py --batch inputs.txt --history
+    python src/calc.py --batch exprs.txt --input expr
+    python src/calc.py --apply sqrt --range 0 100 0.5         # 入力<TAB>結果 の表
+    python src/calc.py --apply "x^2 + 1" --numbers inputs.txt
+    python src/calc.py --search "3.5"                         # GUI で保存した計算履歴を検索
+
+--keys の入力はボタンの並びを空白で区切ったもの（別名: - * / sqrt x^2 inv +/- back c）で、
+最後に = がなければ押したものとして計算する。--expr の書き方は expression.py を参照。
+--batch は1行を1つの計算として（行ごとに AC から）結果を1行ずつ出力する（--input expr なら1行が1つの式）。
+--apply は関数のキーか変数 x の式を、範囲またはファイル（省略時は標準入力）の1行1つの数値にまとめて適用する
+（batch.py。チャンクずつ読み書きし、計算できない値は --masked の文字列（既定は空）にする）。
+--search は GUI で保存した計算履歴（history.py）を新しい順に「式 =<TAB>結果」で出力する（--prefix で式の前方一致）。
+"""
+
+import sys
+
+from engine import CalculatorEngine, parse_keys
+from expression import ExpressionError, calculate, compile_expression
+
+# `from calc import CalculatorApp` などは gui.py から遅延して読み込む
+GUI_NAMES = ("CalculatorApp", "CalcButton", "DigitButton", "ActionButton",
+             "ExtraActionButton", "SciCalcButton", "HistoryPanel", "HistoryRow", "main")
+
+
+def __getattr__(name):
+    if name in GUI_NAMES:
+        import gui
+        return getattr(gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def run_gui(debug=False):
+    if debug:
+        import logging
+        logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+        logging.getLogger("calculator").setLevel(logging.DEBUG)  # flet 自身のデバッグログは出さない
+
+    import flet as ft
+
+    import gui
+    ft.app(target=gui.main)
+
+
+def evaluate(text, history=False):
+    """1行分のキー入力を計算して出力する文字列を返す"""
+    engine = CalculatorEngine()
+    try:
+        engine.press_all(parse_keys(text))
+    except ValueError as e:
+        return f"Error: {e}"
+    engine.finish()
+    if history:
+        return f"{engine.history}\t{engine.result}"
+    return engine.result
+
+
+def evaluate_expression(text, history=False):
+    """1行分の式を計算して出力する文字列を返す"""
+    text = text.strip()
+    try:
+        compile_expression(text)
+    except ExpressionError as e:
+        return f"Error: {e}"
+    if history:
+        return f"{text} =\t{calculate(text)}"
+    return calculate(text)
+
+
+def run_batch(lines, out, history=False, expressions=False):
+    """各行を計算して結果を out に書き込み、エラーになった行数を返す"""
+    errors = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        result = (evaluate_expression if expressions else evaluate)(line, history)
+        errors += result.startswith("Error")
+        out.write(result + "\n")
+    return errors
+
+
+def run_apply(args, parser):
+    """--apply: 範囲・ファイルの数値に演算をまとめて適用して表を出力する"""
+    import batch
+
+    use_numpy = False if args.no_numpy else None
+    if args.range is not None:
+        if len(args.range) not in (2, 3):
+            parser.error("--range takes START STOP [STEP]")
+        return write_applied(batch, args, batch.frange(*args.range, size=args.chunk_size, use_numpy=use_numpy), use_numpy)
+    if args.numbers in (None, "-"):
+        return write_applied(batch, args, batch.read_numbers(sys.stdin, args.chunk_size), use_numpy)
+    with open(args.numbers, encoding="utf-8") as f:
+        return write_applied(batch, args, batch.read_numbers(f, args.chunk_size), use_numpy)
+
+
+def write_applied(batch, args, chunks, use_numpy):
+    try:
+        results = batch.apply(args.apply, chunks, use_numpy)
+        rows, errors = batch.write_table(results, sys.stdout, args.masked, inputs=not args.values_only)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{rows} values, {errors} masked", file=sys.stderr)
+    return 0
+
+
+def run_search(args):
+    """--search: 保存した計算履歴を検索して出力する"""
+    from history import HistoryStore
+
+    store = HistoryStore()
+    try:
+        for entry in store.search(args.search.strip(), args.limit, prefix=args.prefix):
+            print(f"{entry.expression} =\t{entry.result}")
+    finally:
+        store.close()
+    return 0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", help="1つの計算を実行して結果を表示")
+    parser.add_argument("--expr", help="1つの式を計算して結果を表示")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="ファイル（省略時は標準入力）の各行を計算")
+    parser.add_argument("--input", choices=("keys", "expr"), default="keys",
+                        help="--batch の各行の書き方（キーの並び / 式）")
+    parser.add_argument("--history", action="store_true", help="履歴の表示もタブ区切りで出力")
+    parser.add_argument("--apply", metavar="OP", help="関数のキー（sqrt x^2 inv sin cos % neg）か変数 x の式をまとめて適用")
+    parser.add_argument("--range", nargs="+", type=float, metavar="N", help="--apply の入力: START STOP [STEP]")
+    parser.add_argument("--numbers", nargs="?", const="-", metavar="FILE",
+                        help="--apply の入力: 1行1つの数値のファイル（省略時は標準入力）")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="--apply で一度に計算する数")
+    parser.add_argument("--masked", default="", help="--apply で計算できない値の代わりに出力する文字列")
+    parser.add_argument("--values-only", action="store_true", help="--apply で入力の列を出力しない")
+    parser.add_argument("--no-numpy", action="store_true", help="--apply で NumPy を使わない")
+    parser.add_argument("--search", metavar="TEXT", help="保存した計算履歴を検索（空文字列なら最近の履歴）")
+    parser.add_argument("--prefix", action="store_true", help="--search を式の前方一致にする")
+    parser.add_argument("--limit", type=int, default=20, help="--search で出力する件数")
+    parser.add_argument("--debug", action="store_true", help="GUI で押されたキーなどのデバッグログを表示")
+    args = parser.parse_args(argv)
+
+    if args.apply is not None:
+        return run_apply(args, parser)
+    if args.search is not None:
+        return run_search(args)
+
+    if args.keys is not None or args.expr is not None:
+        if args.keys is not None:
+            result = evaluate(args.keys, args.history)
         else:
-            return num
-
-    def calculate(self, operand1, operand2, operator):
-        try:
-            if operator == "+":
-                return self.format_number(operand1 + operand2)
-            elif operator == "−":
-                return self.format_number(operand1 - operand2)
-            elif operator == "×":
-                return self.format_number(operand1 * operand2)
-            elif operator == "÷":
-                if operand2 == 0:
-                    return "Error"
-                else:
-                    return self.format_number(operand1 / operand2)
-        except:
-            return "Error"
-
-    def reset(self):
-        self.operator = "+"
-        self.operand1 = 0
-        self.new_operand = True
-
-
-def main(page: ft.Page):
-    page.title = "🔢 Beautiful Calculator"
-    page.bgcolor = ft.Colors.GREY_100
-    page.window.width = 500
-    page.window.height = 700
-    page.window.resizable = False
-    page.padding = 20
-    
-    # create application instance
-    calc = CalculatorApp()
-
-    # add application's root control to the page with centering
-    page.add(
-        ft.Container(
-            content=calc,
-            alignment=ft.alignment.center,
-        )
-    )
-
-
-ft.app(target=main)
\ No newline at end of file
+            result = evaluate_expression(args.expr, args.history)
+        print(result)
+        return 1 if result.startswith("Error") else 0
+    if args.batch is not None:
+        expressions = args.input == "expr"
+        if args.batch == "-":
+            errors = run_batch(sys.stdin, sys.stdout, args.history, expressions)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                errors = run_batch(f, sys.stdout, args.history, expressions)
+        return 1 if errors else 0
+    run_gui(args.debug)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
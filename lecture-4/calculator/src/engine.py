@@ -0,0 +1,242 @@
+"""
+電卓の入力エンジン（Fletに依存しない）
+
+ボタン入力を1つずつ受け取って式を組み立て、"=" で expression.py に計算させる（掛け算・割り算が先、括弧も使える）。
+GUI（gui.py）・コマンドライン（calc.py --keys / --batch）・テストや他のプログラムへの組み込みで共通に使う。
+標準ライブラリだけを読み込むので、import は数ミリ秒で終わる。
+
+    from engine import CalculatorEngine
+    calc = CalculatorEngine()
+    calc.press_all(["1", "2", "+", "3", "×", "2", "="])   # -> "18"
+"""
+
+import re
+
+from expression import calculate, format_number  # noqa: F401  format_number は engine からも使えるようにしておく
+
+DIGITS = ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", ".")
+OPERATORS = ("+", "−", "×", "÷")
+FUNCTIONS = ("√", "x²", "1/x", "sin", "cos", "%", "±")
+PARENTHESES = ("(", ")")
+KEYS = DIGITS + OPERATORS + FUNCTIONS + PARENTHESES + ("=", "AC", "⌫")
+
+# キーボードで入力しやすい別名（コマンドライン用）
+KEY_ALIASES = {
+    "-": "−",
+    "*": "×",
+    "x": "×",
+    "/": "÷",
+    "sqrt": "√",
+    "x^2": "x²",
+    "sq": "x²",
+    "inv": "1/x",
+    "+/-": "±",
+    "neg": "±",
+    "back": "⌫",
+    "bs": "⌫",
+    "c": "AC",
+    "ac": "AC",
+}
+
+# 入力中の数値（"0." や ± を付けた "-12" を含む）
+NUMBER_RE = re.compile(r"-?\d+\.?\d*")
+
+
+def parse_keys(text):
+    """'12 + 3.5 =' のような空白区切りの入力をキーの並びに変換（数値は1文字ずつのキーにする）"""
+    keys = []
+    for token in text.split():
+        key = KEY_ALIASES.get(token.lower(), token)
+        if key in KEYS:
+            keys.append(key)
+        elif all(c in DIGITS for c in token):
+            keys.extend(token)
+        else:
+            raise ValueError(f"Unknown key: {token!r}")
+    return keys
+
+
+def _grouped(item):
+    """項全体が1組の括弧で囲まれているか（"(1 + 2)" は True、"(1) + (2)" は False）"""
+    if not (item.startswith("(") and item.endswith(")")):
+        return False
+    depth = 0
+    for i, c in enumerate(item):
+        depth += (c == "(") - (c == ")")
+        if depth == 0:
+            return i == len(item) - 1
+    return False
+
+
+def _argument(item):
+    return item if _grouped(item) else f"({item})"
+
+
+def _atom(item):
+    # 負の数に後置の ² や % を付けるときは括弧で囲む（-9² は -(9²) になるため）
+    return f"({item})" if item.startswith("-") else item
+
+
+# 関数のキー → 項の書き換え
+APPLY = {
+    "√": lambda item: f"√{_argument(item)}",
+    "sin": lambda item: f"sin{_argument(item)}",
+    "cos": lambda item: f"cos{_argument(item)}",
+    "1/x": lambda item: f"(1/{_atom(item)})",
+    "x²": lambda item: f"{_atom(item)}²",
+    "%": lambda item: f"{_atom(item)}%",
+}
+
+
+def _negate(item, first):
+    if item.startswith("(-") and _grouped(item):
+        return item[2:-1]
+    if item.startswith("-"):
+        return item[1:]
+    return f"-{item}" if first else f"(-{item})"
+
+
+def _render(items):
+    return "".join(f" {item} " if item in OPERATORS else item for item in items)
+
+
+class CalculatorEngine:
+    """ボタン入力から式を組み立てる電卓の状態（表示中の値 result と履歴 history は文字列）
+
+    items は入力中の式を項（数値、閉じた括弧、関数を適用したもの）・演算子・開き括弧に分けたもの。
+    入力中は result に式を、"=" の後は計算結果を、history に計算した式を表示する。
+    on_calculate を設定すると、計算するたびに (式, 結果) で呼ばれる（履歴の保存など）。
+    """
+
+    def __init__(self, on_calculate=None):
+        self.result = "0"
+        self.history = ""
+        self.on_calculate = on_calculate
+        self.reset()
+
+    def reset(self):
+        self.items = []
+        self.done = False  # "=" の直後（result が計算結果）
+
+    @property
+    def expression(self):
+        """入力中の式（expression.py で計算できる書き方）"""
+        return _render(self.items)
+
+    def press_all(self, keys):
+        for key in keys:
+            self.press(key)
+        return self.result
+
+    def press(self, data):
+        """キーを1つ入力して、表示中の値を返す（計算できない値は "Error" になる）"""
+        if data not in KEYS:
+            raise ValueError(f"Unknown key: {data!r}")
+        self._press(data)
+        return self.result
+
+    def recall(self, expression, result):
+        """履歴の計算を "=" の直後の状態として呼び出す（続けて演算子を押すと結果から続ける）"""
+        self.reset()
+        self.history = f"{expression} ="
+        self.result = result
+        self.done = result != "Error"
+        return self.result
+
+    def finish(self):
+        """入力中の式があれば "=" を押したときと同じく計算して、表示中の値を返す"""
+        if self.items:
+            self._press("=")
+        return self.result
+
+    def _press(self, data):
+        # エラー状態またはAC（全クリア）
+        if self.result == "Error" or data == "AC":
+            self.result = "0"
+            self.history = ""
+            self.reset()
+            return
+
+        # 等号（計算実行）
+        if data == "=":
+            self._calculate()
+            return
+
+        # 計算結果の後に演算子・関数・⌫を押したら結果から続け、それ以外は新しい式を始める
+        if self.done:
+            carry = data in OPERATORS or data in FUNCTIONS or data == "⌫"
+            self.reset()
+            if carry:
+                self.items.append(self.result)
+
+        last = self.items[-1] if self.items else None
+        operand = last is not None and last not in OPERATORS and last != "("
+
+        # バックスペース機能（数値は1文字、それ以外は項・演算子・括弧ごと消す）
+        if data == "⌫":
+            if last is not None and NUMBER_RE.fullmatch(last) and len(last.lstrip("-")) > 1:
+                self.items[-1] = last[:-1]
+            elif last is not None:
+                self.items.pop()
+
+        # 数字と小数点の入力
+        elif data in DIGITS:
+            if operand and NUMBER_RE.fullmatch(last):
+                if data == "." and "." in last:
+                    return  # 既に小数点がある場合は追加しない
+                if last.lstrip("-") == "0" and data != ".":
+                    last = last[:-1]
+                self.items[-1] = last + data
+            else:
+                if operand:
+                    self.items.pop()  # 関数を適用した項の後の数字は新しい数値にする
+                self.items.append("0." if data == "." else data)
+
+        # 四則演算
+        elif data in OPERATORS:
+            if last in OPERATORS:
+                self.items[-1] = data
+            elif last is None or operand:
+                self.items.extend(["0", data] if last is None else [data])
+
+        # 括弧（数値の直後の "(" は掛け算にする）
+        elif data == "(":
+            if operand:
+                self.items.append("×")
+            self.items.append("(")
+
+        elif data == ")":
+            if not operand or "(" not in self.items:
+                return
+            start = len(self.items) - 1 - self.items[::-1].index("(")
+            group = f"({_render(self.items[start + 1:])})"
+            del self.items[start:]
+            self.items.append(group)
+
+        # プラスマイナス切り替え
+        elif data == "±":
+            if operand and last not in ("0", "0."):
+                self.items[-1] = _negate(last, len(self.items) == 1)
+
+        # 科学計算機能とパーセント（直前の項に適用する）
+        elif last is None or operand:
+            if last is None:
+                self.items.append("0")
+            self.items[-1] = APPLY[data](self.items[-1])
+
+        self.result = self.expression or "0"
+
+    def _calculate(self):
+        # 末尾の演算子・開き括弧は除き、閉じていない括弧は閉じて計算する
+        items = list(self.items)
+        while items and (items[-1] in OPERATORS or items[-1] == "("):
+            items.pop()
+        if self.done or not items:
+            return
+        text = _render(items) + ")" * items.count("(")
+        self.history = f"{text} ="
+        self.result = calculate(text)
+        self.reset()
+        self.done = True
+        if self.on_calculate is not None:
+            self.on_calculate(text, self.result)
@@ -0,0 +1,290 @@
+"""
+電卓の式の字句解析・構文解析・コンパイル
+
+    >>> evaluate("2 + 3 × 4")
+    14.0
+    >>> calculate("√(9) + 1/(4)²")
+    '3.0625'
+    >>> evaluate("x^2 + 1", x=3)
+    10.0
+
+文法（優先順位の低い順）:
+- 二項演算子 + −（-）, × ÷（* /）（左結合）, ^（**）（右結合。単項マイナスより強い: -2^2 = -4）
+- 前置: - + ±（符号反転）, √ sqrt sin cos inv（sin・cos は度数法）
+- 後置: ²（二乗）, %（100で割る）
+- 括弧、数値（1.5 / .5 / 1e3）、変数（関数名以外の名前。2x ではなく 2 * x と書く）
+
+sin(30)² のように関数の直後が括弧なら、後置演算子は関数の結果にかかる。
+
+構文解析は優先順位上昇法（precedence climbing）でタプルの構文木を作る。
+変数のない式はコンパイル時に構文木をたどって値まで計算しておき（電卓の入力はすべてこれ）、
+変数のある式は Python の式に変換して lambda にコンパイルする（CPython のバイトコードで実行され、値を変えて何度も呼べる）。
+コンパイル結果は compile_expression() の LRU キャッシュで使い回す。
+"""
+
+import math
+import operator
+import re
+from functools import lru_cache
+
+COMPILE_CACHE_SIZE = 4096
+
+# 表示用の記号 → 構文解析で使う記号
+SYMBOLS = {"−": "-", "×": "*", "÷": "/", "**": "^", "√": "sqrt", "±": "neg"}
+
+# (優先順位, 右結合か)
+BINARY = {"+": (1, False), "-": (1, False), "*": (2, False), "/": (2, False), "^": (4, True)}
+PREFIX_PRECEDENCE = 3
+PREFIX = {"-": "neg", "+": "pos", "neg": "neg"}
+FUNCTIONS = ("sqrt", "sin", "cos", "inv")
+POSTFIX = {"²": "sq", "%": "pct"}
+
+# 数値 / 名前 / 演算子・括弧 / それ以外の文字（誤り）。空白は読み飛ばす
+TOKEN_RE = re.compile(r"""
+    ((?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | ([A-Za-z_][A-Za-z_0-9]*)
+  | (\*\*|[-+*/^()%²√−×÷±])
+  | (\S)
+""", re.VERBOSE)
+
+
+class ExpressionError(ValueError):
+    """式の書き方の誤り（計算できない値は ZeroDivisionError・ValueError・OverflowError になる）"""
+
+
+def tokenize(text):
+    """式を (種類, 値) のリストに分割（種類は 'number' / 'name' / 'op'）"""
+    tokens = []
+    for number, name, op, other in TOKEN_RE.findall(text):
+        if number:
+            tokens.append(("number", number))
+        elif name:
+            tokens.append(("name", SYMBOLS.get(name, name)))
+        elif op:
+            tokens.append(("op", SYMBOLS.get(op, op)))
+        else:
+            raise ExpressionError(f"Unexpected character {other!r}")
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][1] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        if self.peek() != value:
+            found = self.peek() or "end of expression"
+            raise ExpressionError(f"Expected {value!r} but found {found!r}")
+        self.pos += 1
+
+    def expression(self, min_precedence=1):
+        """min_precedence 以上の二項演算子をまとめる（優先順位上昇法）"""
+        node = self.unary()
+        while self.peek() in BINARY:
+            precedence, right = BINARY[self.peek()]
+            if precedence < min_precedence:
+                break
+            op = self.take()[1]
+            rhs = self.expression(precedence if right else precedence + 1)
+            node = (op, node, rhs)
+        return node
+
+    def unary(self):
+        value = self.peek()
+        if value in PREFIX:
+            self.take()
+            return (PREFIX[value], self.expression(PREFIX_PRECEDENCE))
+        if value in FUNCTIONS:
+            self.take()
+            if self.peek() == "(":
+                return self.postfix((value, self.primary()))
+            return (value, self.expression(PREFIX_PRECEDENCE))
+        return self.postfix(self.primary())
+
+    def postfix(self, node):
+        while self.peek() in POSTFIX:
+            node = (POSTFIX[self.take()[1]], node)
+        return node
+
+    def primary(self):
+        if self.pos >= len(self.tokens):
+            raise ExpressionError("Unexpected end of expression")
+        kind, value = self.take()
+        if kind == "number":
+            return ("num", float(value))
+        if kind == "name":
+            return ("var", value)
+        if value == "(":
+            node = self.expression()
+            self.expect(")")
+            return node
+        raise ExpressionError(f"Unexpected {value!r}")
+
+
+def parse(text):
+    """式を構文木（('+', 左, 右) / ('sqrt', 子) / ('num', 値) / ('var', 名前) のタプル）に変換"""
+    parser = _Parser(tokenize(text))
+    if not parser.tokens:
+        raise ExpressionError("Empty expression")
+    node = parser.expression()
+    if parser.pos < len(parser.tokens):
+        raise ExpressionError(f"Unexpected {parser.peek()!r}")
+    return node
+
+
+def format_number(num):
+    # 整数になる値は小数点なしで表示する
+    if num % 1 == 0:
+        return int(num)
+    else:
+        return num
+
+
+def _sin(degrees):
+    return math.sin(math.radians(degrees))
+
+
+def _cos(degrees):
+    return math.cos(math.radians(degrees))
+
+
+# 構文木の演算子 → 関数（math.pow は負の数の小数乗を複素数にせず ValueError にする）
+OPERATIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": math.pow,
+    "neg": operator.neg,
+    "pos": operator.pos,
+    "sqrt": math.sqrt,
+    "sin": _sin,
+    "cos": _cos,
+    "inv": lambda value: 1.0 / value,
+    "sq": lambda value: value ** 2,
+    "pct": lambda value: value / 100.0,
+}
+
+# コンパイルした lambda から参照する名前（変数名は v_ を付けて区別する）
+_NAMESPACE = {"__builtins__": {}, "_pow": math.pow, "_sqrt": math.sqrt, "_sin": _sin, "_cos": _cos}
+
+_TEMPLATES = {
+    "+": "({} + {})",
+    "-": "({} - {})",
+    "*": "({} * {})",
+    "/": "({} / {})",
+    "^": "_pow({}, {})",
+    "neg": "(-{})",
+    "pos": "(+{})",
+    "sqrt": "_sqrt({})",
+    "sin": "_sin({})",
+    "cos": "_cos({})",
+    "inv": "(1.0 / {})",
+    "sq": "({} ** 2)",
+    "pct": "({} / 100.0)",
+}
+
+
+def _source(node):
+    kind = node[0]
+    if kind == "num":
+        # inf の repr（"inf"）は名前になってしまうので、オーバーフローする数値リテラル（1e999 も inf になる）で書く
+        return repr(node[1]) if math.isfinite(node[1]) else "1e999"
+    if kind == "var":
+        return f"v_{node[1]}"
+    return _TEMPLATES[kind].format(*(_source(child) for child in node[1:]))
+
+
+def to_function(tree, variables, namespace=None):
+    """構文木を変数を引数に取る lambda にコンパイル（namespace で _pow _sqrt _sin _cos の実装を差し替えられる）"""
+    params = ", ".join(f"v_{name}" for name in variables)
+    return eval(f"lambda {params}: {_source(tree)}", _NAMESPACE if namespace is None else namespace)
+
+
+def _fold(node):
+    """変数のない構文木をたどって値を計算する"""
+    if node[0] == "num":
+        return node[1]
+    return OPERATIONS[node[0]](*[_fold(child) for child in node[1:]])
+
+
+def variables(tree):
+    """構文木に出てくる変数名（出てくる順）"""
+    return tuple(_variables(tree, {}))
+
+
+def _variables(node, found):
+    if node[0] == "var":
+        found.setdefault(node[1])
+    elif node[0] != "num":
+        for child in node[1:]:
+            _variables(child, found)
+    return found
+
+
+class Expression:
+    """コンパイル済みの式（変数はキーワード引数で渡す）"""
+
+    __slots__ = ("source", "tree", "variables", "function")
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.variables = variables(tree)
+        if self.variables:
+            self.function = to_function(tree, self.variables)
+        else:
+            self.function = _constant(tree)
+
+    def __call__(self, **values):
+        return self.function(**{f"v_{name}": value for name, value in values.items()})
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+
+def _constant(tree):
+    """変数のない式の値を返す関数（計算できない値なら、呼ぶたびに同じ例外を送出する）"""
+    try:
+        value = _fold(tree)
+    except (ArithmeticError, ValueError) as e:
+        error_type, args = type(e), e.args
+
+        def function():
+            raise error_type(*args)
+    else:
+        def function():
+            return value
+    return function
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(text):
+    """式をコンパイル（同じ文字列は LRU キャッシュから返す）"""
+    return Expression(text, parse(text))
+
+
+def evaluate(text, **values):
+    """式を計算して float を返す（計算できなければ ZeroDivisionError・ValueError・OverflowError）"""
+    expression = compile_expression(text)
+    if values:
+        return expression(**values)
+    return expression.function()
+
+
+def calculate(text):
+    """式を計算して表示用の文字列を返す（書き方の誤り・計算できない値は "Error"）"""
+    try:
+        value = evaluate(text)
+    except (ArithmeticError, ValueError, TypeError):
+        return "Error"
+    return str(format_number(value)) if math.isfinite(value) else "Error"
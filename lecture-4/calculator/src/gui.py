@@ -0,0 +1,403 @@
+"""
+電卓のGUI（Flet）。押されたキーを engine.py の CalculatorEngine に渡して表示するだけで、
+式の組み立てと計算（expression.py）はエンジンが行う
+
+calc.py から GUI を起動するときだけ読み込まれる（flet の import は時間がかかるため）。
+キーを押すたびに、値が変わった表示（result / history）のコントロールだけを更新する。
+押されたキーは logger "calculator.gui" に DEBUG で出力する（calc.py --debug で表示）。
+
+右側の履歴パネル（HistoryPanel）は計算を history.py の HistoryStore に保存し、検索・スクロールできる。
+行のコントロールは VISIBLE_ROWS 個だけ作って使い回し、表示する範囲の履歴だけを読む（100万件あっても同じ）。
+行をクリックすると、その計算の結果を呼び出す。
+"""
+
+import atexit
+import logging
+
+import flet as ft
+
+from engine import CalculatorEngine
+from history import VISIBLE_ROWS, HistoryStore, HistoryWindow
+
+logger = logging.getLogger("calculator.gui")
+
+
+class CalcButton(ft.ElevatedButton):
+    def __init__(self, text, button_clicked, expand=1):
+        super().__init__()
+        self.text = text
+        self.expand = expand
+        self.on_click = button_clicked
+        self.data = text
+        self.height = 60
+        self.content = ft.Text(
+            text, 
+            size=20, 
+            weight=ft.FontWeight.W_500,
+            text_align=ft.TextAlign.CENTER
+        )
+
+
+class DigitButton(CalcButton):
+    def __init__(self, text, button_clicked, expand=1):
+        CalcButton.__init__(self, text, button_clicked, expand)
+        self.bgcolor = ft.Colors.GREY_800
+        self.color = ft.Colors.WHITE
+        self.style = ft.ButtonStyle(
+            shape=ft.RoundedRectangleBorder(radius=15),
+            elevation=3,
+            animation_duration=100,
+        )
+
+
+class ActionButton(CalcButton):
+    def __init__(self, text, button_clicked):
+        CalcButton.__init__(self, text, button_clicked)
+        self.bgcolor = ft.Colors.ORANGE_600
+        self.color = ft.Colors.WHITE
+        self.style = ft.ButtonStyle(
+            shape=ft.RoundedRectangleBorder(radius=15),
+            elevation=5,
+            animation_duration=100,
+        )
+
+
+class ExtraActionButton(CalcButton):
+    def __init__(self, text, button_clicked):
+        CalcButton.__init__(self, text, button_clicked)
+        self.bgcolor = ft.Colors.GREY_600
+        self.color = ft.Colors.WHITE
+        self.style = ft.ButtonStyle(
+            shape=ft.RoundedRectangleBorder(radius=15),
+            elevation=3,
+            animation_duration=100,
+        )
+
+
+class SciCalcButton(CalcButton):
+    def __init__(self, text, button_clicked):
+        CalcButton.__init__(self, text, button_clicked)
+        self.bgcolor = ft.Colors.BLUE_700
+        self.color = ft.Colors.WHITE
+        self.style = ft.ButtonStyle(
+            shape=ft.RoundedRectangleBorder(radius=15),
+            elevation=4,
+            animation_duration=100,
+        )
+
+
+class HistoryRow(ft.Container):
+    """履歴パネルの1行（式と結果）。data は表示中の何行目か"""
+
+    def __init__(self, index, row_clicked):
+        super().__init__()
+        self.data = index
+        self.on_click = row_clicked
+        self.expression = ft.Text(
+            value="",
+            color=ft.Colors.GREY_400,
+            size=12,
+            max_lines=1,
+            overflow=ft.TextOverflow.ELLIPSIS,
+            text_align=ft.TextAlign.RIGHT
+        )
+        self.result = ft.Text(
+            value="",
+            color=ft.Colors.WHITE,
+            size=18,
+            max_lines=1,
+            overflow=ft.TextOverflow.ELLIPSIS,
+            text_align=ft.TextAlign.RIGHT
+        )
+        self.content = ft.Column(
+            [self.expression, self.result],
+            spacing=0,
+            horizontal_alignment=ft.CrossAxisAlignment.END
+        )
+        self.height = HistoryPanel.ROW_HEIGHT
+        self.padding = ft.padding.symmetric(horizontal=10)
+        self.border_radius = ft.border_radius.all(10)
+        self.ink = True
+
+
+class HistoryPanel(ft.Container):
+    """計算履歴のパネル（検索語・前方一致・スクロール）。表示する VISIBLE_ROWS 行の分だけ HistoryWindow から読む"""
+
+    ROW_HEIGHT = 46
+
+    def __init__(self, store, on_recall):
+        super().__init__()
+        self.store = store
+        self.window = HistoryWindow(store, VISIBLE_ROWS)
+        self.on_recall = on_recall
+
+        self.search = ft.TextField(
+            hint_text="履歴を検索",
+            dense=True,
+            color=ft.Colors.WHITE,
+            border_radius=15,
+            on_change=self.query_changed
+        )
+        self.prefix = ft.Checkbox(label="前方一致", value=False, on_change=self.query_changed)
+        self.position = ft.Text(value="", color=ft.Colors.GREY_400, size=12)
+        self.rows = [HistoryRow(i, self.row_clicked) for i in range(VISIBLE_ROWS)]
+        self.width = 310
+        self.bgcolor = ft.Colors.GREY_900
+        self.border_radius = ft.border_radius.all(25)
+        self.padding = 20
+        self.content = ft.Column(
+            controls=[
+                self.search,
+                ft.Row(controls=[self.prefix, self.position], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.GestureDetector(
+                    content=ft.Column(controls=self.rows, spacing=4),
+                    on_scroll=self.scrolled
+                ),
+                ft.Row(
+                    controls=[
+                        ft.IconButton(icon=ft.Icons.KEYBOARD_ARROW_UP, icon_color=ft.Colors.WHITE,
+                                      on_click=lambda e: self.scroll(-VISIBLE_ROWS)),
+                        ft.IconButton(icon=ft.Icons.KEYBOARD_ARROW_DOWN, icon_color=ft.Colors.WHITE,
+                                      on_click=lambda e: self.scroll(VISIBLE_ROWS)),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER
+                ),
+            ],
+            spacing=8,
+            tight=True
+        )
+        self.window.load()
+        self.render()
+
+    def added(self):
+        """履歴が1件増えたときに呼ぶ（検索中でなければ表示し直す。スクロール中は表示している行がずれないようにする）"""
+        if self.window.query:
+            return
+        if self.window.offset:
+            self.window.offset += 1
+        self.window.load()
+        self.render()
+
+    def query_changed(self, e):
+        self.window.set_query(self.search.value or "", bool(self.prefix.value))
+        self.render()
+
+    def scrolled(self, e):
+        delta = e.scroll_delta_y or 0
+        if delta:
+            rows = max(1, round(abs(delta) / self.ROW_HEIGHT))
+            self.scroll(rows if delta > 0 else -rows)
+
+    def scroll(self, delta):
+        self.window.scroll(delta)
+        self.render()
+
+    def row_clicked(self, e):
+        entries = self.window.entries
+        if e.control.data < len(entries):
+            self.on_recall(entries[e.control.data])
+
+    def render(self):
+        """表示中の範囲を行に反映し、値が変わったコントロールだけを更新して、それを返す"""
+        entries = self.window.entries
+        values = []
+        for i, row in enumerate(self.rows):
+            entry = entries[i] if i < len(entries) else None
+            values.append((row.expression, f"{entry.expression} =" if entry else ""))
+            values.append((row.result, entry.result if entry else ""))
+        if not entries:
+            position = "該当なし" if self.window.query else ""
+        elif self.window.query:
+            position = f"{self.window.offset + 1}–{self.window.offset + len(entries)} 件目"
+        else:
+            position = f"{self.window.offset + 1}–{self.window.offset + len(entries)} / {len(self.store)}"
+        values.append((self.position, position))
+
+        changed = []
+        for control, value in values:
+            if control.value != value:
+                control.value = value
+                changed.append(control)
+        if changed and self.page:
+            self.page.update(*changed)
+        return changed
+
+
+class CalculatorApp(ft.Container):
+    # application's root control (i.e. "view") containing all other controls
+    def __init__(self, store=None):
+        super().__init__()
+        self.engine = CalculatorEngine()
+
+        # 計算を store に保存し、履歴パネルに表示する（store がなければ履歴パネルなし）
+        self.store = store
+        self.history_panel = None
+        if store is not None:
+            self.engine.on_calculate = self.calculated
+            self.history_panel = HistoryPanel(store, self.recall)
+
+        self.result = ft.Text(
+            value="0", 
+            color=ft.Colors.WHITE, 
+            size=36,
+            weight=ft.FontWeight.W_300,
+            text_align=ft.TextAlign.RIGHT
+        )
+        self.history = ft.Text(
+            value="", 
+            color=ft.Colors.GREY_400, 
+            size=16,
+            text_align=ft.TextAlign.RIGHT
+        )
+        self.width = 450
+        self.bgcolor = ft.Colors.GREY_900
+        self.border_radius = ft.border_radius.all(25)
+        self.padding = 25
+        self.shadow = ft.BoxShadow(
+            spread_radius=1,
+            blur_radius=15,
+            color=ft.Colors.BLACK26,
+            offset=ft.Offset(0, 8),
+        )
+        self.content = ft.Column(
+            controls=[
+                ft.Container(
+                    content=ft.Column([
+                        ft.Row(controls=[self.history], alignment="end"),
+                        ft.Row(controls=[self.result], alignment="end"),
+                    ]),
+                    height=100,
+                    padding=ft.padding.all(15),
+                    bgcolor=ft.Colors.GREY_800,
+                    border_radius=ft.border_radius.all(15),
+                    margin=ft.margin.only(bottom=20)
+                ),
+                ft.Row(
+                    controls=[
+                        SciCalcButton(text="√", button_clicked=self.button_clicked),#平方根計算
+                        SciCalcButton(text="x²", button_clicked=self.button_clicked),#二乗計算
+                        SciCalcButton(text="1/x", button_clicked=self.button_clicked),#逆数計算
+                        SciCalcButton(text="sin", button_clicked=self.button_clicked),#正弦計算
+                        SciCalcButton(text="cos", button_clicked=self.button_clicked),#余弦計算
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        ExtraActionButton(text="(", button_clicked=self.button_clicked),
+                        ExtraActionButton(text=")", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        ExtraActionButton(text="AC", button_clicked=self.button_clicked),
+                        ExtraActionButton(text="⌫", button_clicked=self.button_clicked),
+                        ExtraActionButton(text="%", button_clicked=self.button_clicked),
+                        ActionButton(text="÷", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        DigitButton(text="7", button_clicked=self.button_clicked),
+                        DigitButton(text="8", button_clicked=self.button_clicked),
+                        DigitButton(text="9", button_clicked=self.button_clicked),
+                        ActionButton(text="×", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        DigitButton(text="4", button_clicked=self.button_clicked),
+                        DigitButton(text="5", button_clicked=self.button_clicked),
+                        DigitButton(text="6", button_clicked=self.button_clicked),
+                        ActionButton(text="−", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        DigitButton(text="1", button_clicked=self.button_clicked),
+                        DigitButton(text="2", button_clicked=self.button_clicked),
+                        DigitButton(text="3", button_clicked=self.button_clicked),
+                        ActionButton(text="+", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+                ft.Row(
+                    controls=[
+                        ExtraActionButton(text="±", button_clicked=self.button_clicked),
+                        DigitButton(text="0", button_clicked=self.button_clicked),
+                        DigitButton(text=".", button_clicked=self.button_clicked),
+                        ActionButton(text="=", button_clicked=self.button_clicked),
+                    ],
+                    spacing=8
+                ),
+            ],
+            spacing=12,
+            tight=True
+        )
+
+    def button_clicked(self, e):
+        data = e.control.data
+        logger.debug("Button clicked with data = %s", data)
+
+        # 式の組み立てと計算はエンジンに任せ、表示中の式（または結果）と履歴だけを画面に反映する
+        self.engine.press(data)
+        self.render()
+
+    def render(self):
+        """エンジンの状態を表示に反映し、値が変わったコントロールだけを更新して、それを返す
+
+        self.update() はコンテナ以下のすべてのコントロールを比較するので、変わったものだけを page.update() に渡す。
+        """
+        changed = []
+        for control, value in ((self.result, self.engine.result), (self.history, self.engine.history)):
+            if control.value != value:
+                control.value = value
+                changed.append(control)
+        if changed and self.page:
+            self.page.update(*changed)
+        return changed
+
+    def calculated(self, expression, result):
+        # エンジンが計算するたびに呼ばれる（保存はまとめて書き込む）
+        self.store.add(expression, result)
+        self.history_panel.added()
+
+    def recall(self, entry):
+        """履歴パネルでクリックした計算の結果を呼び出す"""
+        logger.debug("Recall history %s = %s", entry.expression, entry.result)
+        self.engine.recall(entry.expression, entry.result)
+        self.render()
+
+
+def main(page: ft.Page, store=None):
+    page.title = "🔢 Beautiful Calculator"
+    page.bgcolor = ft.Colors.GREY_100
+    page.window.width = 820
+    page.window.height = 772
+    page.window.resizable = False
+    page.padding = 20
+
+    # 履歴は終了時に書き込み待ちの分を書き込んで閉じる
+    if store is None:
+        store = HistoryStore()
+        atexit.register(store.close)
+
+    # create application instance
+    calc = CalculatorApp(store)
+
+    # add application's root control to the page with centering
+    page.add(
+        ft.Container(
+            content=ft.Row(
+                controls=[calc, calc.history_panel],
+                spacing=20,
+                alignment=ft.MainAxisAlignment.CENTER,
+                vertical_alignment=ft.CrossAxisAlignment.START
+            ),
+            alignment=ft.alignment.center,
+        )
+    )
@@ -0,0 +1,317 @@
+"""
+電卓の計算履歴（Fletに依存しない）
+
+- HistoryEntry:  1件の履歴（式・結果・時刻）。__slots__ で1件あたりのメモリを小さくする
+- HistoryBuffer: 直近 capacity 件だけを持つリングバッファ（あふれたら古いものから捨てる）
+- HistoryStore:  SQLite（WALモード）への追記専用の保存と検索
+  add() はリングバッファと書き込み待ちに入れるだけで、flush_size 件たまったときか、最初の書き込み待ちから
+  flush_interval 秒たったとき（タイマーのスレッド）に1トランザクションでまとめて書き込む（close() と検索の前にも書き込む）
+  recent() はリングバッファにある直近の範囲なら書き込みも SQL も使わない
+- HistoryWindow: 履歴パネルに表示する範囲（offset から rows 件）だけを読む
+
+検索はどちらも新しい順に limit 件（offset 件目から）:
+- prefix:    式の前方一致。インデックスの範囲で当たる件数を PREFIX_SCAN_THRESHOLD 件まで数え、
+  少なければその範囲を読んで並べ替え、多ければ（"1" や "(" など）新しい順に走査して limit 件見つかったら止める
+- substring: 「式 = 結果」の部分一致（FTS5 の trigram。大文字・小文字は区別しない）
+  2文字以下は、索引した文字列の末尾に区切り文字を2つ足しておき（どの位置の1〜2文字も、ある trigram の先頭になる）、
+  history_terms（索引した trigram の一覧）からその文字で始まる trigram を引いて OR で検索する。
+  どの trigram もなければ FTS を使わずに空を返す。OR が長くなる（"1" なら数百語）ので、先に新しい方から
+  SHORT_SCAN_ROWS 件だけを走査し、そこで offset + limit 件見つかればそれを返す（よく使う文字ならここで終わる）
+
+行を削除しないので id は 1 から連続し、新しい方から i 件目は id = 件数 - i で読める。
+
+    store = HistoryStore()          # ~/.calculator_history.db（環境変数 CALC_HISTORY で変更）
+    store.add("12 + 3.5", "15.5")
+    store.search("3.5")             # -> [HistoryEntry, ...]
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+
+HISTORY_PATH = Path(os.environ.get("CALC_HISTORY", Path.home() / ".calculator_history.db"))
+BUFFER_CAPACITY = 1000
+FLUSH_SIZE = 64
+FLUSH_INTERVAL = 5.0  # 秒
+VISIBLE_ROWS = 12
+PREFIX_SCAN_THRESHOLD = 1000
+SHORT_SCAN_ROWS = 2000
+SCHEMA_VERSION = 2  # 2: 索引する文字列の末尾に区切り文字、history_terms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_expression ON history(expression);
+CREATE VIRTUAL TABLE IF NOT EXISTS history_text USING fts5(text, content='', tokenize='trigram');
+CREATE TABLE IF NOT EXISTS history_terms (term TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS history_text_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_text(rowid, text) VALUES (new.id, new.expression || ' = ' || new.result || char(31, 31));
+END;
+"""
+
+# FTS に索引する文字列の末尾（検索語には現れない区切り文字）
+_PAD = "\x1f\x1f"
+
+# 前方一致の上限（prefix 以上 prefix + この文字 未満）
+_MAX_CHAR = "\U0010ffff"
+
+
+class HistoryEntry:
+    """1件の計算（id は保存後の行番号。書き込み前は None）"""
+
+    __slots__ = ("expression", "result", "timestamp", "id")
+
+    def __init__(self, expression, result, timestamp=None, id=None):
+        self.expression = expression
+        self.result = result
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.id = id
+
+    def __repr__(self):
+        return f"HistoryEntry({self.expression!r}, {self.result!r}, {self.timestamp!r}, id={self.id!r})"
+
+
+class HistoryBuffer:
+    """直近 capacity 件の履歴のリングバッファ（新しい順に取り出す）"""
+
+    def __init__(self, capacity=BUFFER_CAPACITY):
+        self.entries = deque(maxlen=capacity)
+
+    def append(self, entry):
+        self.entries.append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return reversed(self.entries)
+
+    def latest(self, count):
+        """新しい順に count 件"""
+        return [entry for entry, _ in zip(reversed(self.entries), range(count))]
+
+
+def _trigrams(expression, result):
+    """FTS（trigram）に索引される語の集合（trigram と同じく大文字・小文字を区別しない）"""
+    text = f"{expression} = {result}{_PAD}".lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _entries(rows):
+    return [HistoryEntry(expression, result, timestamp, id) for id, expression, result, timestamp in rows]
+
+
+class HistoryStore:
+    """履歴のリングバッファと SQLite への追記（まとめて書き込む）"""
+
+    def __init__(self, path=None, capacity=BUFFER_CAPACITY, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = Path(path or HISTORY_PATH)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = HistoryBuffer(capacity)
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()  # Flet のイベントはスレッドプールで呼ばれる
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._timer = None
+        self._create_schema()
+        self.terms = {term for term, in self.conn.execute("SELECT term FROM history_terms")}
+        for entry in reversed(self._saved(capacity)):
+            self.buffer.append(entry)
+
+    def _create_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 2:
+            self.conn.execute("DROP TRIGGER IF EXISTS history_text_insert")
+        self.conn.executescript(SCHEMA)
+        if version < 2:
+            self._reindex()
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _reindex(self):
+        """保存済みの履歴を今の書き方で FTS と history_terms に索引し直す"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("INSERT INTO history_text(history_text) VALUES ('delete-all')")
+            self.conn.execute(
+                "INSERT INTO history_text(rowid, text)"
+                " SELECT id, expression || ' = ' || result || char(31, 31) FROM history")
+            terms = set()
+            for expression, result in self.conn.execute("SELECT expression, result FROM history"):
+                terms |= _trigrams(expression, result)
+            self.conn.executemany("INSERT OR IGNORE INTO history_terms (term) VALUES (?)", [(t,) for t in terms])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def add(self, expression, result, timestamp=None):
+        """履歴を1件追加（書き込みは flush_size 件ごとか、書き込み待ちができてから flush_interval 秒後）"""
+        entry = HistoryEntry(expression, result, timestamp)
+        with self.lock:
+            self.buffer.append(entry)
+            self.pending.append(entry)
+            due = len(self.pending) >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval
+            if not due and self._timer is None and math.isfinite(self.flush_interval):
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+        return entry
+
+    def flush(self):
+        """書き込み待ちの履歴を1トランザクションで書き込み、書き込んだ件数を返す"""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.last_flush = time.monotonic()
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, []
+            terms = set()
+            for entry in pending:
+                terms |= _trigrams(entry.expression, entry.result)
+            terms -= self.terms
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM history").fetchone()[0]
+                self.conn.executemany(
+                    "INSERT INTO history (id, expression, result, timestamp) VALUES (?, ?, ?, ?)",
+                    [(first + i, e.expression, e.result, e.timestamp) for i, e in enumerate(pending)])
+                self.conn.executemany("INSERT OR IGNORE INTO history_terms (term) VALUES (?)", [(t,) for t in terms])
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                self.pending[:0] = pending
+                raise
+            self.terms |= terms
+            for i, entry in enumerate(pending):
+                entry.id = first + i
+            return len(pending)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __len__(self):
+        """保存済みと書き込み待ちを合わせた件数"""
+        with self.lock:
+            saved = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
+            return saved + len(self.pending)
+
+    def recent(self, limit=50, offset=0):
+        """新しい順に offset 件目から limit 件（リングバッファにある範囲なら書き込まずにそこから返す）"""
+        with self.lock:
+            buffered = len(self.buffer)
+            if offset + limit <= buffered or buffered < self.buffer.entries.maxlen:
+                return list(islice(self.buffer, offset, offset + limit))
+        self.flush()
+        return self._saved(limit, offset)
+
+    def _saved(self, limit, offset=0):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, expression, result, timestamp FROM history"
+                " WHERE id <= (SELECT MAX(id) FROM history) - ? ORDER BY id DESC LIMIT ?", (offset, limit))
+            return _entries(rows)
+
+    def search(self, query, limit=50, offset=0, prefix=False):
+        """式の前方一致（prefix=True）か「式 = 結果」の部分一致で、新しい順に offset 件目から limit 件"""
+        if not query:
+            return self.recent(limit, offset)
+        self.flush()
+        if prefix:
+            # 単項の + を付けた +expression はインデックスを使わない（id の新しい順に走査する）
+            column = "+expression" if self._common_prefix(query) else "expression"
+            sql = ("SELECT id, expression, result, timestamp FROM history"
+                   f" WHERE {column} >= ? AND {column} < ? ORDER BY id DESC LIMIT ? OFFSET ?")
+            params = (query, query + _MAX_CHAR, limit, offset)
+        else:
+            match = _phrase(query) if len(query) >= 3 else self._short_match(query)
+            if match is None:
+                return []
+            if len(query) < 3:
+                entries = self._scan_recent(query, offset + limit)
+                if len(entries) == offset + limit:
+                    return entries[offset:]
+            sql = ("SELECT h.id, h.expression, h.result, h.timestamp FROM history_text"
+                   " JOIN history AS h ON h.id = history_text.rowid"
+                   " WHERE history_text MATCH ? ORDER BY history_text.rowid DESC LIMIT ? OFFSET ?")
+            params = (match, limit, offset)
+        with self.lock:
+            return _entries(self.conn.execute(sql, params))
+
+    def _short_match(self, query):
+        """1〜2文字の検索語を、それで始まる索引済みの trigram の OR にする（1つもなければ None）"""
+        query = query.lower()
+        with self.lock:
+            terms = [term for term, in self.conn.execute(
+                "SELECT term FROM history_terms WHERE term >= ? AND term < ?", (query, query + _MAX_CHAR))]
+        return " OR ".join(map(_phrase, terms)) if terms else None
+
+    def _scan_recent(self, query, limit):
+        # 新しい方から SHORT_SCAN_ROWS 件のうち部分一致するもの（FTS と同じく大文字・小文字を区別しない）
+        with self.lock:
+            return _entries(self.conn.execute(
+                "SELECT id, expression, result, timestamp FROM history"
+                " WHERE id > (SELECT MAX(id) FROM history) - ? AND instr(lower(expression || ' = ' || result), ?) > 0"
+                " ORDER BY id DESC LIMIT ?", (SHORT_SCAN_ROWS, query.lower(), limit)))
+
+    def _common_prefix(self, query):
+        """前方一致する履歴が PREFIX_SCAN_THRESHOLD 件以上あるか（インデックスだけを数える）"""
+        with self.lock:
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM history WHERE expression >= ? AND expression < ? LIMIT ?)",
+                (query, query + _MAX_CHAR, PREFIX_SCAN_THRESHOLD)).fetchone()[0]
+        return count >= PREFIX_SCAN_THRESHOLD
+
+
+class HistoryWindow:
+    """履歴パネルに表示する範囲（検索語、offset から rows 件）。表示する行の分だけ store から読む"""
+
+    def __init__(self, store, rows=VISIBLE_ROWS):
+        self.store = store
+        self.rows = rows
+        self.query = ""
+        self.prefix = False
+        self.offset = 0
+        self.entries = []
+
+    def set_query(self, query, prefix=False):
+        self.query = query.strip()
+        self.prefix = prefix
+        self.offset = 0
+        return self.load()
+
+    def scroll(self, delta):
+        """delta 行だけ動かす（末尾より先には進まない）"""
+        offset = max(0, self.offset + delta)
+        if delta > 0 and len(self.entries) < self.rows:
+            return self.entries
+        self.offset = offset
+        entries = self.load()
+        if not entries and self.offset > 0:
+            self.offset = max(0, self.offset - self.rows)
+            entries = self.load()
+        return entries
+
+    def load(self):
+        self.entries = self.store.search(self.query, self.rows, self.offset, self.prefix)
+        return self.entries
@@ -97,6 +97,11 @@ function getDayName(dateString) {
     return `${date.getMonth() + 1}/${date.getDate()}(${dayNames[date.getDay()]})`;
 }
 
+// 数値が無い（null・空文字）ときは '-' を表示（0は有効な値として表示する）
+function formatValue(value, unit = '') {
+    return value === null || value === undefined || value === '' ? '-' : `${value}${unit}`;
+}
+
 function showElement(element) {
     if (element) element.style.display = '';
 }
@@ -216,10 +221,10 @@ function displayForecast(data, areaName, fromDB = false) {
         elements.todayWeatherText.textContent = data.today.weather_text || '情報なし';
         elements.todayWind.textContent = data.today.wind || '-';
         
-        const tempMin = data.today.temp_min || '-';
-        const tempMax = data.today.temp_max || '-';
+        const tempMin = formatValue(data.today.temp_min);
+        const tempMax = formatValue(data.today.temp_max);
         elements.todayTemp.textContent = `${tempMin}°C / ${tempMax}°C`;
-        elements.todayPop.textContent = data.today.pop ? `${data.today.pop}%` : '-';
+        elements.todayPop.textContent = formatValue(data.today.pop, '%');
     }
     
     // 明日の天気
@@ -227,8 +232,11 @@ function displayForecast(data, areaName, fromDB = false) {
         elements.tomorrowIcon.textContent = getWeatherIcon(data.tomorrow.weather_code);
         elements.tomorrowWeatherText.textContent = data.tomorrow.weather_text || '情報なし';
         elements.tomorrowWind.textContent = data.tomorrow.wind || '-';
-        elements.tomorrowPop.textContent = data.tomorrow.pop ? `${data.tomorrow.pop}%` : '-';
-        elements.tomorrowTemp.textContent = '-';
+        elements.tomorrowPop.textContent = formatValue(data.tomorrow.pop, '%');
+        
+        const tomorrowTempMin = formatValue(data.tomorrow.temp_min);
+        const tomorrowTempMax = formatValue(data.tomorrow.temp_max);
+        elements.tomorrowTemp.textContent = `${tomorrowTempMin}°C / ${tomorrowTempMax}°C`;
     }
     
     // 週間予報
@@ -252,13 +260,12 @@ function displayWeeklyForecast(weeklyData) {
         
         const dayName = getDayName(day.date);
         const icon = getWeatherIcon(day.weather_code);
-        const pop = day.pop;
         
         item.innerHTML = `
             <span class="weekly-day">${dayName}</span>
             <span class="weekly-icon">${icon}</span>
             <span class="weekly-weather"></span>
-            <span class="weekly-pop">${pop !== undefined && pop !== '' ? pop + '%' : '-'}</span>
+            <span class="weekly-pop">${formatValue(day.pop, '%')}</span>
         `;
         
         elements.weeklyList.appendChild(item);
@@ -0,0 +1,134 @@
+"""
+エリア情報のメモリ上の索引（地方 center → 官署 office → 細分区域 class10 の階層）
+
+/api/areas と /api/areas/search はSQLiteを読まずにこの索引から返す。
+索引は最初に使うとき（サーバー起動時）にDBから作り、エリア情報を保存したとき・
+/api/areas/refresh のときに invalidate() で捨てて次のアクセスで作り直す。
+
+検索は地域名・地域コードの「接尾辞」をソートした配列を二分探索する（接尾辞の先頭一致 = 部分一致）。
+前方一致は名前・コードの先頭から始まる接尾辞だけの配列で同じように探す。
+"""
+
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import database as db
+
+LEVELS = ('center', 'office', 'class10')
+MATCH_MODES = ('prefix', 'substring')
+MAX_SEARCH_LIMIT = 100
+
+
+def normalize(text: str) -> str:
+    """検索用の正規化（全角英数字を半角に、英字を小文字に）"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+class Area:
+    __slots__ = ('code', 'name', 'level', 'parent', 'children')
+
+    def __init__(self, code: str, name: str, level: str, parent: str):
+        self.code = code
+        self.name = name
+        self.level = level
+        self.parent = parent
+        self.children = []
+
+    def to_dict(self) -> dict:
+        return {
+            'area_code': self.code,
+            'area_name': self.name,
+            'level': self.level,
+            'parent_code': self.parent,
+            'children': self.children,
+        }
+
+
+class AreaIndex:
+    """エリア情報の索引（作成後は変更しないので、ロックなしで複数スレッドから読める）"""
+
+    def __init__(self, rows: list):
+        self.areas = {row['area_code']: Area(row['area_code'], row['area_name'], row['level'], row['parent_code'])
+                      for row in rows}
+        for area in self.areas.values():
+            parent = self.areas.get(area.parent)
+            if parent is not None:
+                parent.children.append(area.code)
+
+        # /api/areas の応答（get_all_areas と同じ形）
+        self.offices = [{'area_code': area.code, 'area_name': area.name}
+                        for area in sorted(self.areas.values(), key=lambda area: area.code)
+                        if area.level == 'office']
+
+        # 接尾辞をソートした配列と、同じ並びの順位キー（前方一致か, 階層, 地域コード）。
+        # 前方一致用には名前・コードの先頭から始まるものだけの配列を別に持つ
+        entries = []
+        for area in self.areas.values():
+            level = LEVELS.index(area.level) if area.level in LEVELS else len(LEVELS)
+            for text in {normalize(area.name), area.code}:
+                entries.extend((text[start:], (start > 0, level, area.code)) for start in range(len(text)))
+        entries.sort()
+        self._substring = ([key for key, _ in entries], [rank for _, rank in entries])
+        prefix = [(key, rank) for key, rank in entries if not rank[0]]
+        self._prefix = ([key for key, _ in prefix], [rank for _, rank in prefix])
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def get(self, area_code: str):
+        return self.areas.get(area_code)
+
+    def search(self, query: str, match: str = 'substring', level: str = None, limit: int = 20) -> list:
+        """地域名・地域コードで検索して Area のリストを返す
+
+        前方一致を部分一致より先に、同じ順位の中では階層（地方 → 官署 → 細分区域）・地域コード順に並べる。
+        """
+        query = normalize(query.strip())
+        if not query:
+            return []
+
+        keys, ranks = self._prefix if match == 'prefix' else self._substring
+        # query で始まる接尾辞の範囲（query + 最大の文字 より前まで）
+        matched = sorted(ranks[bisect_left(keys, query):bisect_left(keys, query + '\U0010ffff')])
+
+        results, seen = [], set()
+        for _, _, code in matched:
+            area = self.areas[code]
+            if code in seen or (level is not None and area.level != level):
+                continue
+            seen.add(code)
+            results.append(area)
+            if len(results) >= limit:
+                break
+        return results
+
+
+_lock = threading.Lock()
+_index = None
+_generation = 0  # invalidate() のたびに増やす（作成中に無効化された索引を保存しないため）
+
+
+def get() -> AreaIndex:
+    """現在の索引（なければDBから作る）"""
+    global _index
+    index = _index
+    if index is not None:
+        return index
+    with _lock:
+        if _index is not None:
+            return _index
+        generation = _generation
+    index = AreaIndex(db.get_area_hierarchy())
+    with _lock:
+        if generation == _generation:
+            _index = index
+    return index
+
+
+def invalidate():
+    """索引を捨てる（次の get() でDBから作り直す）"""
+    global _index, _generation
+    with _lock:
+        _index = None
+        _generation += 1
@@ -0,0 +1,9 @@
+"""
+天気予報アプリケーションのベンチマーク
+
+lecture-6/weather ディレクトリで実行する:
+    python -m bench.bench_connection
+
+まとめて計測してJSONで保存する場合は bench.suite を使う:
+    python -m bench.suite --rows 1000,100000 -o results.json
+"""
@@ -0,0 +1,126 @@
+"""
+数値カラム化（スキーマバージョン2）前後の集計クエリ比較
+
+1. 旧スキーマ（気温・降水確率がTEXT）のDBを作り、文字列をCASTしながら集計する
+2. init_database() で同じDBをその場でマイグレーションする
+3. 数値カラム + (forecast_date, temp_max) インデックスで同じ集計を行う
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import database as db
+
+# スキーマバージョン1（schema_version導入前）のテーブル定義
+LEGACY_DDL = '''
+    CREATE TABLE areas (
+        area_code TEXT PRIMARY KEY, area_name TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE forecasts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, area_code TEXT NOT NULL, forecast_date DATE NOT NULL,
+        weather_code TEXT, weather_text TEXT, temp_min TEXT, temp_max TEXT, pop TEXT, wind TEXT,
+        report_datetime TIMESTAMP, fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (area_code) REFERENCES areas(area_code), UNIQUE(area_code, forecast_date, fetched_at)
+    );
+    CREATE TABLE weekly_forecasts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, area_code TEXT NOT NULL, forecast_date DATE NOT NULL,
+        weather_code TEXT, pop TEXT, temp_min TEXT, temp_max TEXT, reliability TEXT,
+        fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (area_code) REFERENCES areas(area_code), UNIQUE(area_code, forecast_date, fetched_at)
+    );
+    CREATE INDEX idx_forecasts_area_date ON forecasts(area_code, forecast_date);
+    CREATE INDEX idx_weekly_area_date ON weekly_forecasts(area_code, forecast_date);
+    CREATE INDEX idx_forecasts_fetched ON forecasts(fetched_at);
+'''
+
+TARGET_DATE = '2025-01-15'
+
+BEFORE = {
+    'max temp for a date': '''
+        SELECT MAX(CAST(temp_max AS INTEGER)) FROM weekly_forecasts
+        WHERE forecast_date = ? AND temp_max != ''
+    ''',
+    'areas >= 10C on a date': '''
+        SELECT COUNT(DISTINCT area_code) FROM weekly_forecasts
+        WHERE forecast_date = ? AND temp_max != '' AND CAST(temp_max AS INTEGER) >= 10
+    ''',
+}
+AFTER = {
+    'max temp for a date': '''
+        SELECT MAX(temp_max) FROM weekly_forecasts WHERE forecast_date = ?
+    ''',
+    'areas >= 10C on a date': '''
+        SELECT COUNT(DISTINCT area_code) FROM weekly_forecasts
+        WHERE forecast_date = ? AND temp_max >= 10
+    ''',
+}
+
+
+def build_legacy_db(path: Path, snapshots: int, areas: int):
+    """旧スキーマのDBに週間予報 snapshots x areas x 7行を投入"""
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_DDL)
+    rows = []
+    for s in range(snapshots):
+        fetched_at = f'2025-01-{1 + s // 24 % 28:02d} {s % 24:02d}:{s // 672 % 60:02d}:00'
+        for a in range(areas):
+            for d in range(7):
+                temp_max = '' if d == 0 else str(rng.randint(-5, 30))
+                rows.append((f'{a:06d}', f'2025-01-{1 + (s // 24 + d) % 28:02d}', '100',
+                             str(rng.randint(0, 10) * 10), str(rng.randint(-10, 20)), temp_max, 'A', fetched_at))
+        if len(rows) > 50000:
+            conn.executemany('INSERT INTO weekly_forecasts (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            rows.clear()
+    conn.executemany('INSERT INTO weekly_forecasts (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    count = conn.execute('SELECT COUNT(*) FROM weekly_forecasts').fetchone()[0]
+    conn.close()
+    return count
+
+
+def run_queries(path: Path, queries: dict, repeat: int):
+    conn = sqlite3.connect(path)
+    results = {}
+    for label, sql in queries.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            value = conn.execute(sql, (TARGET_DATE,)).fetchone()[0]
+        results[label] = ((time.perf_counter() - start) / repeat * 1000, value)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=500)
+    parser.add_argument('--areas', type=int, default=58)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench.db'
+        rows = build_legacy_db(path, args.snapshots, args.areas)
+        print(f'weekly_forecasts rows: {rows}')
+        before = run_queries(path, BEFORE, args.repeat)
+
+        db.DB_PATH = path
+        start = time.perf_counter()
+        db.init_database()
+        db.close_pool()
+        print(f'migration to v{db.SCHEMA_VERSION}: {time.perf_counter() - start:.2f}s')
+        after = run_queries(path, AFTER, args.repeat)
+
+    for label in BEFORE:
+        (b_ms, b_value), (a_ms, a_value) = before[label], after[label]
+        print(f'{label:>24}: TEXT {b_ms:9.3f} ms  ->  INTEGER {a_ms:9.3f} ms  '
+              f'({b_ms / a_ms:6.1f}x)  result {b_value} / {a_value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+エリアの索引（area_index.py）の検索と、これまでの全件応答の比較
+
+- full list: これまでの /api/areas（get_all_areas でSQLiteから全官署を読む）と、索引の offices
+- search:    索引の検索（前方一致・部分一致）と、全件を読んでから名前・コードを走査する場合
+             （クライアントが一覧を受け取って絞り込むのと同じ処理）
+- http:      テストクライアント経由の /api/areas と /api/areas/search
+- --synthetic N: 細分区域を N 件まで増やした索引で同じ検索を計測（class20s 相当の件数での確認）
+
+    python -m bench.bench_areas --repeat 2000 --synthetic 2000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import area_index
+import database as db
+from bench.stub_jma import StubJMA
+
+QUERIES = (('東京', 'substring'), ('13', 'prefix'), ('地方', 'substring'), ('北海道', 'prefix'), ('奄美', 'substring'))
+BLOCK = 100  # この回数ごとに平均をとり、最も速いブロックを採用する
+
+
+def per_call(fn, repeat: int) -> float:
+    """1回あたりの時間（マイクロ秒）。ブロックごとの平均の最小値"""
+    best = float('inf')
+    for _ in range(max(1, repeat // BLOCK)):
+        start = time.perf_counter()
+        for _ in range(BLOCK):
+            fn()
+        best = min(best, (time.perf_counter() - start) / BLOCK * 1e6)
+    return best
+
+
+def scan(query: str, match: str) -> list:
+    """索引を使わない検索（全件を読んでから走査）"""
+    query = area_index.normalize(query)
+    results = []
+    for area in db.get_area_hierarchy():
+        for text in (area_index.normalize(area['area_name']), area['area_code']):
+            if text.startswith(query) if match == 'prefix' else query in text:
+                results.append(area)
+                break
+    return results
+
+
+def synthetic_rows(rows: list, total: int) -> list:
+    """細分区域を total 件になるまで複製した行（地域コードは 9 から始まる架空のもの）"""
+    class10s = [row for row in rows if row['level'] == 'class10']
+    extra = []
+    for i in range(max(0, total - len(rows))):
+        row = class10s[i % len(class10s)]
+        extra.append({**row, 'area_code': f'9{i:05d}', 'area_name': f'{row["area_name"]}{i // len(class10s)}'})
+    return rows + extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--synthetic', type=int, default=2000, help='合成した索引の地域数（0で省略）')
+    args = parser.parse_args()
+
+    with StubJMA() as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        import jma
+        import server
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        jma.fetch_and_save_areas()
+        index = area_index.get()
+        print(f'{len(index)} areas ({len(index.offices)} offices)')
+
+        print('full list')
+        print(f'    get_all_areas (SQLite)  {per_call(db.get_all_areas, args.repeat):9.1f} us')
+        print(f'    AreaIndex.offices       {per_call(lambda: index.offices, args.repeat):9.3f} us')
+        print(f'    rebuild index           {per_call(lambda: area_index.AreaIndex(db.get_area_hierarchy()), args.repeat // 10):9.1f} us')
+
+        print('search')
+        for query, match in QUERIES:
+            found = len(index.search(query, match, limit=area_index.MAX_SEARCH_LIMIT))
+            assert found == len(scan(query, match)), query
+            indexed = per_call(lambda: index.search(query, match), args.repeat)
+            scanned = per_call(lambda: scan(query, match), args.repeat // 10)
+            print(f'    {query:6s} {match:9s} {found:3d} hits  index {indexed:7.1f} us  scan {scanned:8.1f} us')
+
+        print('http')
+        client = server.app.test_client()
+        for path in ('/api/areas', '/api/areas/search?q=東京', '/api/areas/search?q=13&match=prefix'):
+            size = len(client.get(path).data)
+            print(f'    {path:40s} {size:6,d} bytes  {per_call(lambda: client.get(path).data, args.repeat // 10):8.1f} us')
+
+        if args.synthetic:
+            rows = synthetic_rows(db.get_area_hierarchy(), args.synthetic)
+            start = time.perf_counter()
+            large = area_index.AreaIndex(rows)
+            build_ms = (time.perf_counter() - start) * 1000
+            print(f'synthetic: {len(large)} areas, build {build_ms:.1f} ms')
+            for query, match in QUERIES:
+                found = len(large.search(query, match, limit=area_index.MAX_SEARCH_LIMIT))
+                print(f'    {query:6s} {match:9s} {found:3d} hits  '
+                      f'index {per_call(lambda: large.search(query, match), args.repeat):7.1f} us')
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
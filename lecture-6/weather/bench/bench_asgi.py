@@ -0,0 +1,191 @@
+"""
+同期モード（server.py, Flask + スレッド）と非同期モード（server_async.py, Starlette + uvicorn）の負荷試験
+
+遅延を入れたスタブの気象庁API（別プロセス）に向けて各モードのサーバーを別プロセスで起動し、
+/api/forecast/<area_code> に --concurrency 件を同時に送る。single-flight でまとめられないよう
+地域コードはすべて別にする（スタブは任意の地域コードに応答する）。
+レイテンシ（p50/p99）・スループット・エラー数と、サーバープロセスのスレッド数の最大値・ピークRSSを比べる。
+
+- miss:       初めての地域を取得する（上流の待ち + 解析・保存）
+- revalidate: 一度取得した地域を JMA_CACHE_TTL=0 で取り直す（上流は304を返すので、ほぼ待つだけ）
+
+    python -m bench.bench_asgi --latency 1.0 --concurrency 100,1000
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WEATHER_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode: str, port: int, db_path: str):
+    """サーバープロセスとして起動（--serve）"""
+    import database as db
+    db.DB_PATH = Path(db_path)
+    db.init_database()
+
+    if mode == 'sync':
+        import logging
+        from werkzeug.serving import make_server
+        import server
+        # app.run(debug=True) と同じく1リクエスト1スレッドで処理する
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        httpd = make_server('127.0.0.1', port, server.app, threaded=True)
+        httpd.request_queue_size = 1024
+        httpd.serve_forever()
+    else:
+        import uvicorn
+        import server_async
+        uvicorn.run(server_async.app, host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def process_stats(pid: int) -> dict:
+    """/proc から現在のスレッド数とピークRSS（MB）を読む"""
+    stats = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key == 'Threads':
+                stats['threads'] = int(value)
+            elif key == 'VmHWM':
+                stats['peak_rss_mb'] = int(value.split()[0]) / 1024
+    return stats
+
+
+async def load(base_url: str, codes: list, pid: int) -> dict:
+    """codes の地域を同時にリクエストし、その間サーバーのスレッド数を監視する"""
+    import httpx
+
+    latencies, errors = [], 0
+    peak_threads = 0
+    done = asyncio.Event()
+
+    async def watch():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, process_stats(pid)['threads'])
+            await asyncio.sleep(0.05)
+
+    async def one(client, code):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            response = await client.get(f'{base_url}/api/forecast/{code}')
+            errors += response.status_code != 200
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        watcher = asyncio.create_task(watch())
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, code) for code in codes))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await watcher
+
+    latencies.sort()
+    return {
+        'requests': len(codes),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'throughput': len(codes) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'peak_threads': peak_threads,
+        'peak_rss_mb': process_stats(pid)['peak_rss_mb'],
+    }
+
+
+def wait_ready(url: str, timeout: float = 20):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # スタブは応答を遅らせるので、接続できるまでだけ待つ
+            requests.get(url, timeout=timeout)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start: {url}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=1.0, help='スタブの応答遅延（秒）')
+    parser.add_argument('--concurrency', default='100,1000', help='同時リクエスト数（カンマ区切り）')
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--scenarios', default='miss,revalidate')
+    parser.add_argument('--serve', choices=('sync', 'async'), help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.db)
+        return
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, '-m', 'bench.stub_jma', '--port', str(stub_port),
+         '--latency', str(args.latency), '--any-area'],
+        cwd=WEATHER_DIR, stdout=subprocess.DEVNULL
+    )
+    offset = 0
+    try:
+        wait_ready(f'http://127.0.0.1:{stub_port}/common/const/area.json')
+        for scenario, concurrency, mode in itertools.product(
+            args.scenarios.split(','), (int(c) for c in args.concurrency.split(',')), args.modes.split(',')
+        ):
+            with tempfile.TemporaryDirectory() as tmp:
+                port = free_port()
+                env = {
+                    **os.environ,
+                    'JMA_BASE_URL': f'http://127.0.0.1:{stub_port}',
+                    'JMA_CACHE_TTL': '0' if scenario == 'revalidate' else '300',
+                    'JMA_CACHE_MAX_ENTRIES': str(max(concurrency, 256)),
+                    'WEATHER_METRICS': '0',
+                }
+                server = subprocess.Popen(
+                    [sys.executable, '-m', 'bench.bench_asgi', '--serve', mode,
+                     '--port', str(port), '--db', str(Path(tmp) / 'bench.db')],
+                    cwd=WEATHER_DIR, env=env, stdout=subprocess.DEVNULL
+                )
+                try:
+                    base_url = f'http://127.0.0.1:{port}'
+                    wait_ready(f'{base_url}/api/upstream/stats')
+                    # 地域コードは毎回別にして single-flight でまとめられないようにする（revalidate は1回目で取得済みにする）
+                    codes = [f'9{offset + i:05d}' for i in range(concurrency)]
+                    offset += concurrency
+                    if scenario == 'revalidate':
+                        asyncio.run(load(base_url, codes, server.pid))
+                    result = asyncio.run(load(base_url, codes, server.pid))
+                finally:
+                    server.terminate()
+                    server.wait()
+            print(f'{scenario:10s} {mode:5s} c={concurrency:<5d} {result["elapsed_s"]:6.2f}s  '
+                  f'{result["throughput"]:7.1f} req/s  p50 {result["p50_ms"]:8.1f} ms  '
+                  f'p99 {result["p99_ms"]:8.1f} ms  errors {result["errors"]:4d}  '
+                  f'threads {result["peak_threads"]:5d}  peak RSS {result["peak_rss_mb"]:6.1f} MB')
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+読み込みAPIの条件付きレスポンス（ETag / 304）と gzip 圧縮の効果
+
+/latest・/history・/history/<fetched_at> について、通常の200・gzip付きの200・
+If-None-Match付きの304 のレイテンシと転送バイト数を比較する。
+304のときに行を読む関数（get_latest_forecast など）が呼ばれていないことも確認する。
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import database as db
+
+READERS = ('get_latest_forecast', 'get_latest_weekly_forecast', 'get_forecast_history', 'get_forecast_by_fetched_at')
+
+
+def seed(snapshots: int):
+    """130000 の履歴を snapshots 件作る（同一秒に保存するので予報日をずらして一意制約を避ける）"""
+    for i in range(snapshots):
+        dates = [(date(2025, 1, 1) + timedelta(days=i * 10 + d)).isoformat() for d in range(9)]
+        rows = [{'forecast_date': dates[d], 'weather_code': '100', 'weather_text': '晴れ　時々　くもり',
+                 'temp_min': 1, 'temp_max': 10, 'pop': 20, 'wind': '北の風　後　南の風'} for d in (0, 1)]
+        weekly = [{'forecast_date': dates[d], 'weather_code': '101', 'pop': 30,
+                   'temp_min': 2, 'temp_max': 11, 'reliability': 'A'} for d in range(2, 9)]
+        db.save_forecast_snapshot('130000', rows, weekly, f'report-{i}')
+
+
+def measure(client, path, headers, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(path, headers=headers)
+    return (time.perf_counter() - start) / repeat * 1000, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import server
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        seed(20)
+        client = server.app.test_client()
+        fetched_at = client.get('/api/forecast/130000/history').get_json()[0]
+
+        # 行を読む関数の呼び出し回数を数える
+        calls = {name: 0 for name in READERS}
+        for name in READERS:
+            original = getattr(db, name)
+
+            def counting(*a, _name=name, _original=original, **kw):
+                calls[_name] += 1
+                return _original(*a, **kw)
+            setattr(db, name, counting)
+
+        ok = True
+        paths = ('/api/forecast/130000/latest', '/api/forecast/130000/history?limit=50',
+                 f'/api/forecast/130000/history/{fetched_at}')
+        for path in paths:
+            plain_ms, plain = measure(client, path, {}, args.repeat)
+            gzip_ms, gz = measure(client, path, {'Accept-Encoding': 'gzip'}, args.repeat)
+            etag = plain.headers['ETag']
+            before = dict(calls)
+            cond_ms, cond = measure(client, path, {'If-None-Match': etag}, args.repeat)
+            materialized = sum(calls.values()) - sum(before.values())
+            ok &= cond.status_code == 304 and materialized == 0
+            print(f'{path}\n'
+                  f'    200       {plain_ms:7.3f} ms  {len(plain.data):6d} B\n'
+                  f'    200 gzip  {gzip_ms:7.3f} ms  {len(gz.data):6d} B  ({gz.headers.get("Content-Encoding", "identity")})\n'
+                  f'    {cond.status_code}       {cond_ms:7.3f} ms  {len(cond.data):6d} B  row readers called: {materialized}')
+        db.close_pool()
+
+    print('OK' if ok else 'FAILED: 304 path must not read rows')
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+接続方式ごとのスループット比較
+- 従来方式: 関数呼び出しごとに sqlite3.connect / close（POOL_SIZE = 0）
+- プール方式: 長寿命の接続を使い回す + WAL
+
+/api/forecast/<area_code>/latest 1回分の処理（最新予報 + 週間予報の取得）を
+1リクエストとして、複数スレッドから実行したときの毎秒リクエスト数を計測する。
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import database as db
+
+AREA_CODES = ['130000', '270000', '016000', '400000', '471000']
+
+
+def seed(n_snapshots: int):
+    """ベンチマーク用のデータを投入"""
+    db.init_database()
+    db.save_areas_batch([(code, code) for code in AREA_CODES])
+    # fetched_atは秒単位なので、同一秒内でも一意になるよう予報日をずらす
+    for i in range(n_snapshots):
+        forecast_date = f'2025-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}'
+        for code in AREA_CODES:
+            db.save_forecast(code, forecast_date, '100', '晴れ', 3, 12, 10, '北の風', '2025-01-01T05:00:00+09:00')
+            db.save_weekly_forecast(code, forecast_date, '101', 20, 4, 13, 'A')
+
+
+def run(threads: int, duration: float) -> float:
+    """指定スレッド数で duration 秒間リクエストを実行し、毎秒リクエスト数を返す"""
+    counts = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        i = 0
+        while time.perf_counter() < deadline:
+            code = AREA_CODES[i % len(AREA_CODES)]
+            db.get_latest_forecast(code)
+            db.get_latest_weekly_forecast(code)
+            i += 1
+        counts[index] = i
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--snapshots', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        seed(args.snapshots)
+        # save_forecast / save_weekly_forecast は latest_* も更新するので、/latest の読み込みは空にならない
+        assert db.get_latest_forecast(AREA_CODES[0]) and db.get_latest_weekly_forecast(AREA_CODES[0])
+
+        results = {}
+        for label, pool_size in (('per-call connect', 0), ('pooled + WAL', args.threads)):
+            db.close_pool()
+            db.POOL_SIZE = pool_size
+            results[label] = run(args.threads, args.duration)
+            print(f'{label:>18}: {results[label]:10.1f} req/s')
+        db.close_pool()
+
+    base = results['per-call connect']
+    print(f'{"speedup":>18}: {results["pooled + WAL"] / base:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
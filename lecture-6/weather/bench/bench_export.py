@@ -0,0 +1,91 @@
+"""
+大量の予報履歴をエクスポートしたときの速度とピークメモリ（RSS）
+
+weekly_forecasts に --rows 行の合成データを入れ、export.py を別プロセスで実行して
+/dev/null に書き出す。子プロセスのピークRSSが --max-rss-mb を超えたら失敗にする。
+
+    python -m bench.bench_export --rows 10000000
+"""
+
+import argparse
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import database as db
+
+WEATHER_DIR = Path(__file__).resolve().parent.parent
+
+
+def generate(path: Path, rows: int):
+    """合成データを生成しながら投入（生成側もメモリを使わない）"""
+    def synthetic():
+        for i in range(rows):
+            snapshot, offset = divmod(i, 7 * 58)
+            area, day = divmod(offset, 7)
+            fetched_at = f'2024-{1 + snapshot // 2000 % 12:02d}-{1 + snapshot // 80 % 25:02d} {snapshot % 24:02d}:{snapshot // 24 % 60:02d}:{snapshot // 1440 % 60:02d}'
+            yield (f'{area:06d}', f'2024-01-{1 + (snapshot + day) % 28:02d}', '101', i % 100, -5 + i % 20, 5 + i % 25, 'A', fetched_at)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    # 一意制約とインデックスの維持を避けるため、生成中は制約なしの同じ列構成の表に入れる
+    # （id は INTEGER PRIMARY KEY のままにして、rowid順の読み出しを本番と同じにする）
+    conn.execute('DROP TABLE weekly_forecasts')
+    conn.execute('''
+        CREATE TABLE weekly_forecasts (
+            id INTEGER PRIMARY KEY, area_code TEXT NOT NULL, forecast_date DATE NOT NULL,
+            weather_code TEXT, pop INTEGER, temp_min INTEGER, temp_max INTEGER,
+            reliability TEXT, fetched_at TIMESTAMP
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO weekly_forecasts (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', synthetic())
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--max-rss-mb', type=float, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'export.db'
+        db.DB_PATH = path
+        db.init_database()
+        db.close_pool()
+
+        start = time.perf_counter()
+        generate(path, args.rows)
+        print(f'generated {args.rows:,} rows in {time.perf_counter() - start:.1f}s '
+              f'({path.stat().st_size / 1e6:.0f} MB)')
+
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, 'export.py', '--db', str(path), '--table', 'weekly_forecasts',
+             '--format', args.format, '-o', os.devnull],
+            cwd=WEATHER_DIR, check=True
+        )
+        elapsed = time.perf_counter() - start
+
+    # Linux の ru_maxrss はKiB単位
+    peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f'exported {args.rows:,} rows as {args.format} in {elapsed:.1f}s '
+          f'({args.rows / elapsed:,.0f} rows/s), peak RSS {peak_mb:.1f} MB')
+    if peak_mb > args.max_rss_mb:
+        print(f'FAILED: peak RSS exceeds {args.max_rss_mb} MB')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+計測（metrics.py）を有効にしたままにしたときのオーバーヘッド
+
+- ラッパー1回あたり: 何もしない関数を計測ラッパー経由で呼んだときの増分
+- ルートごとの見積もり: 1リクエストで記録される計測値の数 × ラッパー1回あたりの増分 ÷ 計測なしの処理時間
+  （--max-overhead を超えたら失敗）
+- ルートごとの実測: WEATHER_METRICS=0 / 1 の別プロセスでテストクライアントから各ルートを呼んだ時間
+  （0 / 1 を --rounds 回ずつ交互に実行し、ブロックごとの平均の最小値で比べる。
+  共有環境ではこの差はノイズに埋もれやすいので参考値として表示する）
+
+    python -m bench.bench_metrics --repeat 5000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import metrics
+
+WEATHER_DIR = Path(__file__).resolve().parent.parent
+PATHS = ('/api/areas', '/api/forecast/130000', '/api/forecast/130000/latest',
+         '/api/forecast/130000/history', '/api/forecasts/latest?areas=130000,270000')
+BLOCK = 200  # この回数ごとに平均をとり、最も速いブロックを採用する
+
+
+def per_call(fn, repeat: int, *args) -> float:
+    """1回あたりの時間（マイクロ秒）。ブロックごとの平均の最小値"""
+    best = float('inf')
+    for _ in range(max(1, repeat // BLOCK)):
+        start = time.perf_counter()
+        for _ in range(BLOCK):
+            fn(*args)
+        best = min(best, (time.perf_counter() - start) / BLOCK * 1e6)
+    return best
+
+
+def observations() -> int:
+    """これまでに記録された計測値（ヒストグラムの件数）の合計"""
+    return sum(
+        state[2]
+        for metric in metrics._registry if isinstance(metric, metrics.Histogram)
+        for state in list(metric._values.values())
+    )
+
+
+def child(repeat: int):
+    """このプロセスの設定（WEATHER_METRICS）で各ルートの時間と計測値の数を測ってJSONで出力"""
+    from bench.stub_jma import StubJMA
+
+    with StubJMA() as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        import database as db
+        import jma
+        import server
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        jma.fetch_forecast('130000')
+        jma.fetch_forecast('270000')
+        client = server.app.test_client()
+
+        results = {}
+        for path in PATHS:
+            client.get(path).data  # ウォームアップ（初回だけの取得・保存を数えない）
+            before = observations()
+            client.get(path).data
+            results[path] = {
+                'observations': observations() - before,
+                'us': per_call(lambda: client.get(path).data, repeat),
+            }
+        db.close_pool()
+    print(json.dumps(results))
+
+
+def run_child(enabled: str, repeat: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-m', 'bench.bench_metrics', '--child', '--repeat', str(repeat)],
+        cwd=WEATHER_DIR, env={**os.environ, 'WEATHER_METRICS': enabled},
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--max-overhead', type=float, default=0.05, help='許容するルートごとのオーバーヘッド（割合）')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.repeat)
+        return
+
+    # ラッパー1回あたり（登録しないメトリクスを使うので /metrics には出ない）
+    def noop():
+        pass
+    timed_noop = metrics._observe_call(
+        noop, 'bench',
+        metrics.Histogram('bench', '', ('function',), register=False),
+        metrics.Counter('bench_errors', '', ('function',), register=False),
+        metrics.Gauge('bench_in_flight', '', register=False),
+        None
+    )
+    histogram = metrics.Histogram('bench', '', ('function',), register=False)
+    plain_us = per_call(noop, args.repeat * 10)
+    wrapper_us = per_call(timed_noop, args.repeat * 10) - plain_us
+    observe_us = per_call(histogram.observe, args.repeat * 10, 0.001, 'bench')
+    print(f'Histogram.observe  {observe_us * 1000:6.0f} ns/call')
+    print(f'timing wrapper     {wrapper_us * 1000:6.0f} ns/call')
+
+    runs = {'0': {}, '1': {}}
+    for _ in range(args.rounds):
+        for enabled in ('0', '1'):
+            for path, result in run_child(enabled, args.repeat).items():
+                best = runs[enabled].get(path)
+                if best is None or result['us'] < best['us']:
+                    runs[enabled][path] = result
+
+    worst = 0.0
+    print(f'{"":42s} {"off":>9s} {"on":>9s} {"measured":>9s} {"calls":>6s} {"estimated":>9s}')
+    for path in PATHS:
+        off, on = runs['0'][path]['us'], runs['1'][path]['us']
+        calls = runs['1'][path]['observations']
+        estimated = calls * wrapper_us / off
+        worst = max(worst, estimated)
+        print(f'{path:42s} {off:7.1f}us {on:7.1f}us {(on - off) / off:+9.1%} {calls:6d} {estimated:+9.2%}')
+
+    if worst > args.max_overhead:
+        print(f'FAILED: estimated overhead {worst:.1%} exceeds {args.max_overhead:.0%}')
+        raise SystemExit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+気象庁APIの予報レスポンスの解析スループット（記録済みのレスポンスを使用）
+
+bench/fixtures/forecast_*.json それぞれについて次を計測する。
+- json:  本文（bytes）のJSONデコード
+- parse: parse_forecast + build_rows（全細分区域の行を作るまで）
+- save:  官署 + 全細分区域の行の保存。save_forecast_snapshots の一括書き込みと、
+         地域ごとに save_forecast_snapshot を呼ぶ場合（地域数ぶんのトランザクション）を比較
+
+    python -m bench.bench_parse --repeat 2000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import database as db
+import jma
+from bench.stub_jma import FIXTURES_DIR
+
+
+def per_call(fn, repeat: int) -> float:
+    """1回あたりの時間（マイクロ秒）"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def snapshots_for(data: list, i: int) -> tuple:
+    """呼び出しごとに別の発表として保存されるよう report_datetime を変えた保存内容"""
+    snapshots = {}
+    for code, record in jma.parse_forecast(data)['areas'].items():
+        snapshots[code] = jma.build_rows(record)
+    return snapshots, f'bench-{i}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--save-repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+
+        for path in sorted(FIXTURES_DIR.glob('forecast_*.json')):
+            body = path.read_bytes()
+            data = json.loads(body)
+            report = jma.parse_forecast(data)
+            rows = sum(len(f) + len(w) for f, w in map(jma.build_rows, report['areas'].values()))
+
+            def parse(i):
+                for record in jma.parse_forecast(data)['areas'].values():
+                    jma.build_rows(record)
+
+            json_us = per_call(lambda i: json.loads(body), args.repeat)
+            parse_us = per_call(parse, args.repeat)
+            print(f'{path.name}: {len(body):,} bytes, {len(report["areas"])} areas, {rows} rows')
+            print(f'    json   {json_us:8.1f} us')
+            print(f'    parse  {parse_us:8.1f} us  ({1e6 / parse_us:,.0f} payloads/s, {rows * 1e6 / parse_us:,.0f} rows/s)')
+
+            # 同じ秒に同じ地域・予報日で保存すると一意制約に当たるので、予報日に通し番号を付けた保存内容を事前に作る
+            offset = 0
+            for label, save in (
+                ('bulk', lambda snapshots, report_datetime: db.save_forecast_snapshots(snapshots, report_datetime)),
+                ('per-area', lambda snapshots, report_datetime: [
+                    db.save_forecast_snapshot(code, f, w, report_datetime) for code, (f, w) in snapshots.items()
+                ]),
+            ):
+                prepared = []
+                for i in range(args.save_repeat):
+                    snapshots, report_datetime = snapshots_for(data, offset + i)
+                    for rows_f, rows_w in snapshots.values():
+                        for row in rows_f + rows_w:
+                            row['forecast_date'] = f'{offset + i:06d}-{row["forecast_date"]}'
+                    prepared.append((snapshots, report_datetime))
+                offset += args.save_repeat
+                save_us = per_call(lambda i: save(*prepared[i]), args.save_repeat)
+                print(f'    save   {save_us:8.1f} us  {label}')
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+予報履歴の単一テーブルと月別パーティション（database.py）の書き込み・読み込みの比較
+
+bench.generate で同じ合成履歴を2つのレイアウトで作り（--partitioned は取得月ごとのファイル）、
+それぞれで次の処理の時間（p50 / p99）を計る。
+パーティションは最後の --active-months か月を残して読み込み専用にしてから計る（maintenance.py の運用と同じ状態）。
+
+- save:              save_forecast_snapshots（全官署 × 今日・明日 + 週間 = 522行を1トランザクションで）
+- history:           get_forecast_history（最新10件）
+- by_fetched_at:     get_forecast_by_fetched_at（過去のランダムな取得日時。recent は直近30日から）
+- exists:            forecast_snapshot_exists（過去のランダムな取得日時）
+- history_version:   get_history_version（履歴のETag）
+- export month:      iter_forecast_rows（週間予報・1か月分の取得日時の範囲）
+- export area month: iter_forecast_rows（週間予報・1地域の1か月分）
+
+    python -m bench.bench_partitions --rows 10000000 --dir /var/tmp/bench_partitions
+    python -m bench.bench_partitions --dir /var/tmp/bench_partitions --reuse   # 作成済みのDBで計り直す
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database as db
+from bench.generate import LAST_PUBLICATION, generate
+from bench.stub_jma import load_fixture
+
+LAYOUTS = ('single', 'partitioned')
+
+
+def percentiles(samples: list) -> tuple:
+    """(p50, p99) ミリ秒"""
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def timed(fn, repeat: int) -> list:
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def snapshots(areas: list, i: int) -> dict:
+    """i 回目の保存内容（回ごとに予報日をずらして、同じ秒に保存しても一意制約に触れないようにする）"""
+    day = datetime(2030, 1, 1) + timedelta(days=i * 8)
+    result = {}
+    for area_code in areas:
+        forecasts = [{
+            'forecast_date': (day + timedelta(days=d)).strftime('%Y-%m-%d'), 'weather_code': '100',
+            'weather_text': '晴れ', 'temp_min': 3 if d == 0 else None, 'temp_max': 11 if d == 0 else None,
+            'pop': 10, 'wind': '北の風',
+        } for d in (0, 1)]
+        weekly = [{
+            'forecast_date': (day + timedelta(days=d)).strftime('%Y-%m-%d'), 'weather_code': '101',
+            'pop': 20, 'temp_min': 3, 'temp_max': 11, 'reliability': 'A',
+        } for d in range(1, 8)]
+        result[area_code] = (forecasts, weekly)
+    return result
+
+
+def disk_usage(directory: Path) -> int:
+    return sum(file.stat().st_size for file in directory.rglob('*') if file.is_file())
+
+
+def run(layout: str, path: Path, repeat: int, saves: int, seed: int) -> dict:
+    db.close_pool()
+    db.DB_PATH = path
+    db.PARTITIONED = layout == 'partitioned'
+    rng = random.Random(seed)
+    areas = sorted(load_fixture('area.json')['offices'])
+    with db.connection() as conn:
+        first, last = conn.execute('SELECT MIN(fetched_at), MAX(fetched_at) FROM forecast_reports').fetchone()
+    start, end = datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+    def random_fetched_at(within_days: int = None) -> str:
+        """合成履歴の取得日時（発表の10分後）からランダムに選ぶ"""
+        days = rng.randrange(min(within_days or (end - start).days + 1, (end - start).days + 1))
+        published = (LAST_PUBLICATION - timedelta(days=days)).replace(hour=rng.choice((5, 11, 17)))
+        return max(start, min(end, published + timedelta(minutes=10))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def export(area_code: str = None) -> int:
+        """ランダムな1か月分の取得日時の週間予報を読み、行数を返す"""
+        month = random_fetched_at()[:7]
+        rows = db.iter_forecast_rows('weekly_forecasts', area_code,
+                                     fetched_from=f'{month}-01 00:00:00', fetched_to=f'{month}-31 23:59:59')
+        return sum(1 for _ in rows)
+
+    results = {}
+    db.save_forecast_snapshots(snapshots(areas, saves), '2030-01-01T05:00:00+09:00')  # パーティションの作成を除く
+    results['save'] = timed(lambda i: db.save_forecast_snapshots(
+        snapshots(areas, i), f'2030-01-01T05:00:{i % 60:02d}+09:00'), saves)
+    results['history'] = timed(lambda i: db.get_forecast_history(rng.choice(areas), 10), repeat)
+    results['by_fetched_at'] = timed(lambda i: db.get_forecast_by_fetched_at(rng.choice(areas), random_fetched_at()), repeat)
+    results['by_fetched_at recent'] = timed(
+        lambda i: db.get_forecast_by_fetched_at(rng.choice(areas), random_fetched_at(30)), repeat)
+    results['exists'] = timed(lambda i: db.forecast_snapshot_exists(rng.choice(areas), random_fetched_at()), repeat)
+    results['history_version'] = timed(lambda i: db.get_history_version(rng.choice(areas)), repeat)
+    results['export month'] = timed(lambda i: export(), max(1, repeat // 50))
+    results['export area month'] = timed(lambda i: export(rng.choice(areas)), max(1, repeat // 10))
+    db.close_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='予報履歴の合計行数')
+    parser.add_argument('--dir', type=Path, default=Path('bench_partitions'), help='DBを作るディレクトリ')
+    parser.add_argument('--reuse', action='store_true', help='作成済みのDBを使う')
+    parser.add_argument('--active-months', type=int, default=4, help='書き込み可能のまま残す直近の月数')
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--saves', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = {layout: args.dir / layout / 'weather.db' for layout in LAYOUTS}
+    for layout, path in paths.items():
+        if args.reuse and path.exists():
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        inserted = generate(path, args.rows, args.seed, partitioned=layout == 'partitioned')
+        print(f'{layout}: generated {inserted:,} rows in {time.perf_counter() - start:.0f}s')
+        if layout == 'partitioned':
+            db.DB_PATH = path
+            months = [partition['month'] for partition in db.list_partitions()]
+            if len(months) > args.active_months:
+                db.freeze_partitions(months[-args.active_months])
+            db.close_pool()
+
+    results = {}
+    for layout, path in paths.items():
+        results[layout] = run(layout, path, args.repeat, args.saves, args.seed)
+        db.DB_PATH = path
+        print(f'{layout}: {disk_usage(path.parent) / 1e9:.2f} GB, {len(db.list_partitions())} partitions')
+        db.close_pool()
+
+    print(f'{"":20s} {"single p50":>11s} {"p99":>9s} {"partitioned p50":>16s} {"p99":>9s}   (ms)')
+    for name in results['single']:
+        single, partitioned = percentiles(results['single'][name]), percentiles(results['partitioned'][name])
+        print(f'{name:20s} {single[0]:11.2f} {single[1]:9.2f} {partitioned[0]:16.2f} {partitioned[1]:9.2f}')
+
+
+if __name__ == '__main__':
+    main()
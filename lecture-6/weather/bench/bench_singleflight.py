@@ -0,0 +1,88 @@
+"""
+同時リクエストのまとめ込み（single-flight）の確認
+
+同じ /api/forecast/<area_code> にN本のリクエストを同時に送り、
+気象庁スタブへの実リクエスト数と保存されたスナップショット数を数える。
+single-flight有効時は上流への呼び出しがちょうど1回であることを確認する。
+（キャッシュのTTLは0にして、まとめ込みだけの効果を見る）
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from bench.stub_jma import StubJMA
+
+
+class _NoFlight:
+    """比較用: まとめ込みを行わない"""
+
+    def do(self, key, fn, timeout=None):
+        return fn()
+
+
+def fire(client, path: str, n: int):
+    """n本のリクエストを同時に送り、ステータスコードの一覧と所要時間を返す"""
+    barrier = threading.Barrier(n)
+    statuses = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        statuses[i] = client.get(path).status_code
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.2, help='スタブの応答遅延（秒）')
+    args = parser.parse_args()
+
+    with StubJMA(latency=args.latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        import database as db
+        import jma
+        import server
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        client = server.app.test_client()
+        ok = True
+
+        for label, flight in (('no coalescing', _NoFlight()), ('single-flight', jma.SingleFlight())):
+            jma.upstream_flight = flight
+            area_code = '130000' if label == 'single-flight' else '270000'
+            jma.jma_cache = jma.UpstreamCache(ttl=0)
+            before = stub.total_requests()
+            statuses, elapsed = fire(client, f'/api/forecast/{area_code}', args.clients)
+            upstream = stub.total_requests() - before
+            snapshots = len(db.get_forecast_history(area_code, limit=1000))
+            print(f'{label:>14}: upstream calls {upstream:3d}  '
+                  f'statuses {dict((s, statuses.count(s)) for s in set(statuses))}  '
+                  f'snapshots {snapshots}  elapsed {elapsed:.3f}s')
+            if label == 'single-flight':
+                ok &= upstream == 1 and statuses == [200] * args.clients
+
+        # エラーも全員に伝わること（未知の地域コードはスタブが404を返す）
+        before = stub.total_requests()
+        statuses, _ = fire(client, '/api/forecast/999999', args.clients)
+        upstream = stub.total_requests() - before
+        print(f'{"error path":>14}: upstream calls {upstream:3d}  statuses {dict((s, statuses.count(s)) for s in set(statuses))}')
+        ok &= upstream == 1 and statuses == [500] * args.clients
+        db.close_pool()
+
+    print('OK' if ok else 'FAILED: expected exactly one upstream call per burst')
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
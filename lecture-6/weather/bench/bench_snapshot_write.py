@@ -0,0 +1,71 @@
+"""
+1回の予報取得分（今日1行 + 週間7行）を保存するレイテンシの比較
+- 行ごと: save_forecast / save_weekly_forecast を行数分呼ぶ（行ごとにコミット）
+- 一括: save_forecast_snapshot で1トランザクションにまとめる
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import database as db
+
+FORECAST_ROW = {
+    'forecast_date': '2025-01-01', 'weather_code': '100', 'weather_text': '晴れ',
+    'temp_min': 3, 'temp_max': 12, 'pop': 10, 'wind': '北の風'
+}
+WEEKLY_ROWS = [
+    {'forecast_date': f'2025-01-{day:02d}', 'weather_code': '101', 'pop': 20,
+     'temp_min': 4, 'temp_max': 13, 'reliability': 'A'}
+    for day in range(1, 8)
+]
+REPORT_DATETIME = '2025-01-01T05:00:00+09:00'
+
+
+def save_per_row(area_code):
+    f = FORECAST_ROW
+    db.save_forecast(area_code, f['forecast_date'], f['weather_code'], f['weather_text'],
+                     f['temp_min'], f['temp_max'], f['pop'], f['wind'], REPORT_DATETIME)
+    for w in WEEKLY_ROWS:
+        db.save_weekly_forecast(area_code, w['forecast_date'], w['weather_code'],
+                                w['pop'], w['temp_min'], w['temp_max'], w['reliability'])
+
+
+def save_bulk(area_code):
+    db.save_forecast_snapshot(area_code, [FORECAST_ROW], WEEKLY_ROWS, REPORT_DATETIME)
+
+
+def measure(label, func, iterations):
+    """1スナップショットあたりの保存時間（ミリ秒）を計測"""
+    samples = []
+    for i in range(iterations):
+        # fetched_atは秒単位で一意制約に含まれるため、毎回別の地域コードを使う
+        area_code = f'{label[0]}{i:05d}'
+        start = time.perf_counter()
+        func(area_code)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f'{label:>8}: mean {statistics.mean(samples):7.3f} ms  '
+          f'p50 {samples[len(samples) // 2]:7.3f} ms  p99 {samples[int(len(samples) * 0.99)]:7.3f} ms')
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        per_row = measure('per-row', save_per_row, args.iterations)
+        bulk = measure('bulk', save_bulk, args.iterations)
+        db.close_pool()
+
+    print(f'{"speedup":>8}: {per_row / bulk:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+気象庁APIキャッシュの効果を計測（スタブサーバー使用、オフラインで実行可能）
+
+/api/forecast/<area_code> を繰り返し呼び、次の3通りで比較する。
+- no cache:    毎回本文を取得して解析・DB保存（キャッシュ導入前と同じ動作）
+- revalidate:  TTL=0。毎回条件付きGETを送り、304なら解析・保存を省く
+- ttl:         TTL内はネットワークに出ない
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from bench.stub_jma import StubJMA
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='スタブの応答遅延（秒）')
+    args = parser.parse_args()
+
+    with StubJMA(latency=args.latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        import database as db
+        import jma
+        import server
+        db.DB_PATH = Path(tmp) / 'bench.db'
+        db.init_database()
+        client = server.app.test_client()
+        # fetched_atは秒単位で一意制約に含まれるため、全官署を順に回して同一地域の連続保存を避ける
+        area_codes = sorted(stub.area['offices'])
+
+        for label, ttl, cached in (('no cache', 0, False), ('revalidate', 0, True), ('ttl', 300, True)):
+            jma.jma_cache = jma.UpstreamCache(ttl=ttl)
+            before = stub.total_requests()
+            start = time.perf_counter()
+            for i in range(args.requests):
+                if not cached:
+                    jma.jma_cache.invalidate()
+                response = client.get(f'/api/forecast/{area_codes[i % len(area_codes)]}')
+                assert response.status_code == 200, response.data
+            elapsed = time.perf_counter() - start
+            stats = jma.jma_cache.stats()
+            print(f'{label:>10}: {elapsed / args.requests * 1000:8.3f} ms/req  '
+                  f'upstream {stub.total_requests() - before:5d}  '
+                  f'hits {stats["hits"]:5d}  304 {stats["revalidated"]:5d}  misses {stats["misses"]:5d}')
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
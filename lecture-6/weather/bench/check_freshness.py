@@ -0,0 +1,126 @@
+"""
+定時発表に基づく鮮度判定（freshness.py）と /api/forecast/<area_code> の振る舞いを固定した時刻で確認する
+
+1. 発表日時と現在時刻の組み合わせごとに is_fresh の結果を確かめる
+2. スタブの気象庁API（東京: 2025-01-10 17:00 発表）で一度取得したあと、freshness.clock を
+   固定した時刻に差し替えて /api/forecast/130000 を呼び、DBから返したか（スタブへの
+   リクエストが増えないか）・?force=1 で取り直すかを確かめる
+3. 1日を1分刻みでたどり、毎分1回のリクエストのうち気象庁に問い合わせる回数を数える
+
+どれかが期待と違えば終了コード1で終わる。
+
+    python -m bench.check_freshness
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database as db
+import freshness
+from bench.stub_jma import StubJMA
+from freshness import JST
+
+GRACE = timedelta(minutes=10)
+REPORT = '2025-01-10T17:00:00+09:00'
+
+
+def at(text: str) -> datetime:
+    return datetime.fromisoformat(text).replace(tzinfo=JST)
+
+
+# (発表日時, 現在時刻（JST）, 期待する is_fresh)
+CASES = (
+    (REPORT, '2025-01-10 17:30', True),
+    (REPORT, '2025-01-11 04:59', True),
+    (REPORT, '2025-01-11 05:09', True),    # 次の発表から猶予時間内
+    (REPORT, '2025-01-11 05:10', False),   # 猶予時間を過ぎた
+    (REPORT, '2025-01-12 12:00', False),
+    ('2025-01-10T05:00:00+09:00', '2025-01-10 10:00', True),
+    ('2025-01-10T05:00:00+09:00', '2025-01-10 11:10', False),
+    ('2025-01-10T11:00:00+09:00', '2025-01-10 17:05', True),
+    ('2025-01-10T13:30:00+09:00', '2025-01-10 17:05', True),   # 臨時の発表は次の定時発表まで
+    ('2025-01-10T08:00:00Z', '2025-01-10 17:05', True),         # UTCで書かれた 17:00 JST
+    ('2025-01-10T08:00:00Z', '2025-01-11 05:10', False),
+    ('', '2025-01-10 17:30', False),
+    (None, '2025-01-10 17:30', False),
+    ('not a date', '2025-01-10 17:30', False),
+)
+
+# (現在時刻（JST）, クエリ, 期待する応答元)
+ENDPOINT_CASES = (
+    ('2025-01-10 18:00', '', 'db'),
+    ('2025-01-11 05:05', '', 'db'),
+    ('2025-01-10 18:00', '?force=1', 'upstream'),
+    ('2025-01-11 06:00', '', 'upstream'),
+)
+
+
+def check(label: str, ok: bool, failed: list):
+    print(f'{"OK  " if ok else "FAIL"} {label}')
+    if not ok:
+        failed.append(label)
+
+
+def main():
+    failed = []
+
+    print('is_fresh')
+    for report_datetime, now, expected in CASES:
+        result = freshness.is_fresh(report_datetime, at(now), GRACE)
+        check(f'{report_datetime!r:30s} at {now}: {result}', result == expected, failed)
+
+    print('/api/forecast/130000')
+    with StubJMA() as stub, tempfile.TemporaryDirectory() as tmp:
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        import jma
+        import server
+        db.DB_PATH = Path(tmp) / 'check.db'
+        db.init_database()
+        jma.fetch_and_save_areas()
+        client = server.app.test_client()
+
+        freshness.clock = lambda: at('2025-01-10 17:30')
+        first = client.get('/api/forecast/130000')
+        stored = client.get('/api/forecast/130000')
+        check(f'first request from {first.headers["X-Forecast-Source"]}',
+              first.headers['X-Forecast-Source'] == 'upstream', failed)
+        check('stored response matches upstream response', stored.json == first.json, failed)
+
+        for now, query, expected in ENDPOINT_CASES:
+            freshness.clock = lambda: at(now)
+            before = stub.total_requests()
+            response = client.get(f'/api/forecast/130000{query}')
+            source = response.headers.get('X-Forecast-Source')
+            upstream_requests = stub.total_requests() - before
+            # upstream の場合は上流のキャッシュ（TTL）で応答することもあるので、db のときだけ回数を見る
+            check(f'{now} {query or "(no query)":9s} -> {source} ({upstream_requests} upstream requests)',
+                  source == expected and (expected != 'db' or upstream_requests == 0), failed)
+
+        # スタブは常に 17:00 発表を返すので、問い合わせたら保存済みの発表日時を
+        # 直前の定時発表に進めて、発表ごとに新しい予報が取れた状態を再現する
+        print('one day, one request per minute')
+        start = at('2025-01-10 17:30')
+        upstream = 0
+        for minute in range(24 * 60):
+            now = start + timedelta(minutes=minute)
+            freshness.clock = lambda: now
+            if jma.load_fresh_forecast('130000') is None:
+                upstream += 1
+                published = freshness.latest_publication(now)
+                with db.connection() as conn:
+                    conn.execute('UPDATE latest_forecasts SET report_datetime = ? WHERE area_code = ?',
+                                 (published.isoformat(), '130000'))
+                    conn.commit()
+        check(f'{upstream} of {24 * 60} requests went upstream', upstream == 3, failed)
+        db.close_pool()
+
+    if failed:
+        print(f'FAILED: {len(failed)} checks')
+        raise SystemExit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
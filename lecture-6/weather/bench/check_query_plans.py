@@ -0,0 +1,121 @@
+"""
+読み込み関数がテーブル全体をスキャンしていないかを EXPLAIN QUERY PLAN で確認する
+
+数百万行の合成データを入れたDBで database.py の読み込み関数を実際に呼び、
+発行されたSQLをトレースして実行計画を調べる。どれかが SCAN（全件走査）に
+なっていたら終了コード1で終わるので、インデックスの退行を検出できる。
+（月に1行のパーティションのカタログ forecast_partitions の走査は対象外）
+--partitioned では投入後に履歴を月別パーティションに移し、パーティションを読む実行計画を調べる。
+
+    python -m bench.check_query_plans --snapshots 4000   # 約210万行
+    python -m bench.check_query_plans --snapshots 4000 --partitioned
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import database as db
+
+AREAS = 58
+SMALL_TABLES = ('forecast_partitions',)  # 走査してよいテーブル
+
+
+def build(snapshots: int):
+    """snapshots回分の取得履歴（地域ごとに今日・明日 + 週間7日）を投入"""
+    base = datetime(2024, 1, 1)
+    with db.connection() as conn:
+        for s in range(snapshots):
+            fetched_at = (base + timedelta(hours=3 * s)).strftime('%Y-%m-%d %H:%M:%S')
+            day = (base + timedelta(hours=3 * s)).date()
+            dates = [(day + timedelta(days=d)).isoformat() for d in range(8)]
+            conn.executemany('''
+                INSERT INTO forecasts
+                (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
+                VALUES (?, ?, '100', '晴れ', 1, 10, 20, '北の風', ?, ?)
+            ''', [(f'{a:06d}', dates[d], fetched_at, fetched_at) for a in range(AREAS) for d in range(2)])
+            conn.executemany('''
+                INSERT INTO weekly_forecasts
+                (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+                VALUES (?, ?, '101', 30, 2, 11, 'A', ?)
+            ''', [(f'{a:06d}', dates[d + 1], fetched_at) for a in range(AREAS) for d in range(7)])
+        # 最後のスナップショットを最新テーブルへ
+        conn.execute('''
+            INSERT INTO latest_forecasts
+            SELECT area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at
+            FROM forecasts WHERE fetched_at = ?
+        ''', (fetched_at,))
+        conn.execute('''
+            INSERT INTO latest_weekly_forecasts
+            SELECT area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at
+            FROM weekly_forecasts WHERE fetched_at = ?
+        ''', (fetched_at,))
+        conn.commit()
+        conn.execute('ANALYZE')
+        return fetched_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshots', type=int, default=4000)
+    parser.add_argument('--partitioned', action='store_true', help='履歴を月別パーティションに移してから調べる')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / 'plans.db'
+        db.POOL_SIZE = 1  # すべての呼び出しを同じ接続で行い、トレースを取りこぼさない
+        db.init_database()
+        start = time.perf_counter()
+        last_fetched_at = build(args.snapshots)
+
+        with db.connection() as conn:
+            rows = conn.execute('SELECT (SELECT COUNT(*) FROM forecasts) + (SELECT COUNT(*) FROM weekly_forecasts)').fetchone()[0]
+            print(f'synthetic rows: {rows:,} ({time.perf_counter() - start:.1f}s)')
+        if args.partitioned:
+            moved = db.partition_history()
+            print(f'partitioned into {len(moved)} months')
+
+        with db.connection() as conn:
+            statements = []
+            conn.set_trace_callback(statements.append)
+
+        readers = {
+            'get_latest_forecast': lambda: db.get_latest_forecast('000042'),
+            'get_latest_forecast(date)': lambda: db.get_latest_forecast('000042', last_fetched_at[:10]),
+            'get_latest_weekly_forecast': lambda: db.get_latest_weekly_forecast('000042'),
+            'get_forecast_history': lambda: db.get_forecast_history('000042', 10),
+            'get_forecast_by_fetched_at': lambda: db.get_forecast_by_fetched_at('000042', last_fetched_at),
+            'forecast_snapshot_exists': lambda: db.forecast_snapshot_exists('000042', last_fetched_at),
+            'get_history_version': lambda: db.get_history_version('000042'),
+        }
+
+        failed = []
+        for name, call in readers.items():
+            statements.clear()
+            start = time.perf_counter()
+            call()
+            elapsed = (time.perf_counter() - start) * 1000
+            with db.connection() as conn:
+                conn.set_trace_callback(None)
+                plans = [
+                    row['detail']
+                    for sql in statements if sql.lstrip().upper().startswith('SELECT')
+                    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)
+                ]
+                conn.set_trace_callback(statements.append)
+            scans = [p for p in plans if p.startswith('SCAN') and p.split()[1] not in SMALL_TABLES]
+            status = 'FAIL' if scans else 'ok'
+            print(f'{status:>4} {name:<28} {elapsed:8.3f} ms  ' + ' | '.join(plans))
+            if scans:
+                failed.append(name)
+        db.close_pool()
+
+    if failed:
+        print(f'table scans detected in: {", ".join(failed)}')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+ベンチマーク用の予報履歴を生成する
+
+bench/fixtures/area.json の全地域について、05/11/17時（JST）の発表ごとに
+今日・明日（forecasts 2行）と週間予報（weekly_forecasts 7行）のスナップショットを、
+合計 --rows 行になるまで過去に向かって作る。forecast_reports・latest_* も本番と同じ状態にする。
+--partitioned では予報履歴を取得月ごとのパーティション（database.py）に直接書き込む。
+
+    python -m bench.generate --rows 1000000 --db bench_weather.db
+    python -m bench.generate --rows 1000000 --db bench_weather.db --partitioned
+
+--db のファイル（と -wal / -shm、パーティションのディレクトリ）は削除して作り直すので、
+本番のDB（database.DB_PATH）は指定できない。
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from math import ceil, cos, pi
+from pathlib import Path
+
+import database as db
+from bench.stub_jma import load_fixture
+from freshness import PUBLICATION_HOURS
+
+ROWS_PER_SNAPSHOT = 9  # forecasts 2行 + weekly_forecasts 7行
+LAST_PUBLICATION = datetime(2025, 1, 10, 17, 0)
+COMMIT_EVERY = 100_000
+PRODUCTION_DB = db.DB_PATH.resolve()  # generate() が db.DB_PATH を書き換える前の本番のDB
+
+WEATHERS = (
+    ('100', '晴れ'),
+    ('101', '晴れ　時々　くもり'),
+    ('200', 'くもり'),
+    ('201', 'くもり　時々　晴れ'),
+    ('202', 'くもり　一時　雨'),
+    ('300', '雨'),
+    ('313', '雨　後　くもり'),
+    ('400', '雪'),
+)
+WINDS = ('北の風', '北の風　後　南の風', '南の風　やや強く', '西の風　海上　では　西の風　強く')
+RELIABILITIES = ('A', 'B', 'C')
+
+
+def publications(count: int):
+    """最後の発表から数えて count 回分の発表日時（古い順）"""
+    times = []
+    day = LAST_PUBLICATION.replace(hour=0)
+    while len(times) < count:
+        for hour in reversed(PUBLICATION_HOURS):
+            published = day.replace(hour=hour)
+            if published <= LAST_PUBLICATION and len(times) < count:
+                times.append(published)
+        day -= timedelta(days=1)
+    return times[::-1]
+
+
+def _temperature(rng, area_offset: float, when: datetime) -> int:
+    """季節変化 + 地域差 + ばらつきのある気温"""
+    season = -cos(2 * pi * (when.timetuple().tm_yday - 20) / 365)
+    return round(12 + 12 * season + area_offset + rng.gauss(0, 2))
+
+
+def synthetic_snapshots(rows: int, seed: int = 0):
+    """(forecast行, weekly行, forecast_reports行) をスナップショットごとに返すジェネレーター"""
+    rng = random.Random(seed)
+    area_codes = sorted(load_fixture('area.json')['offices'])
+    # 北の地域ほど寒くする（地域コード順はおおむね北から南）
+    offsets = {code: -8 + 14 * i / len(area_codes) for i, code in enumerate(area_codes)}
+    snapshots = ceil(rows / ROWS_PER_SNAPSHOT)
+
+    for published in publications(ceil(snapshots / len(area_codes))):
+        report_datetime = published.strftime('%Y-%m-%dT%H:%M:%S+09:00')
+        fetched_at = (published + timedelta(minutes=10)).strftime('%Y-%m-%d %H:%M:%S')
+        for area_code in area_codes:
+            if snapshots == 0:
+                return
+            snapshots -= 1
+
+            forecast_rows = []
+            for day in (0, 1):
+                date = published + timedelta(days=day)
+                weather_code, weather_text = rng.choice(WEATHERS)
+                temp = _temperature(rng, offsets[area_code], date)
+                forecast_rows.append((
+                    area_code, date.strftime('%Y-%m-%d'), weather_code, weather_text,
+                    temp - 8 if day == 0 else None, temp if day == 0 else None,
+                    rng.randrange(0, 101, 10), rng.choice(WINDS), report_datetime, fetched_at
+                ))
+
+            weekly_rows = []
+            for day in range(1, 8):
+                date = published + timedelta(days=day)
+                temp = _temperature(rng, offsets[area_code], date)
+                weekly_rows.append((
+                    area_code, date.strftime('%Y-%m-%d'), rng.choice(WEATHERS)[0],
+                    rng.randrange(0, 101, 10) if day < 7 else None, temp - 8, temp,
+                    rng.choice(RELIABILITIES) if day > 2 else '', fetched_at
+                ))
+
+            fingerprint = '%032x' % rng.getrandbits(128)
+            report = (area_code, report_datetime, fingerprint, fetched_at, fetched_at, 1)
+            yield forecast_rows, weekly_rows, report
+
+
+def _drop_indexes(conn) -> list:
+    """投入中はインデックスを外し、最後に作り直す（行ごとに更新するより速い）。外したインデックスのSQLを返す"""
+    indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX {name}')
+    return [sql for _, sql in indexes]
+
+
+def _open_partition(conn, month: str):
+    """月のパーティションを作成し、インデックスを外した書き込み用の接続を返す"""
+    conn.commit()
+    partition = db._create_partition(conn, month)
+    history = sqlite3.connect(db._partition_file(partition['path']))
+    history.execute('PRAGMA synchronous = OFF')
+    return history, _drop_indexes(history)
+
+
+def _close_partition(conn, history, month: str, indexes: list):
+    """パーティションのインデックスを作り直して閉じ、カタログの予報日の範囲を記録する"""
+    for sql in indexes:
+        history.execute(sql)
+    history.commit()
+    dates = history.execute('''
+        SELECT MIN(forecast_date), MAX(forecast_date) FROM (
+            SELECT forecast_date FROM forecasts UNION ALL SELECT forecast_date FROM weekly_forecasts
+        )
+    ''').fetchone()
+    history.execute('ANALYZE')
+    history.close()
+    conn.commit()
+    with db._immediate(conn):
+        db._update_partition_dates(conn, month, *dates)
+
+
+def generate(path: Path, rows: int, seed: int = 0, partitioned: bool = False) -> int:
+    """path のDBを最新スキーマで作り直し、約 rows 行の履歴を入れる。入れた行数を返す"""
+    if Path(path).resolve() == PRODUCTION_DB:
+        raise ValueError(f'{path} is the production database ({PRODUCTION_DB}); use another --db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(f'{path}{suffix}'):
+            os.remove(f'{path}{suffix}')
+    db.DB_PATH = Path(path)
+    shutil.rmtree(db._partition_file(db.PARTITIONS_DIR), ignore_errors=True)
+    db.close_pool()
+    db.init_database()
+    db.close_pool()
+
+    area = load_fixture('area.json')
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executemany('INSERT INTO areas (area_code, area_name) VALUES (?, ?)',
+                     [(code, info['name']) for code, info in area['offices'].items()])
+    indexes = _drop_indexes(conn)
+
+    history, month, history_indexes = conn, None, []
+    inserted = 0
+    pending = 0
+    for forecast_rows, weekly_rows, report in synthetic_snapshots(rows, seed):
+        fetched_month = report[3][:7]
+        if partitioned and fetched_month != month:
+            if month is not None:
+                _close_partition(conn, history, month, history_indexes)
+            month = fetched_month
+            history, history_indexes = _open_partition(conn, month)
+        history.executemany('''
+            INSERT INTO forecasts
+            (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', forecast_rows)
+        history.executemany('''
+            INSERT INTO weekly_forecasts
+            (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', weekly_rows)
+        conn.execute('''
+            INSERT INTO forecast_reports
+            (area_code, report_datetime, fingerprint, fetched_at, last_seen_at, seen_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', report)
+        inserted += len(forecast_rows) + len(weekly_rows)
+        pending += len(forecast_rows) + len(weekly_rows)
+        if pending >= COMMIT_EVERY:
+            history.commit()
+            conn.commit()
+            pending = 0
+
+    for sql in indexes:
+        conn.execute(sql)
+    # 最新スナップショットはマイグレーションと同じ方法で履歴（パーティションなら最後の月）から埋める
+    if partitioned and month is not None:
+        _close_partition(conn, history, month, history_indexes)
+        partition = conn.execute('SELECT * FROM forecast_partitions WHERE month = ?', (month,)).fetchone()
+        db._fill_latest_tables(conn, db._attach(conn, partition))
+    else:
+        db._fill_latest_tables(conn)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='forecasts と weekly_forecasts の合計行数')
+    parser.add_argument('--db', type=Path, default=Path('bench_weather.db'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--partitioned', action='store_true', help='予報履歴を月別パーティションに書き込む')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        inserted = generate(args.db, args.rows, args.seed, args.partitioned)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f'generated {inserted:,} rows into {args.db} in {time.perf_counter() - start:.1f}s '
+          f'({args.db.stat().st_size / 1e6:.1f} MB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+気象庁APIのスタブHTTPサーバー（オフラインでのベンチマーク・動作確認用）
+
+bench/fixtures の記録済みレスポンスを返す。ETag / Last-Modified に対応し、
+条件付きGETには304を返す。地域コードごとのレスポンスがなければ東京のレスポンスを流用し、
+area.json にない地域コードは404にする（any_area=True なら任意の地域コードに東京のレスポンスを返す）。
+
+単体で起動する場合:
+    python -m bench.stub_jma --port 8765 --latency 0.1
+    JMA_BASE_URL=http://127.0.0.1:8765 python server.py
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+AREA_PATH = '/common/const/area.json'
+FORECAST_PREFIX = '/forecast/data/forecast/'
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 同時接続が多いベンチマークで接続が落ちないように
+
+
+def load_fixture(name: str):
+    with open(FIXTURES_DIR / name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StubJMA:
+    """スレッドで動くスタブサーバー（with文で起動・停止）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, any_area: bool = False):
+        self.latency = latency
+        self.any_area = any_area
+        self.requests = Counter()  # パスごとのリクエスト数
+        self.not_modified = 0      # 304を返した回数
+        self.area = load_fixture('area.json')
+        self.forecast_template = load_fixture('forecast_130000.json')
+        self.forecasts = {}        # 地域コードごとに差し替えたレスポンス
+        self.version = 0           # bump()で増やすと全レスポンスのETagが変わる
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def bump(self):
+        """気象庁の発表が更新された状態にする（ETagを変える）"""
+        with self._lock:
+            self.version += 1
+
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def payload(self, path: str):
+        """パスに対応するレスポンス本文（Pythonオブジェクト）。なければNone"""
+        if path == AREA_PATH:
+            return self.area
+        if path.startswith(FORECAST_PREFIX) and path.endswith('.json'):
+            area_code = path[len(FORECAST_PREFIX):-len('.json')]
+            if area_code not in self.area['offices'] and not self.any_area:
+                return None
+            return self.forecasts.get(area_code, self.forecast_template)
+        return None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests[self.path] += 1
+                    version = stub.version
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                payload = stub.payload(self.path)
+                if payload is None:
+                    self.send_error(404)
+                    return
+
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                etag = '"%s-%d"' % (hashlib.sha1(body).hexdigest()[:16], version)
+                last_modified = formatdate(1736496000 + version * 3600, usegmt=True)
+
+                if self.headers.get('If-None-Match') == etag:
+                    with stub._lock:
+                        stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # ベンチマーク中にログを出さない
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='気象庁APIのスタブサーバー')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='レスポンスごとの遅延（秒）')
+    parser.add_argument('--any-area', action='store_true', help='任意の地域コードに予報を返す')
+    args = parser.parse_args()
+
+    stub = StubJMA(args.host, args.port, args.latency, args.any_area)
+    print(f'Stub JMA API running at {stub.base_url}')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+ベンチマーク一式（オフラインで実行可能）
+
+規模（--rows）ごとに bench.generate で履歴を作り、スタブの気象庁APIに向けたFlaskサーバーを
+スレッドで起動して次を計測する。結果はJSONで出力し、--compare で過去の結果と比べられる。
+
+- http: 各APIルートを同時クライアント数（--concurrency）ごとに叩いた p50/p99 レイテンシとスループット
+- db:   database.py の読み込み・書き込み関数を直接呼んだときの p50/p99 と1秒あたりの回数
+
+    python -m bench.suite --rows 1000,100000,1000000 --concurrency 1,8,32 -o results.json
+    python -m bench.suite --rows 100000 --compare results.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import requests
+
+from bench.generate import generate
+from bench.stub_jma import StubJMA
+
+# (名前, パス)。{area} は地域コードを順番に、{fetched_at} は最新の取得日時を入れる
+ROUTES = (
+    ('areas', '/api/areas'),
+    ('forecast', '/api/forecast/{area}'),
+    ('latest', '/api/forecast/{area}/latest'),
+    ('latest_batch', '/api/forecasts/latest?areas=all'),
+    ('history', '/api/forecast/{area}/history?limit=10'),
+    ('snapshot', '/api/forecast/{area}/history/{fetched_at}'),
+    ('export', '/api/export?table=weekly_forecasts&area={area}&fetched_from={fetched_from}'),
+)
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """レイテンシ（秒）のリストを集計（ミリ秒）"""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'p50_ms': round(percentile(0.50), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'throughput': round(len(ordered) / elapsed, 1),
+    }
+
+
+def timed(fn, repeat: int) -> dict:
+    """fn(i) を repeat 回呼んで集計"""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+class ServerThread:
+    """Flaskアプリを別スレッドのWSGIサーバーで動かす（with文で起動・停止）"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f'http://127.0.0.1:{self._server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_http(base_url: str, path: str, area_codes: list, concurrency: int, requests_per_client: int, **values) -> dict:
+    """concurrency 個のクライアントがそれぞれ requests_per_client 回リクエストする"""
+    def client(worker):
+        latencies, errors = [], 0
+        with requests.Session() as session:
+            for i in range(requests_per_client):
+                area = area_codes[(worker * requests_per_client + i) % len(area_codes)]
+                url = base_url + path.format(area=area, **values)
+                t = time.perf_counter()
+                response = session.get(url, headers={'Accept-Encoding': 'gzip'})
+                response.content  # ストリーミング応答も最後まで読む
+                latencies.append(time.perf_counter() - t)
+                errors += response.status_code >= 400
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return summarize([t for latencies, _ in results for t in latencies], elapsed, sum(e for _, e in results))
+
+
+def run_db(db, area_codes: list, fetched_at: str, repeat: int) -> dict:
+    """database.py の関数を直接呼ぶ"""
+    def area(i):
+        return area_codes[i % len(area_codes)]
+
+    def write(i):
+        # 同じ秒に同じ地域へ書いても一意制約に当たらないよう、予報日を呼び出しごとにずらす
+        dates = [(date(2030, 1, 1) + timedelta(days=i * 9 + d)).isoformat() for d in range(9)]
+        rows = [{'forecast_date': dates[d], 'weather_code': '100', 'weather_text': '晴れ',
+                 'temp_min': 1, 'temp_max': 10, 'pop': 20, 'wind': '北の風'} for d in (0, 1)]
+        weekly = [{'forecast_date': dates[d], 'weather_code': '101', 'pop': 30,
+                   'temp_min': 2, 'temp_max': 11, 'reliability': 'A'} for d in range(2, 9)]
+        db.save_forecast_snapshot(area(i), rows, weekly, f'bench-{i}')
+
+    return {
+        'get_latest_forecast': timed(lambda i: db.get_latest_forecast(area(i)), repeat),
+        'get_latest_weekly_forecast': timed(lambda i: db.get_latest_weekly_forecast(area(i)), repeat),
+        'iter_latest_forecasts_bulk': timed(lambda i: list(db.iter_latest_forecasts_bulk()), max(1, repeat // 10)),
+        'get_forecast_history': timed(lambda i: db.get_forecast_history(area(i), 10), repeat),
+        'get_forecast_by_fetched_at': timed(lambda i: db.get_forecast_by_fetched_at(area(i), fetched_at), repeat),
+        'save_forecast_snapshot': timed(write, repeat),
+    }
+
+
+def run_scale(rows: int, concurrency_levels: list, requests_per_client: int, db_repeat: int, seed: int) -> dict:
+    import database as db
+    import server
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench.db'
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):  # 標準出力はJSON専用にする
+            inserted = generate(path, rows, seed)
+        result = {
+            'rows': inserted,
+            'generate_s': round(time.perf_counter() - start, 2),
+            'db_mb': round(path.stat().st_size / 1e6, 1),
+            'http': {},
+        }
+        print(f'[{inserted:,} rows] generated in {result["generate_s"]}s ({result["db_mb"]} MB)', file=sys.stderr)
+
+        # 小さい規模では全地域に履歴があるとは限らないので、最新スナップショットのある地域だけを使う
+        area_codes = [area_code for area_code, _, _ in db.iter_latest_forecasts_bulk()]
+        fetched_at = db.get_forecast_history(area_codes[0], 1)[0]
+        fetched_from = (datetime.fromisoformat(fetched_at) - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+
+        with ServerThread(server.app) as http:
+            for name, path_template in ROUTES:
+                result['http'][name] = {}
+                for concurrency in concurrency_levels:
+                    stats = run_http(http.base_url, path_template, area_codes, concurrency, requests_per_client,
+                                     fetched_at=fetched_at, fetched_from=fetched_from)
+                    result['http'][name][str(concurrency)] = stats
+                    print(f'  {name:14s} c={concurrency:<3d} p50 {stats["p50_ms"]:8.2f} ms  '
+                          f'p99 {stats["p99_ms"]:8.2f} ms  {stats["throughput"]:8.1f} req/s'
+                          + (f'  errors {stats["errors"]}' if stats['errors'] else ''), file=sys.stderr)
+
+        result['db'] = run_db(db, area_codes, fetched_at, db_repeat)
+        for name, stats in result['db'].items():
+            print(f'  {name:28s} p50 {stats["p50_ms"]:8.3f} ms  p99 {stats["p99_ms"]:8.3f} ms  '
+                  f'{stats["throughput"]:10.1f} ops/s', file=sys.stderr)
+        db.close_pool()
+    return result
+
+
+def environment() -> dict:
+    """結果を比べるときに必要な実行環境の情報"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline: dict, current: dict):
+    """同じ規模・ルート・同時数の p50/p99 を基準の結果と比べて表示"""
+    base_scales = {scale['rows']: scale for scale in baseline['scales']}
+    for scale in current['scales']:
+        base = base_scales.get(scale['rows'])
+        if base is None:
+            continue
+        print(f'[{scale["rows"]:,} rows] vs {baseline["environment"].get("commit")}')
+        pairs = [(f'http {name} c={c}', stats, base['http'].get(name, {}).get(c))
+                 for name, levels in scale['http'].items() for c, stats in levels.items()]
+        pairs += [(f'db {name}', stats, base['db'].get(name)) for name, stats in scale['db'].items()]
+        for label, stats, before in pairs:
+            if before:
+                print(f'  {label:36s} p50 {before["p50_ms"]:8.2f} → {stats["p50_ms"]:8.2f} ms  '
+                      f'p99 {before["p99_ms"]:8.2f} → {stats["p99_ms"]:8.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,100000', help='履歴の行数（カンマ区切りで複数指定）')
+    parser.add_argument('--concurrency', default='1,8', help='同時クライアント数（カンマ区切り）')
+    parser.add_argument('--requests', type=int, default=50, help='クライアント1つあたりのリクエスト数')
+    parser.add_argument('--db-repeat', type=int, default=1000, help='DB関数ごとの呼び出し回数')
+    parser.add_argument('--latency', type=float, default=0.02, help='スタブの応答遅延（秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', type=Path, help='結果のJSONの保存先（省略時は標準出力）')
+    parser.add_argument('--compare', type=Path, help='比較する過去の結果（JSON）')
+    args = parser.parse_args()
+
+    with StubJMA(latency=args.latency) as stub:
+        # jma は読み込み時にURLを決めるので、server より先に環境変数を設定する
+        os.environ['JMA_BASE_URL'] = stub.base_url
+        concurrency_levels = [int(c) for c in args.concurrency.split(',')]
+        scales = [run_scale(int(rows), concurrency_levels, args.requests, args.db_repeat, args.seed)
+                  for rows in args.rows.split(',')]
+        upstream_requests = stub.total_requests()
+
+    results = {
+        'environment': environment(),
+        'settings': {
+            'concurrency': concurrency_levels,
+            'requests_per_client': args.requests,
+            'db_repeat': args.db_repeat,
+            'stub_latency_s': args.latency,
+            'seed': args.seed,
+        },
+        'upstream_requests': upstream_requests,
+        'scales': scales,
+    }
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding='utf-8')), results)
+
+
+if __name__ == '__main__':
+    main()
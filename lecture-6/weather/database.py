@@ -3,33 +3,228 @@
 SQLiteを使用して天気情報を永続化
 
 DB設計:
-- areas: エリア情報テーブル（地域コード、地域名）
+- areas: エリア情報テーブル（地域コード、地域名、階層（center / office / class10）と親の地域コード）
 - forecasts: 天気予報テーブル（今日・明日の予報）
 - weekly_forecasts: 週間予報テーブル
+  （予報テーブルの area_code には官署コード 130000 と細分区域コード 130010 などの両方が入る）
+- forecast_reports: 発表ごとの内容の指紋（内容が変わらない再取得では予報を保存しない）
+- latest_forecasts / latest_weekly_forecasts: 地域ごとの最新スナップショット（保存時に入れ替え）
+- schema_version: 適用済みのスキーマバージョン（init_database() が順にマイグレーションする）
+- forecast_partitions: 予報履歴の月別パーティションのカタログ（下記）
 
 正規化:
 - 第1正規形: 各カラムは原子値
 - 第2正規形: 部分関数従属性を排除
 - 第3正規形: 推移的関数従属性を排除（エリア情報を別テーブルに分離）
+
+接続管理:
+- 接続はプール（最大POOL_SIZE本）で使い回し、WALモードで読み書きを並行させる
+- 各関数は connection() で接続を借り、withブロックを抜けると返却する
+
+予報履歴の月別パーティション（WEATHER_PARTITIONED=1 で有効）:
+- 予報履歴（forecasts / weekly_forecasts）を取得月ごとのDBファイル partitions/forecasts_YYYY-MM.db に書き込む。
+  履歴が何年分になっても、書き込み先のテーブルとインデックスは1か月分の大きさで済む
+- 読み込み関数は forecast_partitions で取得月・予報日の範囲が条件に合うものだけを接続に ATTACH して読む。
+  main の forecasts / weekly_forecasts（パーティション化前の履歴）も常に合わせて読むので、
+  関数のシグネチャと結果は単一テーブルのときと変わらない
+- 古い月は freeze_partitions() で読み込み専用にし（以降は mode=ro で ATTACH する）、
+  archive_partition() で archive/ に移すと読み込みの対象から外れる
+- 既存の履歴は partition_history() でパーティションに移す（maintenance.py --partition-history）
+- main と パーティションにまたがる書き込みは、WALモードではファイルごとにアトミック（全体ではない）
 """
 
+import hashlib
+import json
+import os
+import queue
+import shutil
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import groupby
 from pathlib import Path
+from urllib.parse import quote
 
 DB_PATH = Path(__file__).parent / "weather.db"
 
+# コネクションプール設定
+POOL_SIZE = int(os.environ.get('WEATHER_DB_POOL_SIZE', 8))  # 0なら毎回接続する従来の動作
+POOL_TIMEOUT = 10.0  # 空き接続を待つ最大秒数
+
+# 接続ごとに設定するPRAGMA
+# WAL: 読み込みが書き込みをブロックしない / synchronous=NORMAL: WALならコミット毎のfsyncを省略できる
+PRAGMAS = (
+    # 新規DBでのみ有効（WAL切り替え・テーブル作成より前に設定する必要がある）
+    # 既存DBは maintenance.py --enable-auto-vacuum で切り替える
+    ('auto_vacuum', 'INCREMENTAL'),
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),        # 負の値はKiB単位（約16MB）
+    ('mmap_size', 268435456),      # 256MB
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),
+)
+
+# 予報履歴の月別パーティション
+PARTITIONED = os.environ.get('WEATHER_PARTITIONED') == '1'  # 新しい履歴をパーティションに書き込む
+PARTITIONS_DIR = 'partitions'  # DBファイルのディレクトリからの相対パス
+ARCHIVE_DIR = 'archive'
+MAX_ATTACHED_PARTITIONS = 8    # 1接続に ATTACH しておく最大数（SQLiteの上限は既定で10）
+
 
 def get_connection():
-    """データベース接続を取得"""
+    """データベース接続を取得（プールを使わない単発の接続）"""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _open_pooled_connection(db_path):
+    """プール用の接続を作成してPRAGMAを設定"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """スレッド間で共有する長寿命の接続プール（最大size本）"""
+
+    def __init__(self, db_path, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        """空き接続を取得（なければ上限まで新規作成、上限なら待機）"""
+        if self._closed:
+            raise sqlite3.ProgrammingError('Connection pool is closed')
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _open_pooled_connection(self.db_path)
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f'No database connection available within {self.timeout}s'
+            )
+
+    def release(self, conn):
+        """接続をプールに返却（未完了のトランザクションはロールバック）"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    def close(self):
+        """プール内の接続をすべて閉じる"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """プロセス共通のコネクションプールを取得（初回呼び出し時に作成）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, POOL_SIZE)
+    return _pool
+
+
+def close_pool():
+    """コネクションプールを閉じる（サーバー終了時に呼び出す）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """プールから接続を借りる（withブロックを抜けると返却）"""
+    if POOL_SIZE <= 0:
+        conn = get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+    
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    """プールから接続を借りて書き込みトランザクションを開始（例外時はロールバック）
+
+    BEGIN IMMEDIATE で最初に書き込みロックを取るので、
+    ブロック内の「読んで判断して書く」処理が他の書き込みと混ざらない。
+    """
+    with connection() as conn, _immediate(conn):
+        yield conn
+
+
+@contextmanager
+def _immediate(conn):
+    """借りている接続で書き込みトランザクションを開始（パーティションを ATTACH してから始めるとき用）"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
 def init_database():
-    """データベースを初期化（テーブル作成）"""
-    conn = get_connection()
+    """データベースを初期化（テーブル作成・スキーマのマイグレーション）"""
+    # 複数プロセスが同時に起動してもマイグレーションが二重に走らないよう書き込みロックを取る
+    with transaction() as conn:
+        version = get_schema_version(conn)
+        if version == 0:
+            _create_tables(conn)
+            _set_schema_version(conn, SCHEMA_VERSION)
+        else:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                MIGRATIONS[target](conn)
+                _set_schema_version(conn, target)
+    print(f"Database initialized at {DB_PATH} (schema version {SCHEMA_VERSION})")
+
+
+def _create_tables(conn):
+    """テーブルとインデックスを作成（最新のスキーマ）"""
     cursor = conn.cursor()
     
     # エリア情報テーブル
@@ -38,11 +233,23 @@ def init_database():
         CREATE TABLE IF NOT EXISTS areas (
             area_code TEXT PRIMARY KEY,
             area_name TEXT NOT NULL,
+            level TEXT NOT NULL DEFAULT 'office',
+            parent_code TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
     
+    _create_forecast_tables_v2(conn)
+    _create_forecast_reports_v3(conn)
+    _create_latest_tables_v4(conn)
+    _create_partition_catalog_v6(conn)
+
+
+def _create_forecast_tables_v2(conn):
+    """予報テーブル（スキーマバージョン2: 気温・降水確率は数値、値がなければNULL）"""
+    cursor = conn.cursor()
+    
     # 天気予報テーブル（今日・明日の詳細予報）
     # プライマリーキー: id（自動採番）
     # 複合ユニーク制約: area_code + forecast_date + fetched_at（同じ予報を重複登録しない）
@@ -53,9 +260,9 @@ def init_database():
             forecast_date DATE NOT NULL,
             weather_code TEXT,
             weather_text TEXT,
-            temp_min TEXT,
-            temp_max TEXT,
-            pop TEXT,
+            temp_min INTEGER,
+            temp_max INTEGER,
+            pop INTEGER,
             wind TEXT,
             report_datetime TIMESTAMP,
             fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -72,9 +279,9 @@ def init_database():
             area_code TEXT NOT NULL,
             forecast_date DATE NOT NULL,
             weather_code TEXT,
-            pop TEXT,
-            temp_min TEXT,
-            temp_max TEXT,
+            pop INTEGER,
+            temp_min INTEGER,
+            temp_max INTEGER,
             reliability TEXT,
             fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (area_code) REFERENCES areas(area_code),
@@ -86,165 +293,867 @@ def init_database():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_forecasts_area_date ON forecasts(area_code, forecast_date)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_weekly_area_date ON weekly_forecasts(area_code, forecast_date)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_forecasts_fetched ON forecasts(fetched_at)')
+    # 日付ごとの最高・最低気温の集計や範囲検索用
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forecasts_date_temp ON forecasts(forecast_date, temp_max)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_weekly_date_temp ON weekly_forecasts(forecast_date, temp_max)')
+
+
+# ===== スキーマのバージョン管理 =====
+# バージョン1: 初期スキーマ（気温・降水確率をTEXTで保存）
+# バージョン2: 気温・降水確率をINTEGER（値がなければNULL）に変更
+# バージョン3: 発表ごとの内容の指紋を記録する forecast_reports を追加
+# バージョン4: 地域ごとの最新スナップショットを保持する latest_* テーブルと履歴用インデックスを追加
+# バージョン5: areas に階層（level）と親の地域コード（parent_code）を追加
+# バージョン6: 予報履歴の月別パーティションのカタログ forecast_partitions を追加
+
+SCHEMA_VERSION = 6
+
+
+def get_schema_version(conn) -> int:
+    """現在のスキーマバージョン（0: 空のDB、1: schema_version導入前のDB）"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'schema_version' in tables:
+        return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    return 1 if 'forecasts' in tables else 0
+
+
+def _set_schema_version(conn, version: int):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('INSERT OR REPLACE INTO schema_version (version) VALUES (?)', (version,))
+
+
+def _migrate_v2(conn):
+    """TEXTの気温・降水確率を数値に変換（空文字はNULL）
+
+    INTEGER型のカラムへ文字列を入れるとSQLiteが数値に変換して保存する
+    （'12' → 12、'1.5' → 1.5）ので、空白を除いて空文字をNULLにするだけでよい。
+    """
+    for table in ('forecasts', 'weekly_forecasts'):
+        conn.execute(f'ALTER TABLE {table} RENAME TO {table}_v1')
+    for index in ('idx_forecasts_area_date', 'idx_weekly_area_date', 'idx_forecasts_fetched'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    
+    _create_forecast_tables_v2(conn)
     
-    conn.commit()
-    conn.close()
-    print(f"Database initialized at {DB_PATH}")
+    conn.execute('''
+        INSERT INTO forecasts
+        (id, area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
+        SELECT id, area_code, forecast_date, weather_code, weather_text,
+               NULLIF(TRIM(temp_min), ''), NULLIF(TRIM(temp_max), ''), NULLIF(TRIM(pop), ''),
+               wind, report_datetime, fetched_at
+        FROM forecasts_v1
+    ''')
+    conn.execute('''
+        INSERT INTO weekly_forecasts
+        (id, area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+        SELECT id, area_code, forecast_date, weather_code,
+               NULLIF(TRIM(pop), ''), NULLIF(TRIM(temp_min), ''), NULLIF(TRIM(temp_max), ''),
+               reliability, fetched_at
+        FROM weekly_forecasts_v1
+    ''')
+    conn.execute('DROP TABLE forecasts_v1')
+    conn.execute('DROP TABLE weekly_forecasts_v1')
+
+
+def _create_forecast_reports_v3(conn):
+    """発表（area_code + report_datetime）ごとの内容の指紋
+
+    同じ発表を何度取得しても、内容が変わらなければ予報テーブルには書き込まず
+    last_seen_at と seen_count の更新だけで済ませる。
+    fetched_at はその内容を保存したスナップショットの取得日時。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_reports (
+            area_code TEXT NOT NULL,
+            report_datetime TIMESTAMP NOT NULL,
+            fingerprint TEXT NOT NULL,
+            fetched_at TIMESTAMP NOT NULL,
+            last_seen_at TIMESTAMP NOT NULL,
+            seen_count INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (area_code, report_datetime)
+        )
+    ''')
+
+
+def _migrate_v3(conn):
+    """forecast_reports を追加（既存のスナップショットは指紋なしのまま残す）"""
+    _create_forecast_reports_v3(conn)
+
+
+def _create_latest_tables_v4(conn):
+    """地域ごとの最新スナップショット（書き込み時に入れ替える）と履歴検索用のインデックス
+
+    /api/forecast/<area_code>/latest は主キーの範囲検索1回で済む。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latest_forecasts (
+            area_code TEXT NOT NULL,
+            forecast_date DATE NOT NULL,
+            weather_code TEXT,
+            weather_text TEXT,
+            temp_min INTEGER,
+            temp_max INTEGER,
+            pop INTEGER,
+            wind TEXT,
+            report_datetime TIMESTAMP,
+            fetched_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (area_code, forecast_date)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latest_weekly_forecasts (
+            area_code TEXT NOT NULL,
+            forecast_date DATE NOT NULL,
+            weather_code TEXT,
+            pop INTEGER,
+            temp_min INTEGER,
+            temp_max INTEGER,
+            reliability TEXT,
+            fetched_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (area_code, forecast_date)
+        ) WITHOUT ROWID
+    ''')
+    _create_history_indexes_v4(conn)
+
+
+def _create_history_indexes_v4(conn):
+    """履歴一覧（DISTINCT fetched_at）と取得日時指定の読み込みをインデックスだけで処理する"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_forecasts_area_fetched ON forecasts(area_code, fetched_at, forecast_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_weekly_area_fetched ON weekly_forecasts(area_code, fetched_at, forecast_date)')
+
+
+def _migrate_v4(conn):
+    """latest_* テーブルを作成し、既存の履歴から地域ごとの最新スナップショットを埋める"""
+    _create_latest_tables_v4(conn)
+    _fill_latest_tables(conn)
+
+
+def _fill_latest_tables(conn, history: str = 'main'):
+    """履歴（history はスキーマ名。パーティションなら ATTACH 済みのもの）から地域ごとの最新スナップショットを埋める"""
+    conn.execute(f'''
+        INSERT INTO latest_forecasts
+        SELECT f.area_code, f.forecast_date, f.weather_code, f.weather_text, f.temp_min, f.temp_max,
+               f.pop, f.wind, f.report_datetime, f.fetched_at
+        FROM {history}.forecasts f
+        JOIN (SELECT area_code, MAX(fetched_at) AS fetched_at FROM {history}.forecasts GROUP BY area_code) latest
+          ON latest.area_code = f.area_code AND latest.fetched_at = f.fetched_at
+    ''')
+    conn.execute(f'''
+        INSERT INTO latest_weekly_forecasts
+        SELECT w.area_code, w.forecast_date, w.weather_code, w.pop, w.temp_min, w.temp_max,
+               w.reliability, w.fetched_at
+        FROM {history}.weekly_forecasts w
+        JOIN (SELECT area_code, MAX(fetched_at) AS fetched_at FROM {history}.weekly_forecasts GROUP BY area_code) latest
+          ON latest.area_code = w.area_code AND latest.fetched_at = w.fetched_at
+    ''')
+
+
+def _migrate_v5(conn):
+    """areas に階層と親の地域コードを追加（既存の行はすべて官署）"""
+    conn.execute("ALTER TABLE areas ADD COLUMN level TEXT NOT NULL DEFAULT 'office'")
+    conn.execute('ALTER TABLE areas ADD COLUMN parent_code TEXT')
+
+
+def _create_partition_catalog_v6(conn):
+    """予報履歴の月別パーティションのカタログ
+
+    month は取得日時（fetched_at）の年月 'YYYY-MM'、path はDBファイルのディレクトリからの相対パス。
+    state は active（書き込み可）/ readonly（読み込み専用）/ archived（archive/ に移動済み、読まない）。
+    min/max_forecast_date は含まれる予報日の範囲（予報日で絞り込む読み込みで使わないパーティションを飛ばす）。
+    version は間引き・読み込み専用化・アーカイブのたびに増やす（履歴のETag用）。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_partitions (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'active',
+            min_forecast_date DATE,
+            max_forecast_date DATE,
+            version INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migrate_v6(conn):
+    """forecast_partitions を追加（既存の履歴は main に残す。移すときは partition_history()）"""
+    _create_partition_catalog_v6(conn)
+
+
+# マイグレーション先のバージョン → 処理
+MIGRATIONS = {
+    2: _migrate_v2,
+    3: _migrate_v3,
+    4: _migrate_v4,
+    5: _migrate_v5,
+    6: _migrate_v6,
+}
+
+
+# ===== 予報履歴の月別パーティション =====
+
+def _partition_schema(month: str) -> str:
+    """パーティションを ATTACH するときのスキーマ名（'2025-01' → p_202501）"""
+    return 'p_' + month.replace('-', '')
+
+
+def _schema_month(schema: str) -> str:
+    """スキーマ名からパーティションの月（p_202501 → '2025-01'）"""
+    return f'{schema[2:6]}-{schema[6:]}'
+
+
+def _partition_file(path: str) -> Path:
+    """カタログの相対パスからファイルのパス"""
+    return Path(DB_PATH).parent / path
+
+
+def _next_month(month: str) -> str:
+    year, mon = map(int, month.split('-'))
+    return f'{year + mon // 12:04d}-{mon % 12 + 1:02d}'
+
+
+def _attached(conn) -> dict:
+    """ATTACH 済みのスキーマ名 → ファイルのパス"""
+    return {row['name']: row['file'] for row in conn.execute('PRAGMA database_list')}
+
+
+def _attach(conn, partition) -> str:
+    """パーティションを接続に ATTACH してスキーマ名を返す（トランザクションの外で呼ぶ）
+
+    プールの接続は ATTACH したまま使い回し、MAX_ATTACHED_PARTITIONS を超えるときは古い月から外す。
+    読み込み専用のパーティションは mode=ro で開く。
+    """
+    schema = _partition_schema(partition['month'])
+    attached = _attached(conn)
+    if schema in attached:
+        return schema
+    partitions = sorted(name for name in attached if name.startswith('p_'))
+    for name in partitions[:max(0, len(partitions) - MAX_ATTACHED_PARTITIONS + 1)]:
+        conn.execute(f'DETACH DATABASE {name}')
+    uri = 'file:' + quote(str(_partition_file(partition['path']).resolve()))
+    if partition['state'] == 'readonly':
+        uri += '?mode=ro'
+    conn.execute(f'ATTACH DATABASE ? AS {schema}', (uri,))
+    for name in ('synchronous', 'cache_size'):
+        conn.execute(f'PRAGMA {schema}.{name} = {dict(PRAGMAS)[name]}')
+    return schema
+
+
+def _detach(conn, month: str):
+    schema = _partition_schema(month)
+    if schema in _attached(conn):
+        conn.execute(f'DETACH DATABASE {schema}')
+
+
+def _partitions(conn, fetched_from: str = None, fetched_to: str = None,
+                date_from: str = None, date_to: str = None, writable: bool = False,
+                newest_first: bool = False, after: str = None, limit: int = -1) -> list:
+    """条件に合う行を含みうるパーティション（月の順。アーカイブ済みは含めない）
+
+    after を指定すると、その月より後（newest_first なら前）の月から limit 件を返す。
+    """
+    conditions, params = ["state = 'active'" if writable else "state != 'archived'"], []
+    for condition, value in (
+        ('month >= ?', fetched_from and fetched_from[:7]),
+        ('month <= ?', fetched_to and fetched_to[:7]),
+        ('(max_forecast_date IS NULL OR max_forecast_date >= ?)', date_from),
+        ('(min_forecast_date IS NULL OR min_forecast_date <= ?)', date_to),
+        ('month < ?' if newest_first else 'month > ?', after),
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return [dict(row) for row in conn.execute(f'''
+        SELECT month, path, state FROM forecast_partitions WHERE {" AND ".join(conditions)}
+        ORDER BY month {"DESC" if newest_first else ""} LIMIT ?
+    ''', (*params, limit))]
+
+
+def _history_sources(conn, newest_first: bool = False, **filters):
+    """予報履歴を読むスキーマ名を main → パーティション（月の順）で返すジェネレーター
+
+    パーティションは順番が来たときに ATTACH する（途中で古いものを外すことがあるので、
+    次のスキーマ名を受け取る前に前のスキーマのカーソルを読み終えておく）。
+    カタログは MAX_ATTACHED_PARTITIONS 件ずつ読むので、途中で読むのをやめればそれより先は読まない。
+    filters は _partitions() の絞り込み条件。
+    """
+    yield 'main'
+    after = None
+    while True:
+        partitions = _partitions(conn, newest_first=newest_first, after=after,
+                                 limit=MAX_ATTACHED_PARTITIONS, **filters)
+        for partition in partitions:
+            yield _attach(conn, partition)
+        if len(partitions) < MAX_ATTACHED_PARTITIONS:
+            return
+        after = partitions[-1]['month']
+
+
+def _create_partition(conn, month: str) -> dict:
+    """月のパーティションのファイルを作成してカタログに登録（登録済みならそのまま返す）
+
+    id は main と既存のパーティションの続きから採番する（保存順に並べるエクスポートのため）。
+    """
+    row = conn.execute('SELECT * FROM forecast_partitions WHERE month = ?', (month,)).fetchone()
+    if row is not None:
+        return dict(row)
+    
+    path = f'{PARTITIONS_DIR}/forecasts_{month}.db'
+    sequences = {row['name']: row['seq'] for row in conn.execute('SELECT name, seq FROM main.sqlite_sequence')}
+    newest = conn.execute("SELECT * FROM forecast_partitions WHERE state != 'archived' ORDER BY month DESC LIMIT 1").fetchone()
+    if newest is not None:
+        schema = _attach(conn, newest)
+        for row in conn.execute(f'SELECT name, seq FROM {schema}.sqlite_sequence').fetchall():
+            sequences[row['name']] = max(sequences.get(row['name'], 0), row['seq'])
+    
+    file = _partition_file(path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    partition_conn = _open_pooled_connection(file)
+    try:
+        with _immediate(partition_conn):
+            _create_forecast_tables_v2(partition_conn)
+            _create_history_indexes_v4(partition_conn)
+            partition_conn.executemany('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+            ''', [(table, sequences.get(table, 0), table) for table in EXPORT_TABLES])
+    finally:
+        partition_conn.close()
+    
+    with _immediate(conn):
+        conn.execute('INSERT OR IGNORE INTO forecast_partitions (month, path) VALUES (?, ?)', (month, path))
+    return dict(conn.execute('SELECT * FROM forecast_partitions WHERE month = ?', (month,)).fetchone())
+
+
+def _update_partition_dates(conn, month: str, min_date: str, max_date: str):
+    """カタログの予報日の範囲を広げる（書き込みと同じトランザクションで呼ぶ）"""
+    conn.execute('''
+        UPDATE forecast_partitions SET
+            min_forecast_date = MIN(COALESCE(min_forecast_date, :min_date), :min_date),
+            max_forecast_date = MAX(COALESCE(max_forecast_date, :max_date), :max_date)
+        WHERE month = :month
+    ''', {'month': month, 'min_date': min_date, 'max_date': max_date})
+
+
+def list_partitions() -> list:
+    """パーティションのカタログ（月の古い順）"""
+    with connection() as conn:
+        rows = conn.execute('SELECT * FROM forecast_partitions ORDER BY month').fetchall()
+    return [dict(row) for row in rows]
+
+
+def partition_history() -> dict:
+    """main の予報履歴を取得月ごとのパーティションに移し、{月: 移した行数} を返す
+
+    月ごとに1トランザクションで INSERT ... SELECT と DELETE を行う。
+    読み込み専用・アーカイブ済みの月の行は main に残す。
+    """
+    moved = {}
+    with connection() as conn:
+        # 週間予報には取得日時だけのインデックスがないので、移す間だけ作る
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_weekly_fetched ON weekly_forecasts(fetched_at)')
+        months = [row[0] for row in conn.execute('''
+            SELECT substr(fetched_at, 1, 7) FROM forecasts
+            UNION
+            SELECT substr(fetched_at, 1, 7) FROM weekly_forecasts
+            ORDER BY 1
+        ''').fetchall()]
+        for month in months:
+            partition = _create_partition(conn, month)
+            if partition['state'] != 'active':
+                continue
+            schema = _attach(conn, partition)
+            bounds = (month, _next_month(month))
+            with _immediate(conn):
+                count = 0
+                for table in EXPORT_TABLES:
+                    count += conn.execute(f'''
+                        INSERT INTO {schema}.{table}
+                        SELECT * FROM main.{table} WHERE fetched_at >= ? AND fetched_at < ?
+                    ''', bounds).rowcount
+                    conn.execute(f'DELETE FROM main.{table} WHERE fetched_at >= ? AND fetched_at < ?', bounds)
+                dates = conn.execute(f'''
+                    SELECT MIN(forecast_date), MAX(forecast_date) FROM (
+                        SELECT forecast_date FROM {schema}.forecasts
+                        UNION ALL
+                        SELECT forecast_date FROM {schema}.weekly_forecasts
+                    )
+                ''').fetchone()
+                if dates[0] is not None:
+                    _update_partition_dates(conn, month, dates[0], dates[1])
+            moved[month] = count
+        conn.execute('DROP INDEX IF EXISTS idx_weekly_fetched')
+    return moved
+
+
+def freeze_partitions(before_month: str) -> list:
+    """before_month より前の月の書き込み可能なパーティションを読み込み専用にし、その月のリストを返す
+
+    統計を更新しWALをファイルに反映してから、カタログの状態を readonly にする。
+    以降の読み込みは mode=ro で ATTACH し、保存・間引きの対象にしない。
+    """
+    with connection() as conn:
+        partitions = [dict(row) for row in conn.execute('''
+            SELECT * FROM forecast_partitions WHERE state = 'active' AND month < ? ORDER BY month
+        ''', (before_month,)).fetchall()]
+        months = [partition['month'] for partition in partitions]
+        for partition in partitions:
+            month = partition['month']
+            schema = _attach(conn, partition)
+            conn.execute(f'PRAGMA {schema}.optimize')
+            conn.execute(f'PRAGMA {schema}.wal_checkpoint(TRUNCATE)').fetchall()
+            _detach(conn, month)
+            with _immediate(conn):
+                conn.execute('''
+                    UPDATE forecast_partitions SET state = 'readonly', version = version + 1 WHERE month = ?
+                ''', (month,))
+    return months
+
+
+def archive_partition(month: str) -> Path:
+    """読み込み専用のパーティションを archive/ に移し、移動先のパスを返す
+
+    先にカタログを archived にするので、移動中のファイルを読み込みが ATTACH することはない。
+    """
+    with connection() as conn:
+        row = conn.execute('SELECT * FROM forecast_partitions WHERE month = ?', (month,)).fetchone()
+        if row is None:
+            raise ValueError(f'Unknown partition: {month}')
+        if row['state'] == 'active':
+            raise ValueError(f'Partition {month} is still writable (freeze it first)')
+        if row['state'] == 'archived':
+            return _partition_file(row['path'])
+        
+        path = f'{ARCHIVE_DIR}/{Path(row["path"]).name}'
+        _detach(conn, month)
+        with _immediate(conn):
+            conn.execute('''
+                UPDATE forecast_partitions SET state = 'archived', path = ?, version = version + 1 WHERE month = ?
+            ''', (path, month))
+    
+    source, target = _partition_file(row['path']), _partition_file(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ('', '-wal', '-shm'):
+        if Path(f'{source}{suffix}').exists():
+            shutil.move(f'{source}{suffix}', f'{target}{suffix}')
+    return target
 
 
 def save_area(area_code: str, area_name: str):
     """エリア情報を保存"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO areas (area_code, area_name, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-    ''', (area_code, area_name))
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO areas (area_code, area_name, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', (area_code, area_name))
+        conn.commit()
 
 
 def save_areas_batch(areas: list):
     """複数のエリア情報を一括保存"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany('''
-        INSERT OR REPLACE INTO areas (area_code, area_name, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-    ''', areas)
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO areas (area_code, area_name, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', areas)
+        conn.commit()
+
+
+def save_area_hierarchy(areas: list):
+    """地方・官署・細分区域のエリア情報を一括保存（areas は (area_code, area_name, level, parent_code) のリスト）"""
+    with connection() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO areas (area_code, area_name, level, parent_code, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', areas)
+        conn.commit()
 
 
 def get_all_areas():
-    """全エリア情報を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT area_code, area_name FROM areas ORDER BY area_code')
-    rows = cursor.fetchall()
-    conn.close()
+    """全エリア（官署）の情報を取得"""
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT area_code, area_name FROM areas WHERE level = 'office' ORDER BY area_code"
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_area_hierarchy():
+    """全階層のエリア情報を取得（area_index.py の索引の元データ）"""
+    with connection() as conn:
+        rows = conn.execute(
+            'SELECT area_code, area_name, level, parent_code FROM areas ORDER BY area_code'
+        ).fetchall()
     return [dict(row) for row in rows]
 
 
 def save_forecast(area_code: str, forecast_date: str, weather_code: str,
-                  weather_text: str, temp_min: str, temp_max: str,
-                  pop: str, wind: str, report_datetime: str):
-    """天気予報を保存"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 同じ日の古い予報を削除してから新しい予報を保存
-    fetched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    cursor.execute('''
-        INSERT INTO forecasts 
-        (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at))
-    
-    conn.commit()
-    conn.close()
+                  weather_text: str, temp_min: int, temp_max: int,
+                  pop: int, wind: str, report_datetime: str):
+    """天気予報を1日分保存（latest_forecasts も同じトランザクションで更新）"""
+    _save_row('forecasts', 'latest_forecasts', {
+        'area_code': area_code, 'forecast_date': forecast_date, 'weather_code': weather_code,
+        'weather_text': weather_text, 'temp_min': temp_min, 'temp_max': temp_max, 'pop': pop,
+        'wind': wind, 'report_datetime': report_datetime,
+        'fetched_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    })
 
 
 def save_weekly_forecast(area_code: str, forecast_date: str, weather_code: str,
-                         pop: str, temp_min: str, temp_max: str, reliability: str):
-    """週間予報を保存"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+                         pop: int, temp_min: int, temp_max: int, reliability: str):
+    """週間予報を1日分保存（latest_weekly_forecasts も同じトランザクションで更新）"""
+    _save_row('weekly_forecasts', 'latest_weekly_forecasts', {
+        'area_code': area_code, 'forecast_date': forecast_date, 'weather_code': weather_code,
+        'pop': pop, 'temp_min': temp_min, 'temp_max': temp_max, 'reliability': reliability,
+        'fetched_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+
+def _save_row(table: str, latest_table: str, row: dict):
+    """履歴に1行追加し、latest_* をその地域の最新の取得日時の行だけにする（_fill_latest_tables と同じ内容）
+
+    同じ取得日時（同じ秒）に続けて保存した日の行は latest_* にそろって残り、古い取得日時の行は消える。
+    """
+    columns = ', '.join(row)
+    values = ', '.join(f':{column}' for column in row)
+    updates = ', '.join(f'{column} = excluded.{column}' for column in row
+                        if column not in ('area_code', 'forecast_date'))
+    with connection() as conn:
+        history = _write_schema(conn, row['fetched_at'])
+        with _immediate(conn):
+            conn.execute(f'INSERT INTO {history}.{table} ({columns}) VALUES ({values})', row)
+            if history != 'main':
+                _update_partition_dates(conn, row['fetched_at'][:7], row['forecast_date'], row['forecast_date'])
+            conn.execute(f'DELETE FROM {latest_table} WHERE area_code = :area_code AND fetched_at < :fetched_at', row)
+            conn.execute(f'''
+                INSERT INTO {latest_table} ({columns}) SELECT {values}
+                WHERE NOT EXISTS (SELECT 1 FROM {latest_table} WHERE area_code = :area_code AND fetched_at > :fetched_at)
+                ON CONFLICT (area_code, forecast_date) DO UPDATE SET {updates}
+            ''', row)
+
+
+def save_forecast_snapshot(area_code: str, forecasts: list, weekly: list,
+                           report_datetime: str):
+    """1回の取得で得た予報（今日・明日 + 週間）を1トランザクションで一括保存
+
+    forecasts / weekly は各テーブルのカラム名をキーにした辞書のリスト。
+    すべて保存されるか、まったく保存されないかのどちらかになる。
+    同じ発表（report_datetime）で内容も前回と同じなら行は追加せず、
+    forecast_reports の最終確認日時だけを更新する。
+    新しく保存したときは latest_* テーブルの該当地域の行も入れ替える。
+    戻り値はこの内容を保持しているスナップショットの fetched_at。
+    """
+    return save_forecast_snapshots({area_code: (forecasts, weekly)}, report_datetime)[area_code]
+
+
+def _write_schema(conn, fetched_at: str) -> str:
+    """予報履歴の保存先のスキーマ名（PARTITIONED なら取得月のパーティション。書き込めない月なら main）"""
+    if not PARTITIONED:
+        return 'main'
+    partition = _create_partition(conn, fetched_at[:7])
+    return _attach(conn, partition) if partition['state'] == 'active' else 'main'
+
+
+def save_forecast_snapshots(snapshots: dict, report_datetime: str) -> dict:
+    """複数地域のスナップショットを1トランザクション・テーブルごとに1回の一括書き込みで保存
+
+    snapshots は {area_code: (forecasts, weekly)}（1回の取得に含まれる官署・細分区域すべて）。
+    地域ごとの重複判定・latest_* の入れ替えは save_forecast_snapshot と同じ。
+    戻り値は {area_code: その内容を保持しているスナップショットの fetched_at}。
+    """
+    if not snapshots:
+        return {}
     fetched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    fingerprints = {
+        area_code: snapshot_fingerprint(forecasts, weekly)
+        for area_code, (forecasts, weekly) in snapshots.items()
+    }
+    area_codes = list(snapshots)
+    placeholders = ','.join('?' * len(area_codes))
     
-    cursor.execute('''
-        INSERT INTO weekly_forecasts
-        (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at))
-    
-    conn.commit()
-    conn.close()
+    with connection() as conn:
+        history = _write_schema(conn, fetched_at)
+        with _immediate(conn):
+            reports = {
+                row['area_code']: row
+                for row in conn.execute(f'''
+                    SELECT area_code, fingerprint, fetched_at FROM forecast_reports
+                    WHERE report_datetime = ? AND area_code IN ({placeholders})
+                ''', (report_datetime, *area_codes))
+            }
+            
+            result = {}
+            unchanged = []
+            changed = []
+            for area_code in area_codes:
+                report = reports.get(area_code)
+                if report and report['fingerprint'] == fingerprints[area_code]:
+                    unchanged.append((fetched_at, area_code, report_datetime))
+                    result[area_code] = report['fetched_at']
+                else:
+                    changed.append(area_code)
+                    result[area_code] = fetched_at
+            
+            conn.executemany('''
+                UPDATE forecast_reports SET last_seen_at = ?, seen_count = seen_count + 1
+                WHERE area_code = ? AND report_datetime = ?
+            ''', unchanged)
+            if not changed:
+                return result
+            
+            forecast_rows = [
+                {**row, 'area_code': area_code, 'report_datetime': report_datetime, 'fetched_at': fetched_at}
+                for area_code in changed for row in snapshots[area_code][0]
+            ]
+            weekly_rows = [
+                {**row, 'area_code': area_code, 'fetched_at': fetched_at}
+                for area_code in changed for row in snapshots[area_code][1]
+            ]
+            
+            conn.executemany(f'''
+                INSERT INTO {history}.forecasts
+                (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
+                VALUES (:area_code, :forecast_date, :weather_code, :weather_text, :temp_min, :temp_max, :pop, :wind, :report_datetime, :fetched_at)
+            ''', forecast_rows)
+            conn.executemany(f'''
+                INSERT INTO {history}.weekly_forecasts
+                (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+                VALUES (:area_code, :forecast_date, :weather_code, :pop, :temp_min, :temp_max, :reliability, :fetched_at)
+            ''', weekly_rows)
+            if history != 'main':
+                dates = [row['forecast_date'] for row in forecast_rows + weekly_rows]
+                if dates:
+                    _update_partition_dates(conn, fetched_at[:7], min(dates), max(dates))
+            
+            # 最新スナップショットを入れ替え（行がない地域・テーブルは前回の内容を残す）
+            forecast_areas = [(area_code,) for area_code in changed if snapshots[area_code][0]]
+            weekly_areas = [(area_code,) for area_code in changed if snapshots[area_code][1]]
+            conn.executemany('DELETE FROM latest_forecasts WHERE area_code = ?', forecast_areas)
+            conn.executemany('''
+                INSERT INTO latest_forecasts
+                (area_code, forecast_date, weather_code, weather_text, temp_min, temp_max, pop, wind, report_datetime, fetched_at)
+                VALUES (:area_code, :forecast_date, :weather_code, :weather_text, :temp_min, :temp_max, :pop, :wind, :report_datetime, :fetched_at)
+            ''', forecast_rows)
+            conn.executemany('DELETE FROM latest_weekly_forecasts WHERE area_code = ?', weekly_areas)
+            conn.executemany('''
+                INSERT INTO latest_weekly_forecasts
+                (area_code, forecast_date, weather_code, pop, temp_min, temp_max, reliability, fetched_at)
+                VALUES (:area_code, :forecast_date, :weather_code, :pop, :temp_min, :temp_max, :reliability, :fetched_at)
+            ''', weekly_rows)
+            
+            conn.executemany('''
+                INSERT OR REPLACE INTO forecast_reports
+                (area_code, report_datetime, fingerprint, fetched_at, last_seen_at, seen_count)
+                VALUES (?, ?, ?, ?, ?, 1)
+            ''', [(area_code, report_datetime, fingerprints[area_code], fetched_at, fetched_at) for area_code in changed])
+    return result
+
+
+def snapshot_fingerprint(forecasts: list, weekly: list) -> str:
+    """スナップショットの内容から指紋（ハッシュ値）を計算"""
+    payload = json.dumps([forecasts, weekly], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
 
 
 def get_latest_forecast(area_code: str, forecast_date: str = None):
-    """最新の天気予報を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    if forecast_date:
-        cursor.execute('''
-            SELECT * FROM forecasts 
-            WHERE area_code = ? AND forecast_date = ?
-            ORDER BY fetched_at DESC
-            LIMIT 1
-        ''', (area_code, forecast_date))
-    else:
-        cursor.execute('''
-            SELECT * FROM forecasts 
-            WHERE area_code = ?
-            ORDER BY fetched_at DESC
-            LIMIT 2
-        ''', (area_code,))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    """最新の天気予報を取得（最新スナップショットの今日・明日）"""
+    with connection() as conn:
+        if forecast_date:
+            rows = conn.execute('''
+                SELECT * FROM latest_forecasts
+                WHERE area_code = ? AND forecast_date = ?
+            ''', (area_code, forecast_date)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT * FROM latest_forecasts
+                WHERE area_code = ?
+                ORDER BY forecast_date
+            ''', (area_code,)).fetchall()
     return [dict(row) for row in rows]
 
 
 def get_latest_weekly_forecast(area_code: str):
     """最新の週間予報を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 最新のfetched_atを取得
-    cursor.execute('''
-        SELECT MAX(fetched_at) as latest FROM weekly_forecasts WHERE area_code = ?
-    ''', (area_code,))
-    result = cursor.fetchone()
-    
-    if result and result['latest']:
-        cursor.execute('''
-            SELECT * FROM weekly_forecasts 
-            WHERE area_code = ? AND fetched_at = ?
+    with connection() as conn:
+        rows = conn.execute('''
+            SELECT * FROM latest_weekly_forecasts
+            WHERE area_code = ?
             ORDER BY forecast_date
-        ''', (area_code, result['latest']))
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
-    
-    conn.close()
-    return []
+        ''', (area_code,)).fetchall()
+    return [dict(row) for row in rows]
 
 
-def get_forecast_history(area_code: str, limit: int = 10):
-    """過去の予報履歴を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def iter_latest_forecasts_bulk(area_codes: list = None):
+    """複数地域の最新予報を (area_code, forecasts, weekly) の順に返すジェネレーター
+
+    テーブルごとに WHERE area_code IN (...) の1回のクエリで読み、地域コード順に
+    突き合わせながら1地域ずつ返す（結果全体をメモリに載せない）。
+    area_codes が None なら全地域。データのない地域は返さない。
+    """
+    where, params = '', ()
+    if area_codes is not None:
+        if not area_codes:
+            return
+        where = f'WHERE area_code IN ({",".join("?" * len(area_codes))})'
+        params = tuple(area_codes)
     
-    cursor.execute('''
-        SELECT DISTINCT fetched_at FROM forecasts 
-        WHERE area_code = ?
-        ORDER BY fetched_at DESC
-        LIMIT ?
-    ''', (area_code, limit))
+    def by_area(cursor):
+        return groupby(cursor, key=lambda row: row['area_code'])
     
-    rows = cursor.fetchall()
-    conn.close()
-    return [row['fetched_at'] for row in rows]
+    with connection() as conn:
+        forecasts = by_area(conn.execute(
+            f'SELECT * FROM latest_forecasts {where} ORDER BY area_code, forecast_date', params))
+        weekly = by_area(conn.execute(
+            f'SELECT * FROM latest_weekly_forecasts {where} ORDER BY area_code, forecast_date', params))
+        
+        f, w = next(forecasts, None), next(weekly, None)
+        while f is not None or w is not None:
+            area_code = min(group[0] for group in (f, w) if group is not None)
+            f_rows = [dict(row) for row in f[1]] if f is not None and f[0] == area_code else []
+            w_rows = [dict(row) for row in w[1]] if w is not None and w[0] == area_code else []
+            yield area_code, f_rows, w_rows
+            if f_rows:
+                f = next(forecasts, None)
+            if w_rows:
+                w = next(weekly, None)
+
+
+def get_forecast_history(area_code: str, limit: int = 10):
+    """過去の予報履歴を取得
+
+    パーティションは新しい月から読み、limit 件に達したらそれより古い月は読まない。
+    """
+    fetched, found = set(), 0
+    with connection() as conn:
+        for schema in _history_sources(conn, newest_first=True):
+            rows = conn.execute(f'''
+                SELECT DISTINCT fetched_at FROM {schema}.forecasts
+                WHERE area_code = ?
+                ORDER BY fetched_at DESC
+                LIMIT ?
+            ''', (area_code, limit)).fetchall()
+            fetched.update(row['fetched_at'] for row in rows)
+            # main の行はどの月のものもありうるので、件数はパーティションの分だけで数える
+            found += len(rows) if schema != 'main' else 0
+            if 0 <= limit <= found:
+                break
+    history = sorted(fetched, reverse=True)
+    return history[:limit] if limit >= 0 else history
 
 
 def get_forecast_by_fetched_at(area_code: str, fetched_at: str):
     """特定の取得日時の予報を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    rows = []
+    with connection() as conn:
+        for schema in _history_sources(conn, fetched_from=fetched_at, fetched_to=fetched_at):
+            rows += conn.execute(f'''
+                SELECT * FROM {schema}.forecasts
+                WHERE area_code = ? AND fetched_at = ?
+                ORDER BY forecast_date
+            ''', (area_code, fetched_at)).fetchall()
+    return sorted((dict(row) for row in rows), key=lambda row: row['forecast_date'])
+
+
+EXPORT_TABLES = ('forecasts', 'weekly_forecasts')
+
+
+def iter_forecast_rows(table: str, area_code: str = None,
+                       date_from: str = None, date_to: str = None,
+                       fetched_from: str = None, fetched_to: str = None,
+                       batch_size: int = 1000):
+    """予報履歴の行を1行ずつ返すジェネレーター（エクスポート用）
+
+    カーソルから batch_size 行ずつ読むので、履歴の量に関係なくメモリ使用量は一定
+    （この間は接続のmmapを無効にする）。
+    並び順は地域指定時は (fetched_at, forecast_date)、それ以外は保存順（rowid）で、
+    どちらもSQLite側での並べ替え（一時B-tree）が発生しない。
+    パーティションは取得日時・予報日の範囲が条件に合うものだけを、main のあとに月の順で読む。
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'Unknown table: {table}')
     
-    cursor.execute('''
-        SELECT * FROM forecasts 
-        WHERE area_code = ? AND fetched_at = ?
-        ORDER BY forecast_date
-    ''', (area_code, fetched_at))
+    conditions, params = [], []
+    for column, op, value in (
+        ('area_code', '=', area_code),
+        ('forecast_date', '>=', date_from),
+        ('forecast_date', '<=', date_to),
+        ('fetched_at', '>=', fetched_from),
+        ('fetched_at', '<=', fetched_to),
+    ):
+        if value is not None:
+            conditions.append(f'{column} {op} ?')
+            params.append(value)
+    where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+    order = 'fetched_at, forecast_date' if area_code is not None else 'id'
     
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    with connection() as conn:
+        # 全件を一度だけ読む処理ではmmapの利点がなく、読んだ分だけRSSが増えるので無効にする
+        # （スキーマ名なしのPRAGMAは ATTACH したパーティションにも効く）
+        conn.execute('PRAGMA mmap_size = 0')
+        try:
+            for schema in _history_sources(conn, fetched_from=fetched_from, fetched_to=fetched_to,
+                                           date_from=date_from, date_to=date_to):
+                cursor = conn.execute(f'SELECT * FROM {schema}.{table} {where} ORDER BY {order}', params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+                cursor.close()
+        finally:
+            conn.execute(f'PRAGMA mmap_size = {dict(PRAGMAS)["mmap_size"]}')
+
+
+def get_latest_snapshot_version(area_code: str) -> tuple:
+    """最新スナップショットの版（取得日時・発表日時・週間予報の取得日時）
+
+    ETag用。行の中身は読まずに主キーの範囲だけを見る。
+    """
+    with connection() as conn:
+        row = conn.execute('''
+            SELECT
+                (SELECT MAX(fetched_at) FROM latest_forecasts WHERE area_code = ?),
+                (SELECT MAX(report_datetime) FROM latest_forecasts WHERE area_code = ?),
+                (SELECT MAX(fetched_at) FROM latest_weekly_forecasts WHERE area_code = ?)
+        ''', (area_code, area_code, area_code)).fetchone()
+    return tuple(row)
+
+
+def get_history_version(area_code: str) -> tuple:
+    """予報履歴の版（最新・最古の取得日時と行数。間引きで古い行が消えても変わる）
+
+    パーティションがあれば、カタログ（月の数と版の合計）と最新の月の最新の取得日時を加える。
+    古い月の行は間引き・読み込み専用化・アーカイブでしか変わらず、そのたびにカタログの版が増える。
+    """
+    with connection() as conn:
+        row = conn.execute('''
+            SELECT MAX(fetched_at), MIN(fetched_at), COUNT(*) FROM forecasts WHERE area_code = ?
+        ''', (area_code,)).fetchone()
+        partitions = _partitions(conn, newest_first=True, limit=1)
+        if not partitions:
+            return tuple(row)
+        catalog = conn.execute('SELECT COUNT(*), TOTAL(version) FROM forecast_partitions').fetchone()
+        schema = _attach(conn, partitions[0])
+        newest = conn.execute(f'SELECT MAX(fetched_at) FROM {schema}.forecasts WHERE area_code = ?',
+                              (area_code,)).fetchone()[0]
+    return (*row, *catalog, newest)
+
+
+def forecast_snapshot_exists(area_code: str, fetched_at: str) -> bool:
+    """指定の取得日時のスナップショットがあるか"""
+    with connection() as conn:
+        for schema in _history_sources(conn, fetched_from=fetched_at, fetched_to=fetched_at):
+            row = conn.execute(f'''
+                SELECT 1 FROM {schema}.forecasts WHERE area_code = ? AND fetched_at = ? LIMIT 1
+            ''', (area_code, fetched_at)).fetchone()
+            if row is not None:
+                return True
+    return False
 
 
 if __name__ == '__main__':
@@ -0,0 +1,95 @@
+"""
+予報履歴のエクスポート（NDJSON / CSV）
+
+DBのカーソルから1行ずつ読んで書き出すので、履歴がどれだけ大きくても
+メモリ使用量は一定。APIサーバーの /api/export からも同じ処理を使う。
+
+使い方:
+    python export.py --table weekly_forecasts --format csv --area 130000 -o weekly.csv
+    python export.py --fetched-from "2025-01-01 00:00:00" --format ndjson > forecasts.ndjson
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+import database as db
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_ndjson(rows):
+    """行をNDJSON（1行1オブジェクト）の文字列として返す"""
+    for row in rows:
+        yield json.dumps(dict(row), ensure_ascii=False) + '\n'
+
+
+def iter_csv(rows):
+    """行をCSVの文字列として返す（先頭にヘッダー行）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for row in rows:
+        if not header_written:
+            writer.writerow(row.keys())
+            header_written = True
+        writer.writerow(tuple(row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export(table: str, fmt: str, chunk_size: int = 256, **filters):
+    """エクスポート結果を文字列のチャンクとして返すジェネレーター"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format: {fmt}')
+    rows = db.iter_forecast_rows(table, **filters)
+    lines = iter_ndjson(rows) if fmt == 'ndjson' else iter_csv(rows)
+    
+    # 1行ずつ書き出すと遅いので、いくつかまとめてから返す
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk.clear()
+    if chunk:
+        yield ''.join(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='予報履歴をNDJSON / CSVでエクスポート')
+    parser.add_argument('--table', choices=db.EXPORT_TABLES, default='forecasts')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--area', help='地域コード')
+    parser.add_argument('--date-from', help='予報日（YYYY-MM-DD）の下限')
+    parser.add_argument('--date-to', help='予報日（YYYY-MM-DD）の上限')
+    parser.add_argument('--fetched-from', help="取得日時（'YYYY-MM-DD HH:MM:SS'）の下限")
+    parser.add_argument('--fetched-to', help="取得日時（'YYYY-MM-DD HH:MM:SS'）の上限")
+    parser.add_argument('--db', type=Path, help='DBファイル（省略時は weather.db）')
+    parser.add_argument('-o', '--output', help='出力ファイル（省略時は標準出力）')
+    args = parser.parse_args()
+    
+    if args.db:
+        db.DB_PATH = args.db
+    
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in export(args.table, args.format, area_code=args.area,
+                            date_from=args.date_from, date_to=args.date_to,
+                            fetched_from=args.fetched_from, fetched_to=args.fetched_to):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+気象庁の定時発表（5時・11時・17時 JST）に基づく予報の鮮度判定
+
+保存済みの最新予報の発表日時（report_datetime）より後の定時発表がまだ来ていなければ、
+気象庁に問い合わせても同じ予報しか返らないので、DBの内容をそのまま返してよい。
+
+- 次の定時発表 + FRESHNESS_GRACE までは保存済みの予報を新しいとみなす
+  （発表から配信までの遅れの間に問い合わせを繰り返さない。prefetch.py の先読みもこの頃に走る）
+- 発表日時が読めない・保存済みの予報がない場合は新しくないとみなす
+- 臨時の発表は考慮しない（/api/forecast/<area_code>?force=1 で気象庁から取り直す）
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+JST = timezone(timedelta(hours=9))
+PUBLICATION_HOURS = (5, 11, 17)  # 気象庁の定時発表時刻（JST）
+
+# 次の定時発表からこの時間までは保存済みの予報を返す（負の値なら発表時刻より前から問い合わせる）
+FRESHNESS_GRACE = timedelta(minutes=float(os.environ.get('WEATHER_FRESHNESS_GRACE_MINUTES', 10)))
+
+
+def clock() -> datetime:
+    """現在時刻（JST）。確認用スクリプトでは固定した時刻を返す関数に差し替える"""
+    return datetime.now(JST)
+
+
+def next_publication(after: datetime) -> datetime:
+    """after より後の最初の定時発表時刻"""
+    after = after.astimezone(JST)
+    day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in (0, 1):
+        for hour in PUBLICATION_HOURS:
+            candidate = day + timedelta(days=offset, hours=hour)
+            if candidate > after:
+                return candidate
+
+
+def latest_publication(now: datetime) -> datetime:
+    """now 以前の最後の定時発表時刻"""
+    now = now.astimezone(JST)
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in (0, -1):
+        for hour in reversed(PUBLICATION_HOURS):
+            candidate = day + timedelta(days=offset, hours=hour)
+            if candidate <= now:
+                return candidate
+
+
+def fresh_until(report_datetime: str, grace: timedelta = None):
+    """発表日時 report_datetime の予報を新しいとみなせる期限（読めなければ None）"""
+    try:
+        published = datetime.fromisoformat(report_datetime)
+    except (TypeError, ValueError):
+        return None
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=JST)
+    return next_publication(published) + (FRESHNESS_GRACE if grace is None else grace)
+
+
+def is_fresh(report_datetime: str, now: datetime = None, grace: timedelta = None) -> bool:
+    """発表日時 report_datetime の予報より新しい定時発表がまだ出ていないか"""
+    until = fresh_until(report_datetime, grace)
+    return until is not None and (now or clock()) < until
@@ -0,0 +1,72 @@
+"""
+読み込みAPI用のHTTPキャッシュ対応
+
+- ETag（データの版から計算）と If-None-Match による304応答。
+  版が一致すれば、レスポンス本文を作る関数は呼ばない（行を読まない）
+- 大きなJSONレスポンスの gzip 圧縮（Accept-Encoding: gzip のとき）
+"""
+
+import gzip
+import hashlib
+
+from flask import Response, jsonify, request
+
+GZIP_MIN_SIZE = 1024  # これより小さい本文は圧縮しない（バイト）
+GZIP_LEVEL = 6
+
+NO_CACHE = 'no-cache'                # 保存してよいが、使う前に毎回ETagで再検証する
+SNAPSHOT_CACHE = 'public, max-age=86400'
+
+
+def make_etag(*parts) -> str:
+    """版を表す値の並びからETagを作る"""
+    key = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match ヘッダーの値が etag と一致するか（弱い比較。Flaskを使わない非同期モード用）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
+
+
+def conditional_json(version: tuple, build, cache_control: str = NO_CACHE):
+    """version から作ったETagがIf-None-Matchと一致すれば304、そうでなければ build() をJSONで返す
+
+    圧縮の有無で本文が変わるので弱いETagにする。
+    """
+    etag = make_etag(*version)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def gzip_response(response):
+    """after_request用: クライアントが対応していれば大きなレスポンスをgzip圧縮する"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not response.is_json):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.accept_encodings:
+        return response
+    
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
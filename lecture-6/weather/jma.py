@@ -0,0 +1,325 @@
+"""
+気象庁APIからの取得と解析
+APIサーバー（server.py・server_async.py）・プリフェッチャーから使う
+"""
+
+import os
+
+import area_index
+import database as db
+import freshness
+from singleflight import AsyncSingleFlight, SingleFlight
+from upstream import REQUEST_TIMEOUT, UpstreamCache
+
+# 気象庁API（JMA_BASE_URLでローカルのスタブサーバーに向けられる）
+JMA_BASE_URL = os.environ.get('JMA_BASE_URL', 'https://www.jma.go.jp/bosai')
+JMA_AREA_URL = JMA_BASE_URL + '/common/const/area.json'
+JMA_FORECAST_URL = JMA_BASE_URL + '/forecast/data/forecast/{}.json'
+
+# 気象庁APIのレスポンスキャッシュ（気象庁の更新は1日数回なので同じURLを何度も取りに行かない）
+jma_cache = UpstreamCache()
+
+# 同じURLへの同時取得を1回にまとめる（待機側は上流のタイムアウト + 余裕分まで待つ）
+upstream_flight = SingleFlight()
+FLIGHT_TIMEOUT = REQUEST_TIMEOUT * 2
+
+
+def _save_areas(response) -> int:
+    """エリア情報のレスポンス（地方・官署・細分区域）をDBに保存して件数を返す"""
+    data = response.json()
+    offices = data.get('offices', {})
+    # 地方コードが官署コードと重なることがある（011000: 九州南部・奄美地方 と 宗谷地方）。
+    # areas は地域コードが主キーなので官署を残し、その地方は保存しない（配下の官署の親はなしにする）
+    centers = {code: info for code, info in data.get('centers', {}).items() if code not in offices}
+    area_list = [(code, info['name'], 'center', None) for code, info in centers.items()]
+    area_list += [
+        (code, info['name'], 'office', info.get('parent') if info.get('parent') in centers else None)
+        for code, info in offices.items()
+    ]
+    area_list += [(code, info['name'], 'class10', info.get('parent')) for code, info in data.get('class10s', {}).items()]
+    db.save_area_hierarchy(area_list)
+    area_index.invalidate()
+    return len(area_list)
+
+
+def fetch_and_save_areas(revalidate: bool = False) -> int:
+    """エリア情報をAPIから取得してDBに保存（304・キャッシュヒット時は保存しない）"""
+    return upstream_flight.do(
+        JMA_AREA_URL,
+        lambda: jma_cache.get(JMA_AREA_URL, _save_areas, revalidate=revalidate),
+        timeout=FLIGHT_TIMEOUT
+    )
+
+
+def fetch_forecast(area_code: str, revalidate: bool = False) -> dict:
+    """天気予報をAPIから取得し、解析してDBに保存
+
+    TTL内・304の場合は前回の解析結果をそのまま返し、DBには書き込まない。
+    同じ地域を同時に要求された場合は、取得・解析・保存を1回だけ行って結果を共有する。
+    """
+    url = JMA_FORECAST_URL.format(area_code)
+    return upstream_flight.do(
+        url,
+        lambda: jma_cache.get(
+            url,
+            lambda response: parse_and_save_forecast(area_code, response.json()),
+            revalidate=revalidate
+        ),
+        timeout=FLIGHT_TIMEOUT
+    )
+
+
+# ===== 非同期モード（server_async.py）用 =====
+# async_cache は server_async.py の起動時に AsyncUpstreamCache を設定する
+async_cache = None
+async_flight = AsyncSingleFlight()
+
+
+async def fetch_and_save_areas_async(revalidate: bool = False) -> int:
+    """fetch_and_save_areas の非同期版"""
+    return await async_flight.do(
+        JMA_AREA_URL,
+        lambda: async_cache.get(JMA_AREA_URL, _save_areas, revalidate=revalidate),
+        timeout=FLIGHT_TIMEOUT
+    )
+
+
+async def fetch_forecast_async(area_code: str, revalidate: bool = False) -> dict:
+    """fetch_forecast の非同期版（解析・保存は async_cache の executor で実行）"""
+    url = JMA_FORECAST_URL.format(area_code)
+    return await async_flight.do(
+        url,
+        lambda: async_cache.get(
+            url,
+            lambda response: parse_and_save_forecast(area_code, response.json()),
+            revalidate=revalidate
+        ),
+        timeout=FLIGHT_TIMEOUT
+    )
+
+
+def to_number(value):
+    """気象庁APIの数値文字列を数値に変換（空文字・Noneは None）"""
+    if value is None or value == '':
+        return None
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+# timeSeries の各地域のキー → 行のカラム名
+DAILY_COLUMNS = {
+    'weatherCodes': 'weather_code',
+    'weathers': 'weather_text',
+    'winds': 'wind',
+    'pops': 'pop',
+    'temps': 'temp',
+}
+WEEKLY_COLUMNS = {
+    'weatherCodes': 'weather_code',
+    'pops': 'pop',
+    'reliabilities': 'reliability',
+    'tempsMin': 'temp_min',
+    'tempsMax': 'temp_max',
+}
+# 気温は予報区ではなく観測地点（アメダス）ごとに並んでいる
+STATION_KEYS = ('temps', 'tempsMin', 'tempsMax')
+
+
+def parse_forecast(data: list) -> dict:
+    """気象庁APIのレスポンスを地域ごとの列形式のデータにする
+
+    各 timeSeries の全地域を1回ずつたどり、{'report_datetime': ..., 'areas': {地域コード: record}} を返す。
+    record は {'name': 地域名, 'daily': {カラム名: (timeDefines, 値のリスト)}, 'weekly': {...}}。
+    気温の観測地点は、同じ発表の最初の timeSeries の予報区に順番で対応づける
+    （気象庁のレスポンスでは予報区ごとの代表地点が同じ順に並んでいる）。
+    """
+    report = {'report_datetime': None, 'areas': {}}
+    areas = report['areas']
+    
+    for section, columns, forecast in zip(('daily', 'weekly'), (DAILY_COLUMNS, WEEKLY_COLUMNS), data):
+        if section == 'daily':
+            report['report_datetime'] = forecast.get('reportDatetime', '')
+        time_series = forecast.get('timeSeries', [])
+        forecast_areas = [area.get('area', {}) for area in time_series[0].get('areas', [])] if time_series else []
+        
+        for series in time_series:
+            time_defines = series.get('timeDefines', [])
+            for i, area in enumerate(series.get('areas', [])):
+                info = area.get('area', {})
+                if any(key in area for key in STATION_KEYS):
+                    if i >= len(forecast_areas):
+                        continue
+                    info = forecast_areas[i]
+                code = info.get('code', '')
+                record = areas.get(code)
+                if record is None:
+                    record = areas[code] = {'name': info.get('name', ''), 'daily': {}, 'weekly': {}}
+                target = record[section]
+                for key, column in columns.items():
+                    if key in area:
+                        target[column] = (time_defines, area[key])
+    
+    return report
+
+
+def _by_date(column) -> dict:
+    """(timeDefines, 値のリスト) を {日付: [(時刻, 数値)]} にまとめる（空の値は除く）"""
+    if column is None:
+        return {}
+    result = {}
+    for time_define, value in zip(*column):
+        number = to_number(value)
+        if number is not None:
+            result.setdefault(time_define[:10], []).append((time_define[11:16], number))
+    return result
+
+
+def build_rows(record: dict) -> tuple:
+    """地域ごとの列形式のデータから forecasts / weekly_forecasts の行を作る
+
+    降水確率・気温はそれぞれの timeDefines の日付で天気と突き合わせる。
+    降水確率はその日の6時間ごとの値の最大、気温は 00:00 が朝の最低、09:00 が日中の最高。
+    """
+    forecast_rows = []
+    daily = record['daily']
+    if 'weather_code' in daily:
+        time_defines, weather_codes = daily['weather_code']
+        weathers = daily.get('weather_text', ((), ()))[1]
+        winds = daily.get('wind', ((), ()))[1]
+        pops = _by_date(daily.get('pop'))
+        temps = _by_date(daily.get('temp'))
+        for i, time_define in enumerate(time_defines):
+            date = time_define[:10]
+            day_temps = dict(temps.get(date, ()))
+            day_pops = [pop for _, pop in pops.get(date, ())]
+            forecast_rows.append({
+                'forecast_date': date,
+                'weather_code': weather_codes[i] if i < len(weather_codes) else '',
+                'weather_text': weathers[i] if i < len(weathers) else '',
+                'temp_min': day_temps.get('00:00'),
+                'temp_max': day_temps.get('09:00'),
+                'pop': max(day_pops) if day_pops else None,
+                'wind': winds[i] if i < len(winds) else ''
+            })
+    
+    weekly_rows = []
+    weekly = record['weekly']
+    if 'weather_code' in weekly:
+        time_defines, weather_codes = weekly['weather_code']
+        pops = weekly.get('pop', ((), ()))[1]
+        reliabilities = weekly.get('reliability', ((), ()))[1]
+        temp_mins = _by_date(weekly.get('temp_min'))
+        temp_maxs = _by_date(weekly.get('temp_max'))
+        for i, time_define in enumerate(time_defines):
+            date = time_define[:10]
+            weekly_rows.append({
+                'forecast_date': date,
+                'weather_code': weather_codes[i] if i < len(weather_codes) else '',
+                'pop': to_number(pops[i]) if i < len(pops) else None,
+                'temp_min': temp_mins[date][0][1] if date in temp_mins else None,
+                'temp_max': temp_maxs[date][0][1] if date in temp_maxs else None,
+                'reliability': reliabilities[i] if i < len(reliabilities) else ''
+            })
+    
+    return forecast_rows, weekly_rows
+
+
+def _summary(area_name: str, forecast_rows: list, weekly_rows: list) -> dict:
+    """APIレスポンス用の今日・明日・週間予報"""
+    def day(row):
+        return {'date': row['forecast_date'], **{k: v for k, v in row.items() if k != 'forecast_date'}}
+    
+    return {
+        'area_name': area_name,
+        'today': day(forecast_rows[0]) if len(forecast_rows) > 0 else None,
+        'tomorrow': day(forecast_rows[1]) if len(forecast_rows) > 1 else None,
+        'weekly': [day(row) for row in weekly_rows],
+    }
+
+
+def parse_and_save_forecast(area_code: str, data: list) -> dict:
+    """気象庁APIのレスポンスを解析し、官署と全細分区域の予報を1回の一括書き込みでDBに保存
+
+    官署コード（area_code）には従来どおり最初の細分区域の予報を保存し、
+    各細分区域の予報はその地域コード（130010 など）で保存する。
+    戻り値は官署の today / tomorrow / weekly と、細分区域ごとの同じ形の予報（areas）。
+    """
+    result = {
+        'today': None,
+        'tomorrow': None,
+        'weekly': [],
+        'report_datetime': None,
+        'area_name': None,
+        'areas': {}
+    }
+    
+    if len(data) < 1:
+        return result
+    
+    report = parse_forecast(data)
+    result['report_datetime'] = report['report_datetime']
+    
+    snapshots = {}
+    for code, record in report['areas'].items():
+        forecast_rows, weekly_rows = build_rows(record)
+        if not forecast_rows and not weekly_rows:
+            continue
+        snapshots[code] = (forecast_rows, weekly_rows)
+        result['areas'][code] = _summary(record['name'], forecast_rows, weekly_rows)
+    
+    if snapshots:
+        # 今日・明日は最初の予報区、週間予報は週間予報の最初の地域を官署の予報とする
+        first_daily = next((code for code, (rows, _) in snapshots.items() if rows), None)
+        first_weekly = next((code for code, (_, rows) in snapshots.items() if rows), None)
+        office_rows = (
+            snapshots[first_daily][0] if first_daily else [],
+            snapshots[first_weekly][1] if first_weekly else []
+        )
+        snapshots = {area_code: office_rows, **snapshots}
+        summary = _summary(report['areas'][first_daily]['name'] if first_daily else '', *office_rows)
+        result.update(summary)
+    
+    db.save_forecast_snapshots(snapshots, result['report_datetime'])
+    
+    return result
+
+
+def _stored_rows(rows: list) -> list:
+    """latest_* テーブルの行を build_rows と同じ形にする（保存時に付けた列を除く）"""
+    return [{k: v for k, v in row.items() if k not in ('area_code', 'report_datetime', 'fetched_at')} for row in rows]
+
+
+def load_forecast(area_code: str):
+    """保存済みの最新スナップショットから fetch_forecast と同じ形の予報を作る（なければ None）
+
+    細分区域はエリア情報の索引で官署の子になっているものを、その順に並べる。
+    エリア情報にない地域は細分区域がわからないので None を返す（気象庁APIから取得させる）。
+    """
+    index = area_index.get()
+    area = index.get(area_code)
+    if area is None:
+        return None
+    children = area.children
+    stored = {code: (forecasts, weekly) for code, forecasts, weekly in db.iter_latest_forecasts_bulk([area_code, *children])}
+    if area_code not in stored:
+        return None
+
+    areas = {
+        code: _summary(index.get(code).name, _stored_rows(stored[code][0]), _stored_rows(stored[code][1]))
+        for code in children if code in stored
+    }
+    # 官署の今日・明日は最初の予報区のものなので、その名前を使う（parse_and_save_forecast と同じ）
+    first_daily = next((code for code in areas if stored[code][0]), None)
+    forecasts, weekly = stored[area_code]
+    result = _summary(areas[first_daily]['area_name'] if first_daily else '', _stored_rows(forecasts), _stored_rows(weekly))
+    result['report_datetime'] = forecasts[0]['report_datetime'] if forecasts else None
+    result['areas'] = areas
+    return result
+
+
+def load_fresh_forecast(area_code: str, now=None):
+    """保存済みの予報より新しい定時発表がまだ出ていなければ、保存済みの予報を返す（出ていれば None）"""
+    _, report_datetime, _ = db.get_latest_snapshot_version(area_code)
+    if not freshness.is_fresh(report_datetime, now):
+        return None
+    return load_forecast(area_code)
@@ -0,0 +1,258 @@
+"""
+予報履歴の保持期間管理（間引き）と領域の回収
+
+保持ポリシーは「経過日数の上限: 残す粒度」の並びで指定する。既定値:
+    7日以内: すべて残す / 90日以内: 1日1件 / それ以降: 1週1件
+各粒度の区間では地域ごとに最も新しいスナップショットだけを残す。
+
+削除は小さなバッチごとにコミットするので、実行中も読み込みを長く止めない。
+削除後は PRAGMA incremental_vacuum で空きページをファイルから切り詰める。
+
+予報履歴の月別パーティション（database.py）は、書き込み可能なものを main と同じように間引く
+（区間はパーティションごとに求めるので、月をまたぐ週は月ごとに1件ずつ残る）。
+間引きのあと、ポリシーの最後の日数より古い月は読み込み専用にする（以降は間引かない。
+不要になったら --archive で archive/ に移す）。
+
+使い方:
+    python maintenance.py                          # 既定のポリシーで1回実行
+    python maintenance.py --policy 7:all,30:day,*:none
+    python maintenance.py --enable-auto-vacuum     # 既存DBを auto_vacuum=INCREMENTAL に変換（VACUUMを伴う）
+    python maintenance.py --partition-history      # main の予報履歴を月別パーティションに移してから実行
+    python maintenance.py --archive 2024-01        # 読み込み専用の月を archive/ に移す
+    python maintenance.py --list-partitions
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+import database as db
+
+# (経過日数の上限 または None=上限なし, 粒度)
+DEFAULT_POLICY = (
+    (7, 'all'),
+    (90, 'day'),
+    (None, 'week'),
+)
+
+# 粒度ごとの区間を表すSQL式（NULLの区間は1件も残さない）
+GRANULARITIES = {
+    'all': 'fetched_at',
+    'hour': "strftime('%Y-%m-%d %H', fetched_at)",
+    'day': 'date(fetched_at)',
+    'week': "strftime('%Y-%W', fetched_at)",
+    'month': "strftime('%Y-%m', fetched_at)",
+    'none': 'NULL',
+}
+
+BATCH_SIZE = 2000            # 1トランザクションで削除する最大行数
+VACUUM_PAGES_PER_STEP = 1000  # 1回の incremental_vacuum で解放する最大ページ数
+MAINTENANCE_INTERVAL = timedelta(hours=24)
+
+
+def parse_policy(text: str) -> tuple:
+    """'7:all,90:day,*:week' 形式の文字列をポリシーに変換"""
+    policy = []
+    for part in text.split(','):
+        age, _, granularity = part.strip().partition(':')
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unknown granularity: {granularity!r} (choose from {", ".join(GRANULARITIES)})')
+        policy.append((None if age == '*' else int(age), granularity))
+    if policy[-1][0] is not None:
+        policy.append((None, 'none'))  # 最後の区間より古いものは削除
+    return tuple(policy)
+
+
+def _bucket_expression(policy, now: datetime):
+    """ポリシーからスナップショットの区間を求めるCASE式とパラメータを組み立てる"""
+    clauses = []
+    params = []
+    for max_age, granularity in policy:
+        if max_age is None:
+            clauses.append(f'ELSE {GRANULARITIES[granularity]}')
+            break
+        cutoff = (now - timedelta(days=max_age)).strftime('%Y-%m-%d %H:%M:%S')
+        clauses.append(f'WHEN fetched_at >= ? THEN {GRANULARITIES[granularity]}')
+        params.append(cutoff)
+    return 'CASE ' + ' '.join(clauses) + ' END', params
+
+
+def _database_size(conn, schema: str = 'main') -> int:
+    page_size = conn.execute(f'PRAGMA {schema}.page_size').fetchone()[0]
+    return conn.execute(f'PRAGMA {schema}.page_count').fetchone()[0] * page_size
+
+
+def prune_history(policy=DEFAULT_POLICY, batch_size: int = BATCH_SIZE, now: datetime = None) -> dict:
+    """保持ポリシーに従って古いスナップショットを削除し、テーブルごとの削除行数を返す"""
+    now = now or datetime.now()
+    bucket, params = _bucket_expression(policy, now)
+    removed = {'forecasts': 0, 'weekly_forecasts': 0, 'forecast_reports': 0}
+    
+    with db.connection() as conn:
+        for schema in db._history_sources(conn, writable=True):
+            # 削除対象のスナップショット（地域 + 取得日時）を一時テーブルに集める
+            conn.execute('DROP TABLE IF EXISTS temp.doomed_snapshots')
+            conn.execute(f'''
+                CREATE TEMP TABLE doomed_snapshots AS
+                WITH snapshots AS (
+                    SELECT area_code, fetched_at FROM {schema}.forecasts
+                    UNION
+                    SELECT area_code, fetched_at FROM {schema}.weekly_forecasts
+                ),
+                bucketed AS (
+                    SELECT area_code, fetched_at, {bucket} AS bucket FROM snapshots
+                )
+                SELECT area_code, fetched_at FROM bucketed
+                EXCEPT
+                SELECT area_code, MAX(fetched_at) FROM bucketed
+                WHERE bucket IS NOT NULL
+                GROUP BY area_code, bucket
+            ''', params)
+            conn.execute('CREATE INDEX temp.idx_doomed ON doomed_snapshots(area_code, fetched_at)')
+            conn.commit()
+            
+            deleted_rows = 0
+            for table in ('forecasts', 'weekly_forecasts'):
+                while True:
+                    conn.execute('BEGIN IMMEDIATE')
+                    deleted = conn.execute(f'''
+                        DELETE FROM {schema}.{table} WHERE id IN (
+                            SELECT t.id FROM {schema}.{table} t
+                            JOIN doomed_snapshots d ON d.area_code = t.area_code AND d.fetched_at = t.fetched_at
+                            LIMIT ?
+                        )
+                    ''', (batch_size,)).rowcount
+                    conn.commit()
+                    removed[table] += deleted
+                    deleted_rows += deleted
+                    if deleted < batch_size:
+                        break
+            
+            # 保存先のスナップショットが消えた発表の指紋も消す（同じ発表を再取得したら保存し直す）
+            conn.execute('BEGIN IMMEDIATE')
+            removed['forecast_reports'] += conn.execute('''
+                DELETE FROM forecast_reports WHERE EXISTS (
+                    SELECT 1 FROM doomed_snapshots d
+                    WHERE d.area_code = forecast_reports.area_code AND d.fetched_at = forecast_reports.fetched_at
+                )
+            ''').rowcount
+            if schema != 'main' and deleted_rows:
+                # 履歴のETagが変わるようにカタログの版を増やす
+                conn.execute('UPDATE forecast_partitions SET version = version + 1 WHERE month = ?',
+                             (db._schema_month(schema),))
+            conn.commit()
+            conn.execute('DROP TABLE temp.doomed_snapshots')
+    
+    return removed
+
+
+def incremental_vacuum(pages_per_step: int = VACUUM_PAGES_PER_STEP) -> int:
+    """空きページを少しずつファイルから切り詰め、回収したバイト数を返す（書き込み可能なパーティションも）"""
+    reclaimed = 0
+    with db.connection() as conn:
+        for schema in db._history_sources(conn, writable=True):
+            if conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != 2:
+                continue
+            before = _database_size(conn, schema)
+            while conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0] > 0:
+                conn.execute(f'PRAGMA {schema}.incremental_vacuum({pages_per_step})').fetchall()
+            # WALモードでは切り詰めがチェックポイントでDBファイルに反映される
+            conn.execute(f'PRAGMA {schema}.wal_checkpoint(TRUNCATE)').fetchall()
+            reclaimed += before - _database_size(conn, schema)
+    return reclaimed
+
+
+def freeze_old_partitions(policy=DEFAULT_POLICY, now: datetime = None) -> list:
+    """ポリシーの最後の日数より古い月のパーティションを読み込み専用にし、その月のリストを返す"""
+    ages = [max_age for max_age, _ in policy if max_age is not None]
+    if not ages:
+        return []
+    cutoff = (now or datetime.now()) - timedelta(days=max(ages))
+    return db.freeze_partitions(cutoff.strftime('%Y-%m'))
+
+
+def enable_auto_vacuum() -> bool:
+    """既存DBを auto_vacuum=INCREMENTAL に切り替える（全体のVACUUMを1回行う）"""
+    with db.connection() as conn:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+
+
+def run_maintenance(policy=DEFAULT_POLICY, batch_size: int = BATCH_SIZE) -> dict:
+    """間引きと領域の回収を行い、結果のレポートを返す"""
+    start = time.perf_counter()
+    removed = prune_history(policy, batch_size)
+    reclaimed = incremental_vacuum()
+    frozen = freeze_old_partitions(policy)
+    return {
+        'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'rows_removed': removed,
+        'bytes_reclaimed': reclaimed,
+        'partitions_frozen': frozen,
+        'elapsed': round(time.perf_counter() - start, 3),
+    }
+
+
+def format_report(report: dict) -> str:
+    """レポートを1行の文字列にする"""
+    removed = ' '.join(f'{table}={count}' for table, count in report['rows_removed'].items())
+    frozen = f" frozen={','.join(report['partitions_frozen'])}" if report['partitions_frozen'] else ''
+    return (f"[maintenance] {report['started_at']} removed: {removed} "
+            f"reclaimed={report['bytes_reclaimed']} bytes{frozen} elapsed={report['elapsed']}s")
+
+
+def start_background(policy=DEFAULT_POLICY, interval: timedelta = MAINTENANCE_INTERVAL) -> threading.Event:
+    """サーバーと同じプロセスで定期実行を開始（戻り値のEventをセットすると停止）"""
+    stop_event = threading.Event()
+    
+    def loop():
+        while not stop_event.wait(interval.total_seconds()):
+            try:
+                print(format_report(run_maintenance(policy)))
+            except Exception as e:
+                print(f'[maintenance] failed: {e}')
+    
+    threading.Thread(target=loop, name='maintenance', daemon=True).start()
+    return stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description='予報履歴の間引きと領域の回収')
+    parser.add_argument('--policy', type=parse_policy, default=DEFAULT_POLICY,
+                        help="保持ポリシー（例: '7:all,90:day,*:week'。日数:粒度 を古い方へ並べる）")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='1トランザクションで削除する最大行数')
+    parser.add_argument('--enable-auto-vacuum', action='store_true',
+                        help='既存DBを auto_vacuum=INCREMENTAL に変換してから実行（VACUUMを伴う）')
+    parser.add_argument('--partition-history', action='store_true',
+                        help='main の予報履歴を月別パーティションに移してから実行')
+    parser.add_argument('--archive', metavar='YYYY-MM', action='append', default=[],
+                        help='読み込み専用のパーティションを archive/ に移す（間引きは行わない）')
+    parser.add_argument('--list-partitions', action='store_true', help='パーティションのカタログを表示して終了')
+    args = parser.parse_args()
+    
+    db.init_database()
+    try:
+        if args.list_partitions or args.archive:
+            for month in args.archive:
+                print(f'{month} archived to {db.archive_partition(month)}')
+            for partition in db.list_partitions():
+                print(f"{partition['month']} {partition['state']:8s} {partition['path']} "
+                      f"forecast_date={partition['min_forecast_date']}..{partition['max_forecast_date']} "
+                      f"version={partition['version']}")
+            return
+        if args.enable_auto_vacuum and enable_auto_vacuum():
+            print('auto_vacuum = INCREMENTAL enabled')
+        if args.partition_history:
+            moved = db.partition_history()
+            print(f'partitioned: {sum(moved.values())} rows into {len(moved)} months')
+        print(format_report(run_maintenance(args.policy, args.batch_size)))
+    finally:
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
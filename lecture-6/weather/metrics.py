@@ -0,0 +1,421 @@
+"""
+処理時間の計測とPrometheus形式での公開
+
+- Counter / Gauge / Histogram: ラベルの値ごとに集計する軽量なメトリクス
+- instrument_app:       Flaskのリクエストごとの処理時間・同時処理数
+- instrument_functions: モジュールの関数（database.py など）の処理時間・例外数
+- instrument_session:   上流（気象庁API）へのHTTPリクエストの処理時間
+- ASGIMetricsMiddleware: 非同期モード（server_async.py）のリクエストごとの処理時間・同時処理数
+- render:               /metrics 用のテキスト（Prometheus text format 0.0.4）
+
+WEATHER_SLOW_QUERY_MS を設定すると、それより遅いDB関数の呼び出しを
+weather.slow_query ロガーに警告として出力する。
+"""
+
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# 秒。DB関数の多くは1ms未満、上流は数十ms〜数秒なので両方をカバーする
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_slow_ms = os.environ.get('WEATHER_SLOW_QUERY_MS')
+SLOW_QUERY_THRESHOLD = float(_slow_ms) / 1000 if _slow_ms else None  # 秒（Noneなら出力しない）
+slow_query_log = logging.getLogger('weather.slow_query')
+
+_registry = []
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """メトリクスの共通部分
+
+    function を設定すると、出力のたびに function() の戻り値
+    （ラベルの値のタプル → 値 の辞書）を使う（他のオブジェクトが持っている統計値の公開用）。
+    """
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = None
+        self._values = {}  # ラベルの値のタプル → 値
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """(サフィックス, ラベルの値, 追加ラベル, 値) を返す"""
+        if self.function is not None:
+            items = list(self.function().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for labels, value in items:
+            yield '', labels, '', value
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """増える一方の回数"""
+    type = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    """増減する値（同時処理数など）"""
+    type = 'gauge'
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Histogram(_Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, register: bool = True):
+        super().__init__(name, documentation, labelnames, register)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        # バケットごとの件数は「そのバケットにだけ入る件数」で持ち、出力時に累積する
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                yield '_bucket', labels, f'le="{_format_value(float(bound))}"', cumulative
+            yield '_sum', labels, '', total
+            yield '_count', labels, '', count
+
+
+def render() -> str:
+    """登録済みのメトリクスをすべてPrometheus形式のテキストにする"""
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+# ===== 計測対象 =====
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'weather_http_request_duration_seconds', 'APIリクエストの処理時間（ストリーミング応答は本文を除く）',
+    ('method', 'route', 'status'))
+HTTP_IN_FLIGHT = Gauge('weather_http_requests_in_flight', '処理中のAPIリクエスト数')
+
+DB_CALL_SECONDS = Histogram('weather_db_call_duration_seconds', 'database.py の関数の処理時間', ('function',))
+DB_CALL_ERRORS = Counter('weather_db_call_errors_total', 'database.py の関数で発生した例外の数', ('function',))
+DB_IN_FLIGHT = Gauge('weather_db_calls_in_flight', '実行中のdatabase.py の関数の数')
+DB_POOL_WAIT_SECONDS = Histogram('weather_db_pool_wait_seconds', 'コネクションプールから接続を借りるまでの時間')
+DB_POOL_CONNECTIONS = Gauge('weather_db_pool_connections', 'コネクションプールの接続数', ('state',))
+
+JMA_CALL_SECONDS = Histogram('weather_jma_call_duration_seconds', '気象庁APIの取得・解析関数の処理時間', ('function',))
+JMA_CALL_ERRORS = Counter('weather_jma_call_errors_total', '気象庁APIの取得・解析関数で発生した例外の数', ('function',))
+JMA_IN_FLIGHT = Gauge('weather_jma_calls_in_flight', '実行中の気象庁APIの取得・解析関数の数')
+
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    'weather_upstream_request_duration_seconds', '気象庁APIへのHTTPリクエストの時間', ('status',))
+UPSTREAM_IN_FLIGHT = Gauge('weather_upstream_requests_in_flight', '気象庁APIへの送信中のリクエスト数')
+UPSTREAM_CACHE_RESULTS = Counter('weather_upstream_cache_results_total', '気象庁APIキャッシュの結果ごとの回数', ('result',))
+
+
+def _observe_call(fn, name: str, histogram, errors, in_flight, slow_threshold):
+    """fn を計測する関数でラップ（ジェネレーター関数は取り出しにかかった時間の合計を計測）"""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def coroutine_wrapper(*args, **kwargs):
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                errors.inc(name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                in_flight.dec()
+                histogram.observe(elapsed, name)
+        return coroutine_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            elapsed = 0.0
+            iterator = fn(*args, **kwargs)
+            in_flight.inc()
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            except GeneratorExit:
+                # 途中で読むのをやめた（ストリーミングの切断など）。例外としては数えない
+                raise
+            except BaseException:
+                errors.inc(name)
+                raise
+            finally:
+                iterator.close()
+                in_flight.dec()
+                histogram.observe(elapsed, name)
+                if slow_threshold is not None and elapsed >= slow_threshold:
+                    _log_slow(name, elapsed, args, kwargs)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            errors.inc(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            histogram.observe(elapsed, name)
+            if slow_threshold is not None and elapsed >= slow_threshold:
+                _log_slow(name, elapsed, args, kwargs)
+    return wrapper
+
+
+def _log_slow(name: str, elapsed: float, args, kwargs):
+    params = ', '.join([repr(a)[:80] for a in args] + [f'{k}={v!r:.80}' for k, v in kwargs.items()])
+    slow_query_log.warning('slow call: %s(%s) took %.1f ms', name, params, elapsed * 1000)
+
+
+def instrument_functions(module, histogram, errors, in_flight, names=None, exclude=(), slow_threshold=None):
+    """モジュールの公開関数を計測用のラッパーに差し替える（二重には差し替えない）
+
+    呼び出し側が module.関数名 で参照していれば、モジュール内からの呼び出しも含めて計測される。
+    names を省略すると、そのモジュールで定義された _ で始まらない関数すべてが対象。
+    """
+    if names is None:
+        names = [
+            name for name, fn in inspect.getmembers(module, inspect.isfunction)
+            if fn.__module__ == module.__name__ and not name.startswith('_')
+        ]
+    for name in names:
+        fn = getattr(module, name)
+        if name in exclude or getattr(fn, '_instrumented', False):
+            continue
+        wrapper = _observe_call(fn, name, histogram, errors, in_flight, slow_threshold)
+        wrapper._instrumented = True
+        setattr(module, name, wrapper)
+
+
+def instrument_database(db, slow_threshold=SLOW_QUERY_THRESHOLD):
+    """database.py の関数とコネクションプールの待ち時間を計測"""
+    # 接続の取得やwithで使うものはラップすると計測の意味がなくなるので除く
+    instrument_functions(
+        db, DB_CALL_SECONDS, DB_CALL_ERRORS, DB_IN_FLIGHT,
+        exclude=('connection', 'transaction', 'get_connection', 'get_pool', 'close_pool', 'snapshot_fingerprint'),
+        slow_threshold=slow_threshold
+    )
+    acquire = db.ConnectionPool.acquire
+    if not getattr(acquire, '_instrumented', False):
+        @functools.wraps(acquire)
+        def timed_acquire(self):
+            start = time.perf_counter()
+            try:
+                return acquire(self)
+            finally:
+                DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+        timed_acquire._instrumented = True
+        db.ConnectionPool.acquire = timed_acquire
+
+    def pool_connections():
+        pool = db._pool
+        if pool is None:
+            return {}
+        idle = pool._idle.qsize()
+        return {('idle',): idle, ('in_use',): pool._created - idle}
+
+    DB_POOL_CONNECTIONS.function = pool_connections
+
+
+def instrument_session(session):
+    """requests.Session（非同期モードでは httpx.AsyncClient）の get を計測用のラッパーに差し替える"""
+    get = session.get
+    if getattr(get, '_instrumented', False):
+        return
+
+    if inspect.iscoroutinefunction(get):
+        @functools.wraps(get)
+        async def timed_async_get(*args, **kwargs):
+            UPSTREAM_IN_FLIGHT.inc()
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = await get(*args, **kwargs)
+                status = str(response.status_code)
+                return response
+            finally:
+                UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, status)
+                UPSTREAM_IN_FLIGHT.dec()
+        timed_async_get._instrumented = True
+        session.get = timed_async_get
+        return
+
+    @functools.wraps(get)
+    def timed_get(*args, **kwargs):
+        UPSTREAM_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = get(*args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, status)
+            UPSTREAM_IN_FLIGHT.dec()
+    timed_get._instrumented = True
+    session.get = timed_get
+
+
+def instrument_jma(jma, cache=None):
+    """気象庁APIの取得・解析関数、上流へのHTTPリクエスト、レスポンスキャッシュの統計を計測
+
+    cache は統計を公開するレスポンスキャッシュ（省略時は jma.jma_cache、非同期モードでは jma.async_cache）。
+    """
+    cache = cache or jma.jma_cache
+    instrument_functions(
+        jma, JMA_CALL_SECONDS, JMA_CALL_ERRORS, JMA_IN_FLIGHT,
+        names=('fetch_and_save_areas', 'fetch_forecast', 'fetch_and_save_areas_async', 'fetch_forecast_async',
+               'parse_and_save_forecast', 'load_fresh_forecast')
+    )
+    instrument_session(cache.session)
+
+    def cache_results():
+        stats = cache.stats()
+        return {(result,): stats[result] for result in ('hits', 'revalidated', 'misses')}
+
+    UPSTREAM_CACHE_RESULTS.function = cache_results
+
+
+def instrument_app(app):
+    """Flaskアプリのリクエストごとの処理時間と同時処理数を計測"""
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g._metrics_start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    # teardown は例外時も必ず呼ばれ、gzip圧縮など他の after_request の後に実行される
+    @app.teardown_request
+    def stop_timer(exc):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return
+        HTTP_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        status = g.pop('_metrics_status', 500)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route, str(status))
+
+
+class ASGIMetricsMiddleware:
+    """ASGIアプリのリクエストごとの処理時間と同時処理数を計測（instrument_app の非同期モード版）
+
+    ストリーミング応答は本文の送信が終わるまでを計測する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get('route')
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope['method'],
+                route.path if route is not None else '<unmatched>', str(status)
+            )
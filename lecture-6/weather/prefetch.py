@@ -0,0 +1,139 @@
+"""
+全官署の天気予報をバックグラウンドで先読みする
+
+areasテーブルの官署一覧を読み、上限付きのスレッドプールで並行に取得してDBに保存する。
+気象庁の定時発表（5時・11時・17時 JST）の少し後に実行するので、
+利用者のリクエストには保存済み（キャッシュ済み）のデータで応答できる。
+
+使い方:
+    python prefetch.py --once          # 1回だけ実行
+    python prefetch.py --workers 16    # 発表時刻に合わせて繰り返し実行
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import database as db
+import jma
+from freshness import JST, PUBLICATION_HOURS
+
+PREFETCH_DELAY = timedelta(minutes=10)   # 発表から配信までの遅れを見込んだ待ち時間
+MAX_WORKERS = 8                          # 気象庁への同時リクエスト数の上限
+
+
+def next_run_time(now: datetime = None) -> datetime:
+    """次に先読みを実行する時刻（次の定時発表 + PREFETCH_DELAY）"""
+    now = (now or datetime.now(JST)).astimezone(JST)
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    for offset in (0, 1):
+        for hour in PUBLICATION_HOURS:
+            candidate = day + timedelta(days=offset, hours=hour) + PREFETCH_DELAY
+            if candidate > now:
+                return candidate
+
+
+def _fetch_one(area_code: str):
+    start = time.perf_counter()
+    jma.fetch_forecast(area_code, revalidate=True)
+    return time.perf_counter() - start
+
+
+def prefetch_all(max_workers: int = MAX_WORKERS) -> dict:
+    """全官署の予報を並行に取得してDBに保存し、実行結果のレポートを返す"""
+    started_at = datetime.now(JST)
+    start = time.perf_counter()
+    
+    area_codes = [area['area_code'] for area in db.get_all_areas()]
+    if not area_codes:
+        jma.fetch_and_save_areas(revalidate=True)
+        area_codes = [area['area_code'] for area in db.get_all_areas()]
+    
+    durations = []
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch') as executor:
+        futures = {executor.submit(_fetch_one, code): code for code in area_codes}
+        for future in as_completed(futures):
+            try:
+                durations.append(future.result())
+            except Exception as e:
+                failed[futures[future]] = str(e)
+    
+    durations.sort()
+    return {
+        'started_at': started_at.isoformat(),
+        'areas': len(area_codes),
+        'succeeded': len(durations),
+        'failed': failed,
+        'elapsed': round(time.perf_counter() - start, 3),
+        'fetch_p50': round(statistics.median(durations), 3) if durations else None,
+        'fetch_max': round(durations[-1], 3) if durations else None,
+    }
+
+
+def format_report(report: dict) -> str:
+    """レポートを1行の文字列にする"""
+    line = (f"[prefetch] {report['started_at']} areas={report['areas']} "
+            f"ok={report['succeeded']} failed={len(report['failed'])} "
+            f"elapsed={report['elapsed']}s p50={report['fetch_p50']}s max={report['fetch_max']}s")
+    for code, error in sorted(report['failed'].items()):
+        line += f"\n  {code}: {error}"
+    return line
+
+
+def _run_once(max_workers: int):
+    # 1回の失敗（官署一覧の取得・DB・ネットワークのエラー）でスケジュールを止めない
+    try:
+        print(format_report(prefetch_all(max_workers)))
+    except Exception as e:
+        print(f'[prefetch] failed: {e}')
+
+
+def run_forever(max_workers: int = MAX_WORKERS, stop_event: threading.Event = None,
+                run_now: bool = True):
+    """定時発表に合わせて先読みを繰り返す（stop_eventがセットされるまで。失敗した回は記録して次の発表を待つ）"""
+    stop_event = stop_event or threading.Event()
+    if run_now:
+        _run_once(max_workers)
+    while not stop_event.is_set():
+        wait = (next_run_time() - datetime.now(JST)).total_seconds()
+        if stop_event.wait(max(wait, 0)):
+            break
+        _run_once(max_workers)
+
+
+def start_background(max_workers: int = MAX_WORKERS) -> threading.Event:
+    """サーバーと同じプロセスで先読みを開始（戻り値のEventをセットすると停止）"""
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_forever, args=(max_workers, stop_event),
+        name='prefetch-scheduler', daemon=True
+    )
+    thread.start()
+    return stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全官署の天気予報を先読みしてDBに保存')
+    parser.add_argument('--once', action='store_true', help='1回だけ実行して終了')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='同時リクエスト数の上限')
+    args = parser.parse_args()
+    
+    db.init_database()
+    try:
+        if args.once:
+            report = prefetch_all(args.workers)
+            print(format_report(report))
+            raise SystemExit(1 if report['failed'] else 0)
+        run_forever(args.workers)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close_pool()
+
+
+if __name__ == '__main__':
+    main()
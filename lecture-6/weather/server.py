@@ -3,242 +3,233 @@
 Flask + SQLiteでバックエンドを構築
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import requests
+import atexit
+import os
 from datetime import datetime
+import area_index
 import database as db
+import export
+import http_cache
+import jma
+import metrics
 
 app = Flask(__name__)
 CORS(app)  # フロントエンドからのアクセスを許可
 
-# 気象庁API
-JMA_AREA_URL = 'https://www.jma.go.jp/bosai/common/const/area.json'
-JMA_FORECAST_URL = 'https://www.jma.go.jp/bosai/forecast/data/forecast/{}.json'
+# プロセス終了時にDBコネクションプールを閉じる
+atexit.register(db.close_pool)
+
+# リクエスト・DB・気象庁APIの処理時間を計測して /metrics で公開（WEATHER_METRICS=0 で無効）
+METRICS_ENABLED = os.environ.get('WEATHER_METRICS', '1') != '0'
+if METRICS_ENABLED:
+    metrics.instrument_app(app)
+    metrics.instrument_database(db)
+    metrics.instrument_jma(jma)
+
+
+@app.after_request
+def compress_response(response):
+    """大きなJSONレスポンスをgzip圧縮"""
+    return http_cache.gzip_response(response)
 
 
 @app.route('/api/areas', methods=['GET'])
 def get_areas():
-    """エリア一覧を取得（DBから、なければAPIから取得してDBに保存）"""
-    areas = db.get_all_areas()
+    """エリア（官署）一覧を取得（メモリ上の索引から、DBが空ならAPIから取得してDBに保存）"""
+    index = area_index.get()
     
-    if not areas:
+    if not index.offices:
         # DBにデータがない場合、APIから取得して保存
         try:
-            response = requests.get(JMA_AREA_URL)
-            response.raise_for_status()
-            data = response.json()
-            
-            offices = data.get('offices', {})
-            area_list = [(code, info['name']) for code, info in offices.items()]
-            db.save_areas_batch(area_list)
-            
-            areas = db.get_all_areas()
+            # DBが空なのでキャッシュを捨てて本文を取り直す
+            jma.jma_cache.invalidate(jma.JMA_AREA_URL)
+            jma.fetch_and_save_areas()
+            index = area_index.get()
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
-    return jsonify(areas)
+    return jsonify(index.offices)
+
+
+@app.route('/api/areas/search', methods=['GET'])
+def search_areas():
+    """地域名・地域コードでエリアを検索（全階層、親・子の地域コード付き）
+
+    クエリパラメータ:
+    - q: 検索語（必須）
+    - match: prefix（前方一致）/ substring（部分一致、デフォルト）
+    - level: center / office / class10 で絞り込む（省略時は全階層）
+    - limit: 最大件数（デフォルト20、最大 area_index.MAX_SEARCH_LIMIT）
+    """
+    query = request.args.get('q', '')
+    match = request.args.get('match', 'substring')
+    level = request.args.get('level')
+    if not query.strip():
+        return jsonify({'error': 'q is required'}), 400
+    if match not in area_index.MATCH_MODES:
+        return jsonify({'error': f'Unknown match: {match}'}), 400
+    if level is not None and level not in area_index.LEVELS:
+        return jsonify({'error': f'Unknown level: {level}'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), area_index.MAX_SEARCH_LIMIT))
+
+    results = area_index.get().search(query, match, level, limit)
+    return jsonify([area.to_dict() for area in results])
 
 
 @app.route('/api/areas/refresh', methods=['POST'])
 def refresh_areas():
-    """エリア情報をAPIから再取得してDBを更新"""
+    """エリア情報をAPIから再取得してDBを更新（索引もDBから作り直す）"""
     try:
-        response = requests.get(JMA_AREA_URL)
-        response.raise_for_status()
-        data = response.json()
-        
-        offices = data.get('offices', {})
-        area_list = [(code, info['name']) for code, info in offices.items()]
-        db.save_areas_batch(area_list)
-        
-        return jsonify({'message': 'Areas refreshed', 'count': len(area_list)})
+        count = jma.fetch_and_save_areas(revalidate=True)
+        area_index.invalidate()
+        return jsonify({'message': 'Areas refreshed', 'count': count})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/forecast/<area_code>', methods=['GET'])
 def get_forecast(area_code):
-    """天気予報を取得（APIから取得してDBに保存し、DBから返す）"""
+    """天気予報を取得（保存済みの予報が最新の定時発表のものならDBから、そうでなければAPIから取得してDBに保存）
+
+    ?force=1 なら保存済みの予報・上流のキャッシュを使わずに気象庁APIに問い合わせる。
+    応答の X-Forecast-Source ヘッダーは db / upstream のどちらから返したか。
+    """
+    force = request.args.get('force') == '1'
     try:
-        # 気象庁APIから最新データを取得
-        response = requests.get(JMA_FORECAST_URL.format(area_code))
-        response.raise_for_status()
-        data = response.json()
+        if not force:
+            forecast_data = jma.load_fresh_forecast(area_code)
+            if forecast_data is not None:
+                return jsonify(forecast_data), {'X-Forecast-Source': 'db'}
         
-        # データを解析してDBに保存
-        forecast_data = parse_and_save_forecast(area_code, data)
+        # 気象庁APIから最新データを取得し、解析してDBに保存
+        forecast_data = jma.fetch_forecast(area_code, revalidate=force)
         
-        return jsonify(forecast_data)
+        return jsonify(forecast_data), {'X-Forecast-Source': 'upstream'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/upstream/stats', methods=['GET'])
+def get_upstream_stats():
+    """気象庁APIキャッシュの統計情報を取得"""
+    return jsonify(jma.jma_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """計測値をPrometheus形式で取得"""
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/forecast/<area_code>/latest', methods=['GET'])
 def get_latest_forecast(area_code):
-    """DBから最新の予報を取得"""
-    forecasts = db.get_latest_forecast(area_code)
-    weekly = db.get_latest_weekly_forecast(area_code)
+    """DBから最新の予報を取得（最新スナップショットが変わっていなければ304）"""
+    return http_cache.conditional_json(
+        ('latest', area_code, *db.get_latest_snapshot_version(area_code)),
+        lambda: {
+            'forecasts': db.get_latest_forecast(area_code),
+            'weekly': db.get_latest_weekly_forecast(area_code)
+        }
+    )
+
+
+MAX_BATCH_AREAS = 500  # 1回のバッチ取得で指定できる地域数の上限
+
+
+@app.route('/api/forecasts/latest', methods=['GET'])
+def get_latest_forecasts_batch():
+    """複数地域の最新予報をまとめて取得（?areas=130000,270000 または ?areas=all）
+
+    レスポンスは {地域コード: {'forecasts': [...], 'weekly': [...]}} で、
+    地域ごとにシリアライズしながらストリーミングで返す。データのない地域は含まない。
+    """
+    areas_param = request.args.get('areas', 'all')
+    if areas_param == 'all':
+        area_codes = None
+    else:
+        area_codes = list(dict.fromkeys(code.strip() for code in areas_param.split(',') if code.strip()))
+        if not area_codes:
+            return jsonify({'error': 'areas is empty'}), 400
+        if len(area_codes) > MAX_BATCH_AREAS:
+            return jsonify({'error': f'Too many areas (max {MAX_BATCH_AREAS})'}), 400
+    
+    def generate():
+        yield '{'
+        for i, (area_code, forecasts, weekly) in enumerate(db.iter_latest_forecasts_bulk(area_codes)):
+            body = app.json.dumps({'forecasts': forecasts, 'weekly': weekly})
+            yield f'{"," if i else ""}{app.json.dumps(area_code)}:{body}'
+        yield '}'
     
-    return jsonify({
-        'forecasts': forecasts,
-        'weekly': weekly
-    })
+    return Response(generate(), mimetype='application/json')
 
 
 @app.route('/api/forecast/<area_code>/history', methods=['GET'])
 def get_forecast_history(area_code):
     """過去の予報履歴を取得"""
     limit = request.args.get('limit', 10, type=int)
-    history = db.get_forecast_history(area_code, limit)
-    return jsonify(history)
+    return http_cache.conditional_json(
+        ('history', area_code, limit, *db.get_history_version(area_code)),
+        lambda: db.get_forecast_history(area_code, limit)
+    )
 
 
 @app.route('/api/forecast/<area_code>/history/<fetched_at>', methods=['GET'])
 def get_historical_forecast(area_code, fetched_at):
-    """特定の日時の予報を取得"""
-    forecasts = db.get_forecast_by_fetched_at(area_code, fetched_at)
-    return jsonify(forecasts)
-
-
-def parse_and_save_forecast(area_code: str, data: list) -> dict:
-    """気象庁APIのレスポンスを解析してDBに保存"""
-    result = {
-        'today': None,
-        'tomorrow': None,
-        'weekly': [],
-        'report_datetime': None,
-        'area_name': None
-    }
-    
-    if len(data) < 1:
-        return result
+    """特定の日時の予報を取得（スナップショットは変更されないので長めにキャッシュさせる）"""
+    exists = db.forecast_snapshot_exists(area_code, fetched_at)
+    return http_cache.conditional_json(
+        ('snapshot', area_code, fetched_at, exists),
+        lambda: db.get_forecast_by_fetched_at(area_code, fetched_at),
+        http_cache.SNAPSHOT_CACHE if exists else http_cache.NO_CACHE
+    )
+
+
+@app.route('/api/export', methods=['GET'])
+def export_history():
+    """予報履歴をNDJSON / CSVでストリーミング出力
+
+    クエリパラメータ: table（forecasts / weekly_forecasts）, format（ndjson / csv）,
+    area, date_from, date_to, fetched_from, fetched_to
+    """
+    table = request.args.get('table', 'forecasts')
+    fmt = request.args.get('format', 'ndjson')
+    if table not in db.EXPORT_TABLES:
+        return jsonify({'error': f'Unknown table: {table}'}), 400
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
     
-    forecast = data[0]
-    result['report_datetime'] = forecast.get('reportDatetime', '')
-    
-    # 今日・明日の予報を解析
-    time_series = forecast.get('timeSeries', [])
-    if len(time_series) >= 1:
-        weather_ts = time_series[0]
-        time_defines = weather_ts.get('timeDefines', [])
-        areas = weather_ts.get('areas', [])
-        
-        if areas:
-            area = areas[0]
-            result['area_name'] = area.get('area', {}).get('name', '')
-            weather_codes = area.get('weatherCodes', [])
-            weathers = area.get('weathers', [])
-            winds = area.get('winds', [])
-            
-            # 降水確率
-            pops = []
-            if len(time_series) > 1:
-                pop_areas = time_series[1].get('areas', [])
-                if pop_areas:
-                    pops = pop_areas[0].get('pops', [])
-            
-            # 気温
-            temps = []
-            if len(time_series) > 2:
-                temp_areas = time_series[2].get('areas', [])
-                if temp_areas:
-                    temps = temp_areas[0].get('temps', [])
-            
-            # 今日の予報
-            if len(time_defines) > 0:
-                today_date = time_defines[0][:10]
-                today_weather_code = weather_codes[0] if weather_codes else ''
-                today_weather_text = weathers[0] if weathers else ''
-                today_wind = winds[0] if winds else ''
-                today_pop = max([int(p) for p in pops[:4] if p], default=0) if pops else ''
-                today_temp_min = temps[0] if len(temps) > 0 else ''
-                today_temp_max = temps[1] if len(temps) > 1 else ''
-                
-                db.save_forecast(
-                    area_code, today_date, today_weather_code, today_weather_text,
-                    str(today_temp_min), str(today_temp_max), str(today_pop),
-                    today_wind, result['report_datetime']
-                )
-                
-                result['today'] = {
-                    'date': today_date,
-                    'weather_code': today_weather_code,
-                    'weather_text': today_weather_text,
-                    'temp_min': today_temp_min,
-                    'temp_max': today_temp_max,
-                    'pop': today_pop,
-                    'wind': today_wind
-                }
-            
-            # 明日の予報
-            if len(time_defines) > 1:
-                tomorrow_date = time_defines[1][:10]
-                tomorrow_weather_code = weather_codes[1] if len(weather_codes) > 1 else ''
-                tomorrow_weather_text = weathers[1] if len(weathers) > 1 else ''
-                tomorrow_wind = winds[1] if len(winds) > 1 else ''
-                tomorrow_pop = max([int(p) for p in pops[4:8] if p], default=0) if len(pops) > 4 else ''
-                
-                result['tomorrow'] = {
-                    'date': tomorrow_date,
-                    'weather_code': tomorrow_weather_code,
-                    'weather_text': tomorrow_weather_text,
-                    'pop': tomorrow_pop,
-                    'wind': tomorrow_wind
-                }
-    
-    # 週間予報を解析
-    if len(data) > 1:
-        weekly_data = data[1]
-        weekly_ts = weekly_data.get('timeSeries', [])
-        
-        if weekly_ts:
-            time_defines = weekly_ts[0].get('timeDefines', [])
-            areas = weekly_ts[0].get('areas', [])
-            
-            if areas:
-                area = areas[0]
-                weather_codes = area.get('weatherCodes', [])
-                pops = area.get('pops', [])
-                reliabilities = area.get('reliabilities', [])
-                
-                # 気温データ
-                temp_mins = []
-                temp_maxs = []
-                if len(weekly_ts) > 1:
-                    temp_areas = weekly_ts[1].get('areas', [])
-                    if temp_areas:
-                        temp_mins = temp_areas[0].get('tempsMin', [])
-                        temp_maxs = temp_areas[0].get('tempsMax', [])
-                
-                for i, date in enumerate(time_defines):
-                    forecast_date = date[:10]
-                    weather_code = weather_codes[i] if i < len(weather_codes) else ''
-                    pop = pops[i] if i < len(pops) else ''
-                    reliability = reliabilities[i] if i < len(reliabilities) else ''
-                    temp_min = temp_mins[i] if i < len(temp_mins) else ''
-                    temp_max = temp_maxs[i] if i < len(temp_maxs) else ''
-                    
-                    db.save_weekly_forecast(
-                        area_code, forecast_date, weather_code,
-                        str(pop), str(temp_min), str(temp_max), reliability
-                    )
-                    
-                    result['weekly'].append({
-                        'date': forecast_date,
-                        'weather_code': weather_code,
-                        'pop': pop,
-                        'temp_min': temp_min,
-                        'temp_max': temp_max,
-                        'reliability': reliability
-                    })
-    
-    return result
+    chunks = export.export(
+        table, fmt,
+        area_code=request.args.get('area'),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        fetched_from=request.args.get('fetched_from'),
+        fetched_to=request.args.get('fetched_to')
+    )
+    response = Response(chunks, mimetype=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    return response
 
 
 if __name__ == '__main__':
-    # データベース初期化
+    # データベース初期化・エリアの索引の作成
     db.init_database()
+    area_index.get()
+    
+    # WEATHER_PREFETCH=1 なら全官署の予報をバックグラウンドで先読み
+    # WEATHER_MAINTENANCE=1 なら予報履歴の間引きを1日1回実行
+    # （debugモードのリローダーでは子プロセスでのみ起動する）
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if os.environ.get('WEATHER_PREFETCH') == '1':
+            import prefetch
+            prefetch.start_background()
+        if os.environ.get('WEATHER_MAINTENANCE') == '1':
+            import maintenance
+            maintenance.start_background()
     
     # サーバー起動
     print("Starting Weather API Server...")
@@ -0,0 +1,304 @@
+"""
+天気予報アプリケーション用APIサーバー（非同期モード）
+Starlette + uvicorn で server.py と同じAPIを提供する
+
+- 気象庁APIへの取得は httpx.AsyncClient（Keep-Alive）で行い、応答待ちの間スレッドを占有しない。
+  同時に数千件の遅い上流リクエストを1プロセスで待てる
+- SQLiteの処理（DB関数・解析と保存）は専用のスレッドプール DB_EXECUTOR で実行する
+  （スレッド数はコネクションプールと同じなので、接続待ちが起きない）
+
+起動:
+    python server_async.py
+    uvicorn server_async:app --port 5001
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import area_index
+import database as db
+import export
+import http_cache
+import jma
+import metrics
+from upstream import AsyncUpstreamCache
+
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=max(db.POOL_SIZE, 1), thread_name_prefix='sqlite')
+METRICS_ENABLED = os.environ.get('WEATHER_METRICS', '1') != '0'
+MAX_BATCH_AREAS = 500  # 1回のバッチ取得で指定できる地域数の上限
+
+
+async def run_db(fn, *args):
+    """ブロックする処理（DB関数など）を DB_EXECUTOR で実行して結果を待つ"""
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, fn, *args)
+
+
+async def iterate_in_executor(iterator, batch_size: int = 64):
+    """同期イテレーター（DBのカーソルを読むジェネレーター）を DB_EXECUTOR で batch_size 件ずつ進める
+
+    1回ずつスレッドを切り替えると遅いので、まとめて取り出してから返す。
+    """
+    def next_batch():
+        batch = []
+        for item in iterator:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                break
+        return batch
+
+    try:
+        while True:
+            batch = await run_db(next_batch)
+            if not batch:
+                return
+            for item in batch:
+                yield item
+    finally:
+        # 途中で切断されたときもカーソル（とプールの接続）を返す
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await run_db(close)
+
+
+def error(message: str, status_code: int):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+async def conditional_json(request, version_fn, build, cache_control: str = http_cache.NO_CACHE):
+    """http_cache.conditional_json の非同期版（版の取得・本文の作成は DB_EXECUTOR で実行）"""
+    version = await run_db(version_fn)
+    etag = http_cache.make_etag(*version)
+    headers = {'ETag': f'W/"{etag}"', 'Cache-Control': cache_control}
+    if http_cache.etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(await run_db(build), headers=headers)
+
+
+async def get_areas(request):
+    """エリア（官署）一覧を取得（メモリ上の索引から、DBが空ならAPIから取得してDBに保存）"""
+    index = await run_db(area_index.get)
+
+    if not index.offices:
+        try:
+            # DBが空なのでキャッシュを捨てて本文を取り直す
+            jma.async_cache.invalidate(jma.JMA_AREA_URL)
+            await jma.fetch_and_save_areas_async()
+            index = await run_db(area_index.get)
+        except Exception as e:
+            return error(str(e), 500)
+
+    return JSONResponse(index.offices)
+
+
+async def search_areas(request):
+    """地域名・地域コードでエリアを検索（パラメータは server.py と同じ）"""
+    params = request.query_params
+    query = params.get('q', '')
+    match = params.get('match', 'substring')
+    level = params.get('level')
+    if not query.strip():
+        return error('q is required', 400)
+    if match not in area_index.MATCH_MODES:
+        return error(f'Unknown match: {match}', 400)
+    if level is not None and level not in area_index.LEVELS:
+        return error(f'Unknown level: {level}', 400)
+    try:
+        limit = int(params.get('limit', 20))
+    except ValueError:
+        limit = 20
+    limit = max(1, min(limit, area_index.MAX_SEARCH_LIMIT))
+
+    # 索引の作成（初回・無効化の直後）だけDBを読む
+    index = await run_db(area_index.get)
+    return JSONResponse([area.to_dict() for area in index.search(query, match, level, limit)])
+
+
+async def refresh_areas(request):
+    """エリア情報をAPIから再取得してDBを更新（索引もDBから作り直す）"""
+    try:
+        count = await jma.fetch_and_save_areas_async(revalidate=True)
+        area_index.invalidate()
+        return JSONResponse({'message': 'Areas refreshed', 'count': count})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_forecast(request):
+    """天気予報を取得（保存済みの予報が最新の定時発表のものならDBから。?force=1 は server.py と同じ）"""
+    area_code = request.path_params['area_code']
+    force = request.query_params.get('force') == '1'
+    try:
+        if not force:
+            forecast_data = await run_db(jma.load_fresh_forecast, area_code)
+            if forecast_data is not None:
+                return JSONResponse(forecast_data, headers={'X-Forecast-Source': 'db'})
+        forecast_data = await jma.fetch_forecast_async(area_code, revalidate=force)
+        return JSONResponse(forecast_data, headers={'X-Forecast-Source': 'upstream'})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_upstream_stats(request):
+    """気象庁APIキャッシュの統計情報を取得"""
+    return JSONResponse(jma.async_cache.stats())
+
+
+async def get_metrics(request):
+    """計測値をPrometheus形式で取得"""
+    if not METRICS_ENABLED:
+        return error('Metrics are disabled', 404)
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+async def get_latest_forecast(request):
+    """DBから最新の予報を取得（最新スナップショットが変わっていなければ304）"""
+    area_code = request.path_params['area_code']
+    return await conditional_json(
+        request,
+        lambda: ('latest', area_code, *db.get_latest_snapshot_version(area_code)),
+        lambda: {
+            'forecasts': db.get_latest_forecast(area_code),
+            'weekly': db.get_latest_weekly_forecast(area_code)
+        }
+    )
+
+
+async def get_latest_forecasts_batch(request):
+    """複数地域の最新予報をまとめて取得（?areas=130000,270000 または ?areas=all）"""
+    areas_param = request.query_params.get('areas', 'all')
+    if areas_param == 'all':
+        area_codes = None
+    else:
+        area_codes = list(dict.fromkeys(code.strip() for code in areas_param.split(',') if code.strip()))
+        if not area_codes:
+            return error('areas is empty', 400)
+        if len(area_codes) > MAX_BATCH_AREAS:
+            return error(f'Too many areas (max {MAX_BATCH_AREAS})', 400)
+
+    def generate():
+        yield '{'
+        for i, (area_code, forecasts, weekly) in enumerate(db.iter_latest_forecasts_bulk(area_codes)):
+            body = json.dumps({'forecasts': forecasts, 'weekly': weekly}, ensure_ascii=False)
+            yield f'{"," if i else ""}{json.dumps(area_code)}:{body}'
+        yield '}'
+
+    return StreamingResponse(iterate_in_executor(generate()), media_type='application/json')
+
+
+async def get_forecast_history(request):
+    """過去の予報履歴を取得"""
+    area_code = request.path_params['area_code']
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        limit = 10
+    return await conditional_json(
+        request,
+        lambda: ('history', area_code, limit, *db.get_history_version(area_code)),
+        lambda: db.get_forecast_history(area_code, limit)
+    )
+
+
+async def get_historical_forecast(request):
+    """特定の日時の予報を取得（スナップショットは変更されないので長めにキャッシュさせる）"""
+    area_code = request.path_params['area_code']
+    fetched_at = request.path_params['fetched_at']
+    exists = await run_db(db.forecast_snapshot_exists, area_code, fetched_at)
+    return await conditional_json(
+        request,
+        lambda: ('snapshot', area_code, fetched_at, exists),
+        lambda: db.get_forecast_by_fetched_at(area_code, fetched_at),
+        http_cache.SNAPSHOT_CACHE if exists else http_cache.NO_CACHE
+    )
+
+
+async def export_history(request):
+    """予報履歴をNDJSON / CSVでストリーミング出力（パラメータは server.py と同じ）"""
+    params = request.query_params
+    table = params.get('table', 'forecasts')
+    fmt = params.get('format', 'ndjson')
+    if table not in db.EXPORT_TABLES:
+        return error(f'Unknown table: {table}', 400)
+    if fmt not in export.FORMATS:
+        return error(f'Unknown format: {fmt}', 400)
+
+    chunks = export.export(
+        table, fmt,
+        area_code=params.get('area'),
+        date_from=params.get('date_from'),
+        date_to=params.get('date_to'),
+        fetched_from=params.get('fetched_from'),
+        fetched_to=params.get('fetched_to')
+    )
+    return StreamingResponse(
+        iterate_in_executor(chunks, batch_size=4),
+        media_type=export.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'}
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """起動時に非同期用の上流キャッシュを作り、終了時に接続とプールを閉じる"""
+    jma.async_cache = AsyncUpstreamCache(executor=DB_EXECUTOR)
+    if METRICS_ENABLED:
+        metrics.instrument_database(db)
+        metrics.instrument_jma(jma, jma.async_cache)
+    await run_db(db.init_database)
+    await run_db(area_index.get)
+    try:
+        yield
+    finally:
+        await jma.async_cache.aclose()
+        await run_db(db.close_pool)
+
+
+routes = [
+    Route('/api/areas', get_areas, methods=['GET']),
+    Route('/api/areas/search', search_areas, methods=['GET']),
+    Route('/api/areas/refresh', refresh_areas, methods=['POST']),
+    Route('/api/forecast/{area_code}', get_forecast, methods=['GET']),
+    Route('/api/upstream/stats', get_upstream_stats, methods=['GET']),
+    Route('/metrics', get_metrics, methods=['GET']),
+    Route('/api/forecast/{area_code}/latest', get_latest_forecast, methods=['GET']),
+    Route('/api/forecasts/latest', get_latest_forecasts_batch, methods=['GET']),
+    Route('/api/forecast/{area_code}/history', get_forecast_history, methods=['GET']),
+    Route('/api/forecast/{area_code}/history/{fetched_at}', get_historical_forecast, methods=['GET']),
+    Route('/api/export', export_history, methods=['GET']),
+]
+
+middleware = [
+    Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    Middleware(GZipMiddleware, minimum_size=http_cache.GZIP_MIN_SIZE, compresslevel=http_cache.GZIP_LEVEL),
+]
+if METRICS_ENABLED:
+    middleware.insert(0, Middleware(metrics.ASGIMetricsMiddleware))
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    db.init_database()
+    
+    # WEATHER_PREFETCH=1 / WEATHER_MAINTENANCE=1 の動作は server.py と同じ
+    if os.environ.get('WEATHER_PREFETCH') == '1':
+        import prefetch
+        prefetch.start_background()
+    if os.environ.get('WEATHER_MAINTENANCE') == '1':
+        import maintenance
+        maintenance.start_background()
+
+    print("Starting Weather API Server (async)...")
+    uvicorn.run(app, port=5001)
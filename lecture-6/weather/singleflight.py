@@ -0,0 +1,97 @@
+"""
+同じキーへの同時リクエストを1回の処理にまとめる（single-flight）
+
+最初の呼び出し元（リーダー）だけが処理を実行し、実行中に来た他の呼び出し元は
+その完了を待って同じ結果（または同じ例外）を受け取る。
+AsyncSingleFlight は asyncio 用（同じイベントループ内のコルーチンをまとめる）。
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """キーごとに実行中の処理を1つに保つ"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout: float = None):
+        """fn() を実行して結果を返す（同じキーが実行中ならその結果を待って共有する）
+
+        待機側は timeout 秒を超えると TimeoutError を送出する（実行中の処理は止めない）。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise TimeoutError(f'Timed out waiting for in-flight request: {key}')
+        
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        """実行中のキーの数"""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight の asyncio 版（ロックは不要。イベントループのスレッドからだけ使う）"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, timeout: float = None):
+        """await fn() の結果を返す（同じキーが実行中ならその結果を待って共有する）"""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._calls[key] = future
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # 待機側がいなくても「未取得の例外」の警告を出さない
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                del self._calls[key]
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f'Timed out waiting for in-flight request: {key}') from None
+
+    def in_flight(self) -> int:
+        """実行中のキーの数"""
+        return len(self._calls)
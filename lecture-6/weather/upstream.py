@@ -0,0 +1,175 @@
+"""
+気象庁APIへのリクエストをキャッシュする層
+
+- URLをキーに、取得結果をTTL秒間そのまま返す
+- TTL切れ後は If-None-Match / If-Modified-Since で再検証し、
+  304なら保存済みの結果を返す（JSONの解析やDB保存は行わない）
+- 保持件数の上限を超えたら最も長く使われていないもの（LRU）から捨てる
+- AsyncUpstreamCache は同じ動作の非同期版（httpx を使用）
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+CACHE_TTL = float(os.environ.get('JMA_CACHE_TTL', 300))          # 秒
+CACHE_MAX_ENTRIES = int(os.environ.get('JMA_CACHE_MAX_ENTRIES', 256))
+REQUEST_TIMEOUT = 10  # 秒
+
+
+class _Entry:
+    __slots__ = ('value', 'etag', 'last_modified', 'expires_at')
+
+    def __init__(self, value, etag, last_modified, expires_at):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+class UpstreamCache:
+    """TTL + 条件付きGET + LRUのキャッシュ"""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 session: requests.Session = None, timeout: float = REQUEST_TIMEOUT,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session = session or requests.Session()  # Keep-Aliveで接続を使い回す
+        self.timeout = timeout
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0          # TTL内でネットワークに出なかった回数
+        self.revalidated = 0   # 304で保存済みの結果を返した回数
+        self.misses = 0        # 本文を取得してtransformを実行した回数
+
+    def get(self, url: str, transform=None, revalidate: bool = False):
+        """URLの取得結果を返す
+
+        transform(response) は本文を取得したとき（200）だけ呼ばれ、
+        その戻り値がキャッシュされる。省略時は response.json()。
+        revalidate=True ならTTL内でも条件付きGETで再検証する。
+        """
+        if transform is None:
+            transform = _json
+        
+        entry, fresh, headers = self._lookup(url, revalidate)
+        if fresh:
+            return entry.value
+        
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304 and entry is not None:
+            return self._not_modified(entry)
+        
+        response.raise_for_status()
+        value = transform(response)
+        self._store(url, response, value)
+        return value
+
+    def _lookup(self, url: str, revalidate: bool):
+        """(エントリー, TTL内か, 再検証用のリクエストヘッダー) を返す"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                if not revalidate and self.clock() < entry.expires_at:
+                    self.hits += 1
+                    return entry, True, None
+        
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return entry, False, headers
+
+    def _not_modified(self, entry):
+        """304のとき: 保存済みの結果の有効期限を延ばして返す"""
+        with self._lock:
+            entry.expires_at = self.clock() + self.ttl
+            self.revalidated += 1
+        return entry.value
+
+    def _store(self, url: str, response, value):
+        """本文を取得したとき: 結果を保存し、上限を超えたら古いものから捨てる"""
+        with self._lock:
+            self._entries[url] = _Entry(
+                value,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                self.clock() + self.ttl,
+            )
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+
+    def invalidate(self, url: str = None):
+        """キャッシュを破棄（url省略時は全件）"""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+    def stats(self) -> dict:
+        """ヒット・ミス回数などの統計情報"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+            }
+
+
+class AsyncUpstreamCache(UpstreamCache):
+    """UpstreamCache の非同期版（非同期サーバー server_async.py 用）
+
+    httpx.AsyncClient でKeep-Aliveしながら取得するので、上流の応答を待つ間スレッドを占有しない。
+    transform（JSONの解析・DB保存）はブロックするので executor で実行する。
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 client=None, timeout: float = REQUEST_TIMEOUT, clock=time.monotonic,
+                 executor=None):
+        if client is None:
+            import httpx  # 非同期モードでだけ必要
+            client = httpx.AsyncClient(limits=httpx.Limits(max_connections=None, max_keepalive_connections=100))
+        super().__init__(ttl, max_entries, client, timeout, clock)
+        self.executor = executor
+
+    async def get(self, url: str, transform=None, revalidate: bool = False):
+        """URLの取得結果を返す（UpstreamCache.get と同じ動作）"""
+        if transform is None:
+            transform = _json
+        
+        entry, fresh, headers = self._lookup(url, revalidate)
+        if fresh:
+            return entry.value
+        
+        response = await self.session.get(url, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304 and entry is not None:
+            return self._not_modified(entry)
+        
+        response.raise_for_status()
+        value = await asyncio.get_running_loop().run_in_executor(self.executor, transform, response)
+        self._store(url, response, value)
+        return value
+
+    async def aclose(self):
+        await self.session.aclose()
+
+
+def _json(response):
+    return response.json()